@@ -2,18 +2,22 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import datetime
-from PIL import Image
-from streamlit.proto.RootContainer_pb2 import SIDEBAR
-import matplotlib.pyplot as plt
-import psycopg2 as psy
 import os
 import base64
-import seaborn as sns
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from db import get_pool
+from data import DEFAULT_PARTITION, PageData, get_data_cache, list_partitions, matches_for_display, matches_page, partition_label
+from charts import CHART_FORMAT, ChartBatch, get_figure_manager
+from model import CONFIDENCE, TARGETS, VARIANTS, effect_text
+from specs import (RATIO_VENUES, SORT_COLUMNS, SORT_DIRECTIONS, STANDINGS_VIEWS, dominance_chart, league_charts, market_value_fit_chart, pair_charts,
+                   pair_verdicts, rank_probabilities_chart, result_ratio_chart, results_heatmap_chart, standings_chart, team_average_charts,
+                   team_charts, teams_sorted_chart)
+from tracing import span, trace
+
 st.set_page_config(
     page_title="Football Market Value Effect App",
     page_icon="⚽",
@@ -28,6 +32,10 @@ DB_PASSWORD = os.environ['DB_PASSWORD']
 DB_NAME = os.environ['DB_NAME']
 # DSN string
 dsn = f"host={DB_HOST} user={DB_USERNAME} password={DB_PASSWORD} dbname={DB_NAME}"
+# Show the figure, memory and connection pool counters of every rerun in the sidebar
+SHOW_RENDER_STATS = os.environ.get('SHOW_RENDER_STATS', '0') != '0'
+# Show where the time of every rerun went (queries, cleaning, tables, charts) in the sidebar
+SHOW_TRACE = os.environ.get('SHOW_TRACE', '0') != '0'
 
 hero_content = """
     <style>
@@ -47,91 +55,55 @@ hero_content = """
 
 """
 
-# Query
-teams_query = """
-    SELECT * FROM teams
-    -- LIMIT 10;
-"""
-
-# Matches query
-matches_query = """
-    SELECT * FROM matches
-    -- LIMIT 10;
-"""
-
-# Select all tables
-all_tables_query = """
-    SELECT table_name
-    FROM information_schema.tables
-    WHERE table_schema='public'
-    AND table_type='BASE TABLE';
-"""
-
-def executeQuery(query):
-    # Connect to elephantSQL
-    conn = psy.connect(dsn)
-    # Create cursor
-    cur = conn.cursor()
-
-    cur.execute(query)
-    data = cur.fetchall()
-
-    # Close cursor
-    cur.close()
-    # Close connection
-    conn.close()
-
-    return data
-
-def cleanTeams(data):
-    # delete the "Team" column in data
-    data = data.drop(columns=['Team'])
-    # Move "Rank column to the first column"
-    data = data[['Rank','TeamID','TeamName','MarketValue','M','W','D','L','G','GA','PTS','xG','xGA','xPTS']]
-    # Sort the data by rank
-    data = data.sort_values(by=['Rank'])
-    return data
-
-def cleanMatches(data, team_data):
-    # change the homeTeamId and awayTeamId into team name
-    data['homeTeamId'] = data['homeTeamId'].replace(team_data['TeamID'].tolist(), team_data['TeamName'].tolist())
-    data['awayTeamId'] = data['awayTeamId'].replace(team_data['TeamID'].tolist(), team_data['TeamName'].tolist())
-    # change the played column into Yes or No
-    data['played'] = np.where(data['played'] == True, 'Yes', 'No')
-    # add a new column called "result". change the cell color based on the result. home = green, draw = grey, away = red
-    # if match is not played yet (played = False), the result is None
-    data['result'] = np.where(data['played'] == 'No', None, np.where(data['homeScore'] > data['awayScore'], 'Home', np.where(data['homeScore'] == data['awayScore'], 'Draw', 'Away')))
-
-    return data
-
-# Function to highlight the cell
-def highlight_cell():
-    def highlight(x):
-        if x == 'Home':
-            color = '#377B2B'
-        elif x == 'Draw':
-            color = '#666666'
-        elif x == 'Away':
-            color = '#C93127'
-        else:
-            color = '#111111'
-        return 'background-color: %s' % color
-    return highlight
-
-# Function to change the data type to integer
-def cell_to_int():
-    def integer_cell(x):
-        if x != int:
-            return None
-        # return integer without comma
-        if x is float:
-            return x.astype(int)
-    return integer_cell
+def executeQuery(query, params=None):
+    # Borrow a connection to elephantSQL from the process-wide pool instead of connecting per query
+    return get_pool(dsn).execute(query, params)
+
+# Datasets each page reads, fetched concurrently when they are not cached
+PAGE_DATASETS = {
+    "Data": ['teams', 'matches', 'matches_order', 'standings', 'rollup', 'tables'],
+    "Team Performance": ['teams', 'team_index', 'team_comparison'],
+    "Market Value Model": ['teams', 'market_value_model'],
+    "Season Projection": ['teams', 'matches', 'standings', 'season_projection'],
+}
+
+# League/season picker for the data pages; listing the partitions is a query (at most every
+# DATA_PARTITIONS_INTERVAL seconds), so static pages skip it
+def select_partition():
+    partitions = list_partitions(executeQuery)
+    if len(partitions) <= 1:
+        return (partitions[0] if partitions else DEFAULT_PARTITION), partitions
+    partitions_by_label = {partition_label(partition): partition for partition in partitions}
+    label = st.sidebar.selectbox("League / season", list(partitions_by_label), key="partition")
+    return partitions_by_label[label], partitions
+
+# Put a rendered chart into the placeholder reserved for it (see ChartBatch)
+def place_chart(placeholder, chart):
+    if CHART_FORMAT == 'svg':
+        chart = chart.decode()
+    placeholder.image(chart, use_column_width=True)
+
+# Style of the result cells, indexed by result code (RESULT_PENDING picks the last one)
+RESULT_CELL_STYLES = np.array([f'background-color: {color}' for color in ['#C93127', '#666666', '#377B2B', '#111111']], dtype=object)
+
+# One page of matches for display: result colors looked up for the whole column at once and the
+# scores formatted as integers per column, instead of a Python call per cell
+def style_matches(page):
+    result_styles = RESULT_CELL_STYLES[page['result'].to_numpy()]
+    styled = matches_for_display(page).style.apply(lambda column: result_styles, subset=['result'])
+    return styled.format('{:d}', subset=['homeScore', 'awayScore'], na_rep='')
+
+def set_matches_cursor(key):
+    st.session_state['matches_cursor'] = key
+
+# Show a verdict of pair_verdicts as st.success/st.error/st.warning
+def show_verdict(verdict):
+    kind, message = verdict
+    getattr(st, kind)(message)
 
 def hero_section():
     st.markdown('<h1 style="text-align: center;"> Football Market Value Effect App </h1>', unsafe_allow_html=True)
-    image = Image.open('images/pl-hero.png')
-    st.image(image, use_column_width=True)
+    st.image('images/pl-hero.png', use_column_width=True)
 
 home_content = """
     <style>
@@ -148,7 +120,7 @@ home_content = """
 
 """
 
-def home_section(params_team_data, params_matches_data):
+def home_section(page_data):
     st.header("Home")
     # st.markdown(home_content, unsafe_allow_html=True)
     st.write("Welcome to the Football Market Value Effect App! This app is designed for **Data Engineering** course by **Mr. Syukron**.")
@@ -156,7 +128,7 @@ def home_section(params_team_data, params_matches_data):
     st.image("https://media3.giphy.com/media/q763Sw8dCByWM2oNI6/giphy.gif?cid=ecf05e471j5edwxvokyxz2r10m0uyhcy3z74h74jto59cs6x&ep=v1_gifs_search&rid=giphy.gif&ct=g", use_column_width="True")
     st.markdown("> # ***Siuuuuuuuuuuuuuuuuuuuuuu*** \n > \- Cristiano Ronaldo")
 
-def data_section(params_team_data, params_matches_data):
+def data_section(page_data):
     st.header("Data")
     st.write("We have 3 data sources from this project:")
     st.write("1. [Transfermarkt](https://www.transfermarkt.com/)")
@@ -164,17 +136,14 @@ def data_section(params_team_data, params_matches_data):
     st.write("3. [Understat.com](https://www.understat.com/)")
     st.image("https://media3.giphy.com/media/N97DxHrADyYGovSlRN/giphy.gif?cid=ecf05e47gyar03htuztm57qe3ji8oce75xhmowop7nrx0c0i&ep=v1_gifs_search&rid=giphy.gif&ct=g", use_column_width="True")
 
-    data = params_team_data
-    matches = params_matches_data
+    # Datasets are fetched on first use, so the matches are only loaded once their section renders
+    data = page_data.teams
+    # Charts are queued as specs and rendered together at the end of the page
+    charts = ChartBatch(page_data.version)
 
     st.info("To sort the data based on the column, please select the column name in the table.")
     st.info("***Arrow up: From Lowest, Arrow down: From Highest***")
 
-    tables = executeQuery(all_tables_query)
-
-    # Transform tables into dataframe with these headers: table_name
-    tables = pd.DataFrame(tables, columns=['table_name'])
-
     # TEAMS ==================================================================
     #! For joined_teams.csv:
     #! Team Market Value: A bar chart comparing the market values of different teams.
@@ -196,16 +165,9 @@ def data_section(params_team_data, params_matches_data):
     # Column 1
     with col1:
         # Visualize the chosen column using matplotlib
-        fig, ax = plt.subplots()
-        sort_by = st.selectbox("Sort by:", ["MarketValue", "M", "W", "D", "L", "G", "GA", "PTS", "xG", "xGA", "xPTS"])
-        direction = st.radio("Direction:", ["From Highest", "From Lowest"])
-        sorted_data = data.sort_values(by=[sort_by], ascending=(direction == "From Lowest"))
-        ax.bar(sorted_data['TeamName'], sorted_data[sort_by])
-        plt.xticks(rotation=90)
-        plt.title(f"Premier League {sort_by} Comparison")
-        plt.xlabel("Team Name")
-        plt.ylabel(sort_by)
-        st.pyplot(fig)
+        sort_by = st.selectbox("Sort by:", SORT_COLUMNS)
+        direction = st.radio("Direction:", SORT_DIRECTIONS)
+        charts.add(st.empty(), *teams_sorted_chart(data, sort_by, direction))
 
 
     # Column 2
@@ -221,6 +183,7 @@ def data_section(params_team_data, params_matches_data):
 
     # 3 columns: average Market Value, xG, and xGA
     col1, col2, col3 = st.columns(3)
+    average_charts = team_average_charts(data)
 
     # Column 1
     with col1:
@@ -232,18 +195,8 @@ def data_section(params_team_data, params_matches_data):
         st.success(f"Highest: {format(highest_market_value, ',d')} ({data[data['MarketValue'] == data['MarketValue'].max()]['TeamName'].values[0]})")
         st.info(f"Average: {format(average_market_value, ',d')}")
         st.error(f"Lowest: {format(lowest_market_value, ',d')} ({data[data['MarketValue'] == data['MarketValue'].min()]['TeamName'].values[0]})")
-        # Create a bar chart
-        fig, ax = plt.subplots()
-        ax.bar(data['TeamName'], data['MarketValue'])
-        plt.xticks(rotation=90)
-        plt.title("Market Value")
-        plt.xlabel("Team Name")
-        plt.ylabel("Market Value")
-        # add a line which shows the average market value
-        plt.axhline(y=data['MarketValue'].mean(), color='r', linestyle='-')
-        # add a text which shows the average market value
-        ax.text(0.5, 0.95, f"Average Market Value: {data['MarketValue'].mean()}", fontsize=10, weight='bold', ha='center', transform=ax.transAxes)
-        st.pyplot(fig)
+        # Create a bar chart with a line and a text which show the average market value
+        charts.add(st.empty(), *average_charts['market_value'])
 
     # Column 2
     with col2:
@@ -252,18 +205,8 @@ def data_section(params_team_data, params_matches_data):
         st.success(f"Highest: {data['xG'].max()} ({data[data['xG'] == data['xG'].max()]['TeamName'].values[0]})")
         st.info(f"Average: {round(data['xG'].mean(), 3)}")
         st.error(f"Lowest: {data['xG'].min()} ({data[data['xG'] == data['xG'].min()]['TeamName'].values[0]})")
-        # Create a bar chart
-        fig, ax = plt.subplots()
-        ax.bar(data['TeamName'], data['xG'])
-        plt.xticks(rotation=90)
-        plt.title("Expected Goals")
-        plt.xlabel("Team Name")
-        plt.ylabel("xG")
-        # add a line which shows the average xG
-        plt.axhline(y=data['xG'].mean(), color='r', linestyle='-')
-        # add a text which shows the average xG
-        ax.text(0.5, 0.95, f"Average xG: {round(data['xG'].mean(), 3)}", fontsize=10, weight='bold', ha='center', transform=ax.transAxes)
-        st.pyplot(fig)
+        # Create a bar chart with a line and a text which show the average xG
+        charts.add(st.empty(), *average_charts['xg'])
 
     # Column 3
     with col3:
@@ -272,19 +215,13 @@ def data_section(params_team_data, params_matches_data):
         st.error(f"Highest: {data['xGA'].max()} ({data[data['xGA'] == data['xGA'].max()]['TeamName'].values[0]})")
         st.info(f"Average: {round(data['xGA'].mean(), 3)}")
         st.success(f"Lowest: {data['xGA'].min()} ({data[data['xGA'] == data['xGA'].min()]['TeamName'].values[0]})")
-        # Create a bar chart
-        fig, ax = plt.subplots()
-        ax.bar(data['TeamName'], data['xGA'])
-        plt.xticks(rotation=90)
-        plt.title("Expected Goals Against")
-        plt.xlabel("Team Name")
-        plt.ylabel("xGA")
-        # add a line which shows the average xGA
-        plt.axhline(y=data['xGA'].mean(), color='r', linestyle='-')
-        # add a text which shows the average xGA
-        ax.text(0.5, 0.95, f"Average xGA: {round(data['xGA'].mean(), 3)}", fontsize=10, weight='bold', ha='center', transform=ax.transAxes)
-        st.pyplot(fig)
+        # Create a bar chart with a line and a text which show the average xGA
+        charts.add(st.empty(), *average_charts['xga'])
 
+    # Points Accumulation Over Time: the standings after every matchday, built from the matches
+    st.subheader("Standings Over Time")
+    over_time = st.radio("Show:", STANDINGS_VIEWS, horizontal=True, key="standings_column")
+    charts.add(st.empty(), *standings_chart(page_data, over_time))
 
     # MATCHES =========================================
     #! For joined_matches.csv:
@@ -293,11 +230,26 @@ def data_section(params_team_data, params_matches_data):
     #! Win/Loss Ratio for Teams: A bar chart indicating how many matches each team won, lost, or drew.
     
     st.header("Matches")
+    matches = page_data.matches
     
-    # give the color to the result column and make the homeScore and awayScore as integers
-    matches_styled = matches.style.applymap(highlight_cell(), subset=['result'])
-    matches_styled = matches_styled.applymap(cell_to_int(), subset=['homeScore', 'awayScore'])
-    st.dataframe(matches_styled, use_container_width=True)
+    # Only the visible page is styled and sent to the browser, so the table costs the same however
+    # many matches there are. Pages are keyed by (matchday, matchId) rather than by offset.
+    page, previous_key, next_key = matches_page(matches, page_data.matches_order, st.session_state.get('matches_cursor'))
+    # The Styler only runs when the table is serialized
+    with span('table.matches', rows=len(page)):
+        st.dataframe(style_matches(page), use_container_width=True)
+    col1, col2, col3 = st.columns([1, 4, 1])
+    with col1:
+        st.button("Previous", disabled=previous_key is None, on_click=set_matches_cursor, args=(previous_key,), key="matches_previous")
+    with col2:
+        if len(page):
+            st.caption(f"Matchday {page['matchday'].iloc[0]} to {page['matchday'].iloc[-1]} · {len(matches)} matches in total")
+    with col3:
+        st.button("Next", disabled=next_key is None, on_click=set_matches_cursor, args=(next_key,), key="matches_next")
+
+    # The pies and the charts below are slices of the matchday rollup, not scans of the matches
+    rollup = page_data.rollup
+    rollup_charts = league_charts(rollup)
 
     # Create 2 columns
     col1, col2 = st.columns(2)
@@ -305,88 +257,54 @@ def data_section(params_team_data, params_matches_data):
     # Column 1
     with col1:
         # Create a pie chart which shows the percentage of win, draw, and lose in home matches  
-        fig, ax = plt.subplots()
-        home_win = matches[matches['result'] == 'Home'].count()['matchId']
-        home_draw = matches[matches['result'] == 'Draw'].count()['matchId']
-        home_lose = matches[matches['result'] == 'Away'].count()['matchId']
-        # Win = green (#377B2B)
-        # Draw = yellow (#FDBB2F)
-        # Lose = red (#C93127)
-        ax.pie([home_win, home_draw, home_lose], labels=['Win', 'Draw', 'Lose'], autopct='%1.1f%%', startangle=90, colors=['#377B2B', '#FDBB2F', '#C93127'])
-        ax.text(-0.59, -0.05, f"{home_win} matches", fontsize=10, weight='bold', ha='center')
-        ax.text(0.16, -0.72, f"{home_draw} matches", fontsize=10, weight='bold', ha='center')
-        ax.text(0.5, 0.12, f"{home_lose} matches", fontsize=10, weight='bold', ha='center')
-        ax.axis('equal')
-        plt.title("Percentage of Win, Draw, and Lose in Home Matches")
-        st.pyplot(fig)
+        charts.add(st.empty(), *rollup_charts['home_results'])
 
 
     with col2:
-        # create a pie chart which shows how many matches have been played
-        fig, ax = plt.subplots()
-        played = matches[matches['played'] == 'Yes'].count()['matchId']
-        not_played = matches[matches['played'] == 'No'].count()['matchId']
-        # Pie chart with the percentage and the exact number of matches
-        ax.pie([played, not_played], labels=['Played', 'Not Played'], autopct='%1.1f%%', startangle=90, colors=['#377B2B', '#C93127'])
-        ax.text(-0.5, 0.1, f"{played} matches", fontsize=10, weight='bold', ha='center')
-        ax.text(0.5, -0.2, f"{not_played} matches", fontsize=10, weight='bold', ha='center')
-        ax.axis('equal')
-        plt.title("Percentage of Played and Not Played Matches")
-        st.pyplot(fig)
+        # Pie chart with the percentage and the exact number of played and not played matches
+        charts.add(st.empty(), *rollup_charts['played'])
+
+    # Goals Per Matchday
+    st.subheader("Goals Per Matchday")
+    charts.add(st.empty(), *rollup_charts['goals_per_matchday'])
+
+    # Win/Draw/Lose Ratio for Teams
+    st.subheader("Win/Draw/Lose Ratio")
+    venue = st.radio("Matches:", RATIO_VENUES, horizontal=True, key="ratio_venue")
+    charts.add(st.empty(), *result_ratio_chart(rollup, venue, data))
 
     # Match Results Heatmap
     st.subheader("Match Results Heatmap")
-    # change the result column into 0, 0.5, and 1
-    matches['result'] = matches['result'].replace([None, 'Away', 'Draw', 'Home'], [None, 0, 0.5, 1])
-
-    # Create a pivot table
-    matches_pivot = matches.pivot_table(index='homeTeamId', columns='awayTeamId', values='result', aggfunc='sum' if 'result' == 'Home' else 'mean')
-    
-    # Create a color palette
-    cmap = sns.color_palette("RdYlGn", as_cmap=True)
-
-    # Create a heatmap
-    fig, ax = plt.subplots()
-    heatmap = ax.imshow(matches_pivot, cmap=cmap, interpolation='nearest')
-    # Set the colorbar to show the mapping of values to colors
-    cbar = plt.colorbar(heatmap, ticks=[0, 0.5, 1])
-    cbar.ax.set_yticklabels(['Away', 'Draw', 'Home'])
-    # Set the ticks
-    ax.set_xticks(np.arange(len(matches_pivot.columns)))
-    ax.set_yticks(np.arange(len(matches_pivot.index)))
-    # Set the tick labels
-    ax.set_xticklabels(matches_pivot.columns)
-    ax.set_yticklabels(matches_pivot.index)
-    # Rotate the tick labels and set their alignment
-    plt.setp(ax.get_xticklabels(), rotation=45, ha='right', rotation_mode='anchor', fontsize=5)
-    plt.setp(ax.get_yticklabels(), fontsize=5)
-    # x-axis label
-    ax.set_xlabel('Away Team')
-    # y-axis label
-    ax.set_ylabel('Home Team')
-    # Loop over data dimensions and create text annotations
-    for i in range(len(matches_pivot.index)):
-        for j in range(len(matches_pivot.columns)):
-            text = ax.text(j, i, matches_pivot.iloc[i, j], ha='center', va='center', color='black', fontsize=4)
-    ax.set_title("Match Results Heatmap")
-    fig.tight_layout()
-    st.pyplot(fig)
+    charts.add(st.empty(), *results_heatmap_chart(matches, data))
     
+    # SEASONS =========================================
+    # Built by streaming the partitions one at a time, never loading them all together
+    if len(page_data.partitions) > 1:
+        st.header("Seasons")
+        st.info("This section compares every league and season in the database.")
+        st.dataframe(page_data.seasons, use_container_width=True, hide_index=True)
+
     # TABLES =========================================
     st.header("Tables")
     st.info("This section is used to show the tables in the database.")
-    st.dataframe(tables, use_container_width=True)
+    st.dataframe(page_data.tables, use_container_width=True)
+
+    charts.flush(place_chart)
 
     # 
 
 # Model Section ====================================================================
-def team_performance_section(params_team_data, params_matches_data):
+def team_performance_section(page_data):
     st.header("Team Performance")
     st.info("This section is used to compare the performance of 2 teams.")
     st.image("https://media1.giphy.com/media/jfXyrRHxJUYJSXoz2u/giphy.gif?cid=ecf05e47myx87z7mzastj0sywe4o5yq8q7pao8m4kpf4s3fn&ep=v1_gifs_search&rid=giphy.gif&ct=g", use_column_width="True")
 
-    matches_data = params_matches_data
-    team_data = params_team_data
+    team_index = page_data.team_index
+    # Every pair of teams compared at once, cached per data version
+    comparison = page_data.team_comparison
+    team_data = page_data.teams
+    # Charts are queued as specs and rendered together at the end of the page
+    charts = ChartBatch(page_data.version)
 
     # Create 2 columns
     col1, col2 = st.columns(2)
@@ -397,16 +315,15 @@ def team_performance_section(params_team_data, params_matches_data):
         st.subheader(team_name1)
         st.write(team_data[team_data['TeamName'] == team_name1])
 
+        # Stats of team 1, a single lookup in the per-team index
+        team1 = team_index[team_name1]
+        team1_charts = team_charts(team_name1, team1)
         # Count how many times team 1 played in home that has been played
-        home_matches = matches_data[(matches_data['homeTeamId'] == team_name1) & (matches_data['played'] == 'Yes')].count()['matchId']
+        home_matches = team1['home_matches']
         # Count how many times team 1 played in away
-        away_matches = matches_data[(matches_data['awayTeamId'] == team_name1) & (matches_data['played'] == 'Yes')].count()['matchId']
+        away_matches = team1['away_matches']
         # Create a pie chart which shows the percentage of home and away matches
-        fig, ax = plt.subplots()
-        ax.pie([home_matches, away_matches], labels=['Home', 'Away'], autopct='%1.1f%%', startangle=90, colors=['#377B2B', '#C93127'])
-        ax.axis('equal')
-        plt.title("Percentage of Home and Away Matches")
-        st.pyplot(fig)
+        charts.add(st.empty(), *team1_charts['home_away'])
         # 2 subcolumns: home and away matches
         subcol1, subcol2 = st.columns(2)
         with subcol1:
@@ -415,15 +332,11 @@ def team_performance_section(params_team_data, params_matches_data):
             st.error(f"Away matches: {away_matches}")
 
         # Count how many times team 1 won in home
-        home_win = matches_data[(matches_data['homeTeamId'] == team_name1) & (matches_data['result'] == 'Home')].count()['matchId']
-        home_lose = matches_data[(matches_data['homeTeamId'] == team_name1) & (matches_data['result'] == 'Away')].count()['matchId']
-        home_draw = matches_data[(matches_data['homeTeamId'] == team_name1) & (matches_data['result'] == 'Draw')].count()['matchId']
+        home_win = team1['home_win']
+        home_lose = team1['home_lose']
+        home_draw = team1['home_draw']
         # Pie chart to show the percentage of win, draw, and lose in home matches
-        fig, ax = plt.subplots()
-        ax.pie([home_win, home_draw, home_lose], labels=['Win', 'Draw', 'Lose'], autopct='%1.1f%%', startangle=90, colors=['#377B2B', '#FDBB2F', '#C93127'])
-        ax.axis('equal')
-        plt.title("Percentage of Win, Draw, and Lose in Home Matches")
-        st.pyplot(fig)
+        charts.add(st.empty(), *team1_charts['home_results'])
         # 2 subcolumns: home and away matches
         subcol1, subcol2 = st.columns(2)
         with subcol1:
@@ -434,15 +347,11 @@ def team_performance_section(params_team_data, params_matches_data):
             st.info(f"Home matches: {home_matches}")
 
         # Count how many times team 1 won in away
-        away_win = matches_data[(matches_data['awayTeamId'] == team_name1) & (matches_data['result'] == 'Away')].count()['matchId']
-        away_lose = matches_data[(matches_data['awayTeamId'] == team_name1) & (matches_data['result'] == 'Home')].count()['matchId']
-        away_draw = matches_data[(matches_data['awayTeamId'] == team_name1) & (matches_data['result'] == 'Draw')].count()['matchId']
+        away_win = team1['away_win']
+        away_lose = team1['away_lose']
+        away_draw = team1['away_draw']
         # Pie chart to show the percentage of win, draw, and lose in away matches
-        fig, ax = plt.subplots()
-        ax.pie([away_win, away_draw, away_lose], labels=['Win', 'Draw', 'Lose'], autopct='%1.1f%%', startangle=90, colors=['#377B2B', '#FDBB2F', '#C93127'])
-        ax.axis('equal')
-        plt.title("Percentage of Win, Draw, and Lose in Away Matches")
-        st.pyplot(fig)
+        charts.add(st.empty(), *team1_charts['away_results'])
         # 2 subcolumns: home and away matches
         subcol1, subcol2 = st.columns(2)
         with subcol1:
@@ -458,16 +367,15 @@ def team_performance_section(params_team_data, params_matches_data):
         st.subheader(team_name2)
         st.write(team_data[team_data['TeamName'] == team_name2])
 
+        # Stats of team 2, a single lookup in the per-team index
+        team2 = team_index[team_name2]
+        team2_charts = team_charts(team_name2, team2)
         # Count how many times team 2 played in home that has been played
-        home_matches = matches_data[(matches_data['homeTeamId'] == team_name2) & (matches_data['played'] == 'Yes')].count()['matchId']
+        home_matches = team2['home_matches']
         # Count how many times team 2 played in away
-        away_matches = matches_data[(matches_data['awayTeamId'] == team_name2) & (matches_data['played'] == 'Yes')].count()['matchId']
+        away_matches = team2['away_matches']
         # Create a pie chart which shows the percentage of home and away matches
-        fig, ax = plt.subplots()
-        ax.pie([home_matches, away_matches], labels=['Home', 'Away'], autopct='%1.1f%%', startangle=90, colors=['#377B2B', '#C93127'])
-        ax.axis('equal')
-        plt.title("Percentage of Home and Away Matches")
-        st.pyplot(fig)
+        charts.add(st.empty(), *team2_charts['home_away'])
         # 2 subcolumns: home and away matches
         subcol1, subcol2 = st.columns(2)
         with subcol1:
@@ -476,15 +384,11 @@ def team_performance_section(params_team_data, params_matches_data):
             st.info(f"Away matches: {away_matches}")
 
         # Count how many times team 2 won in home
-        home_win = matches_data[(matches_data['homeTeamId'] == team_name2) & (matches_data['result'] == 'Home')].count()['matchId']
-        home_lose = matches_data[(matches_data['homeTeamId'] == team_name2) & (matches_data['result'] == 'Away')].count()['matchId']
-        home_draw = matches_data[(matches_data['homeTeamId'] == team_name2) & (matches_data['result'] == 'Draw')].count()['matchId']
+        home_win = team2['home_win']
+        home_lose = team2['home_lose']
+        home_draw = team2['home_draw']
         # Pie chart to show the percentage of win, draw, and lose in home matches
-        fig, ax = plt.subplots()
-        ax.pie([home_win, home_draw, home_lose], labels=['Win', 'Draw', 'Lose'], autopct='%1.1f%%', startangle=90, colors=['#377B2B', '#FDBB2F', '#C93127'])
-        ax.axis('equal')
-        plt.title("Percentage of Win, Draw, and Lose in Home Matches")
-        st.pyplot(fig)
+        charts.add(st.empty(), *team2_charts['home_results'])
         # 2 subcolumns: home and away matches
         subcol1, subcol2 = st.columns(2)
         with subcol1:
@@ -495,15 +399,11 @@ def team_performance_section(params_team_data, params_matches_data):
             st.info(f"Home matches: {home_matches}")
 
         # Count how many times team 2 won in away
-        away_win = matches_data[(matches_data['awayTeamId'] == team_name2) & (matches_data['result'] == 'Away')].count()['matchId']
-        away_lose = matches_data[(matches_data['awayTeamId'] == team_name2) & (matches_data['result'] == 'Home')].count()['matchId']
-        away_draw = matches_data[(matches_data['awayTeamId'] == team_name2) & (matches_data['result'] == 'Draw')].count()['matchId']
+        away_win = team2['away_win']
+        away_lose = team2['away_lose']
+        away_draw = team2['away_draw']
         # Pie chart to show the percentage of win, draw, and lose in away matches
-        fig, ax = plt.subplots()
-        ax.pie([away_win, away_draw, away_lose], labels=['Win', 'Draw', 'Lose'], autopct='%1.1f%%', startangle=90, colors=['#377B2B', '#FDBB2F', '#C93127'])
-        ax.axis('equal')
-        plt.title("Percentage of Win, Draw, and Lose in Away Matches")
-        st.pyplot(fig)
+        charts.add(st.empty(), *team2_charts['away_results'])
         # 2 subcolumns: home and away matches
         subcol1, subcol2 = st.columns(2)
         with subcol1:
@@ -515,9 +415,8 @@ def team_performance_section(params_team_data, params_matches_data):
 
     # Comparison between team 1 and team 2
     st.subheader("Comparison Between Team 1 and Team 2")
-    # Create a dataframe which contains the data of team 1 and team 2
-    team1 = team_data[team_data['TeamName'] == team_name1]
-    team2 = team_data[team_data['TeamName'] == team_name2]
+    comparison_charts = pair_charts(comparison, team_name1, team_name2)
+    verdicts = pair_verdicts(comparison, team_name1, team_name2)
     
     # 3 columns: MarketValue Comparison, xG Comparison, and xGA Comparison
     col1, col2, col3 = st.columns(3)
@@ -525,74 +424,38 @@ def team_performance_section(params_team_data, params_matches_data):
     # Column 1
     with col1:
         # Create a bar chart which shows the market value comparison between team 1 and team 2
-        fig, ax = plt.subplots()
-        ax.bar(team1['TeamName'], team1['MarketValue'])
-        ax.bar(team2['TeamName'], team2['MarketValue'])
-        plt.xticks(rotation=0)
-        plt.title("Market Value Comparison")
-        plt.xlabel("Team Name")
-        plt.ylabel("Market Value")
-        st.pyplot(fig)
+        charts.add(st.empty(), *comparison_charts['market_value'])
         # 2 subcolumns
         subcol1, subcol2 = st.columns(2)
         # write the market value of team 1 and team 2 with the format of 1,000,000
         with subcol1:
-            st.info(f"{team_name1}: {format(team1['MarketValue'].values[0], ',d')}")
+            st.info(f"{team_name1}: {format(team1['MarketValue'], ',d')}")
         with subcol2:
-            st.info(f"{team_name2}: {format(team2['MarketValue'].values[0], ',d')}")
-        if team1['MarketValue'].values[0] > team2['MarketValue'].values[0]:
-            st.success(f"{team_name1} has a better market value than {team_name2}")
-        elif team1['MarketValue'].values[0] < team2['MarketValue'].values[0]:
-            st.error(f"{team_name2} has a better market value than {team_name1}")
-        else:
-            st.warning(f"{team_name1} and {team_name2} have the same market value")
+            st.info(f"{team_name2}: {format(team2['MarketValue'], ',d')}")
+        show_verdict(verdicts['market_value'])
 
 
     # Column 2
     with col2:
         # Create a bar chart which shows the xG comparison between team 1 and team 2
-        fig, ax = plt.subplots()
-        ax.bar(team1['TeamName'], team1['xG'])
-        ax.bar(team2['TeamName'], team2['xG'])
-        plt.xticks(rotation=0)
-        plt.title("xG Comparison")
-        plt.xlabel("Team Name")
-        plt.ylabel("xG")
-        st.pyplot(fig)
+        charts.add(st.empty(), *comparison_charts['xg'])
         subcol1, subcol2 = st.columns(2)
         with subcol1:
-            st.info(f"{team_name1}: {team1['xG'].values[0]}")
+            st.info(f"{team_name1}: {team1['xG']}")
         with subcol2:
-            st.info(f"{team_name2}: {team2['xG'].values[0]}")
-        if team1['xG'].values[0] > team2['xG'].values[0]:
-            st.success(f"{team_name1} has a better offense than {team_name2}")
-        elif team1['xG'].values[0] < team2['xG'].values[0]:
-            st.error(f"{team_name2} has a better offense than {team_name1}")
-        else:
-            st.warning(f"{team_name1} and {team_name2} have the same offense")
+            st.info(f"{team_name2}: {team2['xG']}")
+        show_verdict(verdicts['xg'])
 
     # Column 3
     with col3:
         # Create a bar chart which shows the xGA comparison between team 1 and team 2
-        fig, ax = plt.subplots()
-        ax.bar(team1['TeamName'], team1['xGA'])
-        ax.bar(team2['TeamName'], team2['xGA'])
-        plt.xticks(rotation=0)
-        plt.title("xGA Comparison")
-        plt.xlabel("Team Name")
-        plt.ylabel("xGA")
-        st.pyplot(fig)
+        charts.add(st.empty(), *comparison_charts['xga'])
         subcol1, subcol2 = st.columns(2)
         with subcol1:
-            st.info(f"{team_name1}: {team1['xGA'].values[0]}")
+            st.info(f"{team_name1}: {team1['xGA']}")
         with subcol2:
-            st.info(f"{team_name2}: {team2['xGA'].values[0]}")
-        if team1['xGA'].values[0] < team2['xGA'].values[0]:
-            st.success(f"{team_name1} has a better defense than {team_name2}")
-        elif team1['xGA'].values[0] > team2['xGA'].values[0]:
-            st.error(f"{team_name2} has a better defense than {team_name1}")
-        else:
-            st.warning(f"{team_name1} and {team_name2} have the same defense")
+            st.info(f"{team_name2}: {team2['xGA']}")
+        show_verdict(verdicts['xga'])
     
     # 3 columns
     col1, col2, col3 = st.columns(3)
@@ -600,16 +463,9 @@ def team_performance_section(params_team_data, params_matches_data):
     # Column 1
     with col1:
         # Comparison of home wins of team 1 and team 2
-        fig, ax = plt.subplots()
-        team1_home_win = matches_data[(matches_data['homeTeamId'] == team_name1) & (matches_data['result'] == 'Home')].count()['matchId']
-        team2_home_win = matches_data[(matches_data['homeTeamId'] == team_name2) & (matches_data['result'] == 'Home')].count()['matchId']
-        ax.bar(team1['TeamName'], team1_home_win)
-        ax.bar(team2['TeamName'], team2_home_win)
-        plt.xticks(rotation=0)
-        plt.title("Home Wins Comparison")
-        plt.xlabel("Team Name")
-        plt.ylabel("Home Wins")
-        st.pyplot(fig)
+        team1_home_win = team1['home_win']
+        team2_home_win = team2['home_win']
+        charts.add(st.empty(), *comparison_charts['home_wins'])
 
         # 2 subcolumns
         subcol1, subcol2 = st.columns(2)
@@ -618,26 +474,14 @@ def team_performance_section(params_team_data, params_matches_data):
             st.info(f"{team_name1}: {team1_home_win}")
         with subcol2:
             st.info(f"{team_name2}: {team2_home_win}")
-        if team1_home_win > team2_home_win:
-            st.success(f"{team_name1} has more home wins than {team_name2}")
-        elif team1_home_win < team2_home_win:
-            st.error(f"{team_name2} has more home wins than {team_name1}")
-        else:
-            st.warning(f"{team_name1} and {team_name2} have the same home wins")
+        show_verdict(verdicts['home_wins'])
 
     # Column 2
     with col2:
         # Comparison of away wins of team 1 and team 2
-        fig, ax = plt.subplots()
-        team1_away_win = matches_data[(matches_data['awayTeamId'] == team_name1) & (matches_data['result'] == 'Away')].count()['matchId']
-        team2_away_win = matches_data[(matches_data['awayTeamId'] == team_name2) & (matches_data['result'] == 'Away')].count()['matchId']
-        ax.bar(team1['TeamName'], team1_away_win)
-        ax.bar(team2['TeamName'], team2_away_win)   
-        plt.xticks(rotation=0)
-        plt.title("Away Wins Comparison")
-        plt.xlabel("Team Name")
-        plt.ylabel("Away Wins")
-        st.pyplot(fig)
+        team1_away_win = team1['away_win']
+        team2_away_win = team2['away_win']
+        charts.add(st.empty(), *comparison_charts['away_wins'])
         # 2 subcolumns
         subcol1, subcol2 = st.columns(2)
         # write the away wins of team 1 and team 2
@@ -645,41 +489,23 @@ def team_performance_section(params_team_data, params_matches_data):
             st.info(f"{team_name1}: {team1_away_win}")
         with subcol2:
             st.info(f"{team_name2}: {team2_away_win}")
-        if team1_away_win > team2_away_win:
-            st.success(f"{team_name1} has more away wins than {team_name2}")
-        elif team1_away_win < team2_away_win:
-            st.error(f"{team_name2} has more away wins than {team_name1}")
-        else:
-            st.warning(f"{team_name1} and {team_name2} have the same away wins")
+        show_verdict(verdicts['away_wins'])
 
     # Column 3
     with col3:
         # Comparison of performance: 
         # G - xG, GA - xGA, PTS - xPTS
-        fig, ax = plt.subplots()
         # G - xG
-        team1_g_xg = round(team1['G'].values[0] - team1['xG'].values[0], 3)
-        team2_g_xg = round(team2['G'].values[0] - team2['xG'].values[0], 3)
+        team1_g_xg = team1['G_xG']
+        team2_g_xg = team2['G_xG']
         # GA - xGA
-        team1_ga_xga = round(team1['GA'].values[0] - team1['xGA'].values[0], 3)
-        team2_ga_xga = round(team2['GA'].values[0] - team2['xGA'].values[0], 3)
+        team1_ga_xga = team1['GA_xGA']
+        team2_ga_xga = team2['GA_xGA']
         # PTS - xPTS
-        team1_pts_xpts = round(team1['PTS'].values[0] - team1['xPTS'].values[0], 3)
-        team2_pts_xpts = round(team2['PTS'].values[0] - team2['xPTS'].values[0], 3)
-        category_names = ['Goal Likelihood', 'Goal Against Likelihood', 'Overall Perf']
+        team1_pts_xpts = team1['PTS_xPTS']
+        team2_pts_xpts = team2['PTS_xPTS']
         # Create a bar chart
-        team1_values = [team1_g_xg, team1_ga_xga, team1_pts_xpts]
-        team2_values = [team2_g_xg, team2_ga_xga, team2_pts_xpts]
-        
-        bar_width = 0.35
-        index = np.arange(len(category_names))
-        plt.bar(index, team1_values, bar_width, label=team_name1)
-        plt.bar(index + bar_width, team2_values, bar_width, label=team_name2)
-        plt.xticks(index + bar_width / 2, category_names)
-        plt.legend()
-        plt.title("Performance Comparison")
-        plt.ylabel("Value")
-        st.pyplot(fig)
+        charts.add(st.empty(), *comparison_charts['performance'])
 
         # 2 subcolumns
         subcol1, subcol2 = st.columns(2)
@@ -691,34 +517,90 @@ def team_performance_section(params_team_data, params_matches_data):
         
         #  If the offensive value is positive, it means that the team has scored more goals than expected.
         #  If the offensive value is negative, it means that the team has scored fewer goals than expected.
-        if team1_g_xg > team2_g_xg:
-            st.success(f"{team_name1} has a better offensive performance than {team_name2}")
-        elif team1_g_xg < team2_g_xg:
-            st.error(f"{team_name2} has a better offensive performance than {team_name1}")
-        else:
-            st.warning(f"{team_name1} and {team_name2} have the same offensive performance")
+        show_verdict(verdicts['offensive_performance'])
 
         #  If the defensive value is negative, it means that the team has conceded fewer goals than expected.
         #  If the defensive value is positive, it means that the team has conceded more goals than expected.
-        if team1_ga_xga < team2_ga_xga:
-            st.success(f"{team_name1} has a better defensive performance than {team_name2}")
-        elif team1_ga_xga > team2_ga_xga:
-            st.error(f"{team_name2} has a better defensive performance than {team_name1}")
-        else:
-            st.warning(f"{team_name1} and {team_name2} have the same defensive performance")
+        show_verdict(verdicts['defensive_performance'])
 
         #  If the overall performance value is positive, it means that the team has scored more points than expected.
         #  If the overall performance value is negative, it means that the team has scored fewer points than expected.
-        if team1_pts_xpts > team2_pts_xpts:
-            st.success(f"{team_name1} has a better overall performance than {team_name2}")
-        elif team1_pts_xpts < team2_pts_xpts:
-            st.error(f"{team_name2} has a better overall performance than {team_name1}")
-        else:
-            st.warning(f"{team_name1} and {team_name2} have the same overall performance")
+        show_verdict(verdicts['overall_performance'])
+
+    # League-wide dominance: the same comparisons for every pair of teams
+    st.subheader("League-Wide Dominance")
+    st.info(f"Share of the {len(comparison.metrics)} metrics above on which the team in the row beats the team in the column.")
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        charts.add(st.empty(), *dominance_chart(comparison))
+    with col2:
+        st.dataframe(comparison.dominance_table(), hide_index=True, use_container_width=True)
+
+    charts.flush(place_chart)
+
+
+def model_section(page_data):
+    st.header("Market Value Model")
+    st.info("This section fits how points, expected points and goals move with a team's market value.")
+
+    # Fitted once per data version, intervals included (see model.build_model)
+    model = page_data.market_value_model
+    # Charts are queued as specs and rendered together at the end of the page
+    charts = ChartBatch(page_data.version)
+
+    target = st.selectbox("Fit market value against:", TARGETS, key="model_target")
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        charts.add(st.empty(), *market_value_fit_chart(model, target))
+    with col2:
+        for variant, label in VARIANTS.items():
+            row = model.row(target, variant)
+            st.subheader(label)
+            message = effect_text(target, variant, row)
+            if row['p_value'] < 1 - CONFIDENCE:
+                st.success(message)
+            else:
+                st.info(message)
+            st.write(f"R²: {row['r2']:.3f}")
+
+    st.subheader("All Fits")
+    summary = model.summary.reset_index()
+    summary['variant'] = summary['variant'].map(VARIANTS)
+    st.dataframe(summary.round(4), hide_index=True, use_container_width=True)
+    st.caption(f"{CONFIDENCE:.0%} intervals from {model.resamples:,} bootstrap resamples of the teams; p-values and null "
+               f"intervals from {model.resamples:,} permutations of the targets against the market values.")
+
+    charts.flush(place_chart)
+
+
+def projection_section(page_data):
+    st.header("Season Projection")
+    st.info("This section plays the rest of the season many times over, scoring each remaining fixture from the teams' xG and xGA.")
+
+    # Simulated once per data version (see projection.build_projection)
+    projection = page_data.season_projection
+    # Charts are queued as specs and rendered together at the end of the page
+    charts = ChartBatch(page_data.version)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Fixtures left", projection.fixtures)
+    with col2:
+        st.metric("Simulated seasons", f"{projection.simulations:,}")
+    if projection.fixtures == 0:
+        st.warning("Every fixture has been played, so the final table is already known.")
+
+    st.subheader("Projected Table")
+    st.dataframe(projection.table(), hide_index=True, use_container_width=True)
+
+    st.subheader("Final Place Probabilities")
+    charts.add(st.empty(), *rank_probabilities_chart(projection))
+
+    charts.flush(place_chart)
 
 
 # About Section ====================================================================
-def about_section(team_data, matches_data):
+def about_section(page_data):
     st.header("About")
     st.write("This app is created to help you to analyze the performance of each team in the current Premier League season. The data used in this app is from [Understat](https://understat.com/), [Transfermarkt](), and [Football-data.org]().")
     st.write("We have a Notion page for this project. You can check it [here](https://harsh-infinity-6f9.notion.site/End-To-End-Data-Pipeline-for-Premier-League-Match-Insights-474cc2d880684eb78b90f977f3c7108a?pvs=4).")
@@ -826,8 +708,9 @@ def test_section():
 
     st.write("This is the `st.pyplot` function:")
     arr = np.random.normal(1, 1, size=100)
-    plt.hist(arr, bins=20)
-    st.pyplot(plt)
+    with get_figure_manager().figure() as fig:
+        fig.subplots().hist(arr, bins=20)
+        st.pyplot(fig)
 
     st.write("This is the `st.table` function:")
     df = pd.DataFrame(
@@ -877,33 +760,60 @@ def test_section():
     st.write("This is the `st.help` function:")
     st.help(pd.DataFrame)
 
+# Timing breakdown of one rerun, slowest operations first, then every span as it happened
+def trace_panel(rerun):
+    with st.sidebar.expander(f"Timings: {rerun.duration * 1e3:.0f}ms", expanded=False):
+        breakdown = pd.DataFrame([(name, count, seconds * 1e3) for name, (count, seconds) in rerun.breakdown().items()], columns=['span', 'count', 'ms'])
+        st.dataframe(breakdown, hide_index=True, use_container_width=True)
+        spans = pd.DataFrame([
+            (' ' * span.depth + span.name, span.duration * 1e3, ', '.join(f"{key}={value}" for key, value in span.attrs.items()))
+            for span in rerun.ordered()], columns=['span', 'ms', 'details'])
+        st.dataframe(spans, hide_index=True, use_container_width=True)
+
 def main():
     st.sidebar.title("Navigation")
-    app_mode = st.sidebar.radio("", ["Home", "Data", "Team Performance", "About"], index=0, key="navigation")
+    app_mode = st.sidebar.radio("", ["Home", "Data", "Team Performance", "Market Value Model", "Season Projection", "About"], index=0, key="navigation")
     
-    team_data = None
-    matches_data = None
-    if team_data is None or matches_data is None:
-        team_data = executeQuery(teams_query)
-        team_data = pd.DataFrame(team_data, columns=['TeamID','TeamName','MarketValue','Rank','Team','M','W','D','L','G','GA','PTS','xG','xGA','xPTS'])
-        team_data = cleanTeams(team_data)
-
-        matches_data = executeQuery(matches_query)
-        matches_data = pd.DataFrame(matches_data, columns=['matchId','matchday','homeTeamId','awayTeamId','homeScore','awayScore', 'played'])
-        matches_data = cleanMatches(matches_data, team_data)
-
-
-    hero_section()
-    if app_mode == "Home":
-        home_section(team_data, matches_data)
-    if app_mode == "Data":
-        data_section(team_data, matches_data)
-    if app_mode == "Team Performance":
-        team_performance_section(team_data, matches_data)
-    if app_mode == "About":
-        about_section(team_data, matches_data)
-    # if app_mode == "TestPage":
-    #     test_section()
+    with trace(app_mode) as rerun:
+        # Cleaned data is shared across sessions and only reloaded when the tables change; each page
+        # only fetches the datasets it actually reads
+        partition, partitions = DEFAULT_PARTITION, []
+        if app_mode in ("Data", "Team Performance", "Market Value Model", "Season Projection"):
+            partition, partitions = select_partition()
+        page_data = PageData(get_data_cache(executeQuery, partition), app_mode, partitions, PAGE_DATASETS.get(app_mode, ()))
+        figures_before = get_figure_manager().stats()
+
+        hero_section()
+        if app_mode == "Home":
+            home_section(page_data)
+        if app_mode == "Data":
+            data_section(page_data)
+        if app_mode == "Team Performance":
+            team_performance_section(page_data)
+        if app_mode == "Market Value Model":
+            model_section(page_data)
+        if app_mode == "Season Projection":
+            projection_section(page_data)
+        if app_mode == "About":
+            about_section(page_data)
+        # if app_mode == "TestPage":
+        #     test_section()
+
+    if SHOW_TRACE:
+        trace_panel(rerun)
+
+    if SHOW_RENDER_STATS:
+        # Live figures should be back to zero after every rerun; RSS shows whether the server keeps growing
+        figures = get_figure_manager().stats()
+        st.sidebar.caption(
+            f"Figures: {figures['live']} live, {figures['created'] - figures_before['created']} drawn this rerun "
+            f"(peak {figures['peak_live']}) · RSS {figures['rss'] / 2**20:.0f}MB ({(figures['rss'] - figures_before['rss']) / 2**20:+.1f}MB)")
+        # Sessions waiting on the pool (or timing out) mean DB_POOL_SIZE is too small for the load
+        pool = get_pool(dsn).metrics()
+        st.sidebar.caption(
+            f"Connections: {pool['in_use']} in use, {pool['idle']} idle of {pool['maxconn']} · "
+            f"wait {pool['avg_wait'] * 1e3:.1f}ms avg, {pool['max_wait'] * 1e3:.0f}ms max · "
+            f"{pool['timeouts']} timeouts, {pool['reconnects']} reconnects")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
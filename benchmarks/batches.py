@@ -0,0 +1,64 @@
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic import make_league
+from model import build_model
+from projection import build_projection
+from standings import build_standings
+from workers import WORKER_START_METHOD
+
+WORKERS = [1, 4]
+
+
+def model_workload(n_teams):
+    # Every fit draws this many bootstrap resamples and permutations for each of its 3 variants
+    team_data, _ = make_league(n_teams, n_teams * (n_teams - 1))
+    return lambda draws, pool: build_model(team_data, draws, pool=pool)
+
+def projection_workload(n_teams, n_matches):
+    # 40% of the matches are left to play
+    team_data, matches_data = make_league(n_teams, n_matches)
+    standings = build_standings(matches_data, team_data)
+    return lambda draws, pool: build_projection(team_data, matches_data, standings, draws, pool=pool)
+
+# Workload -> (setup, (setup arguments, draws) per size, draws of the warm-up run: enough for a
+# batch per worker)
+WORKLOADS = {
+    'model': (model_workload, [((20,), 10_000), ((20,), 100_000), ((100,), 100_000)], 10_000),
+    'projection': (projection_workload, [((20, 380), 10_000), ((20, 380), 100_000), ((100, 9_900), 10_000)], 50_000),
+}
+
+
+def run(name):
+    setup, sizes, warm_up = WORKLOADS[name]
+    print(f"{name}: {'size':>12} {'draws':>8} {'workers':>8} {'seconds':>9}")
+    for arguments, draws in sizes:
+        workload = setup(*arguments)
+        for workers in WORKERS:
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(WORKER_START_METHOD)) if workers > 1 else None
+            if pool is not None:
+                # Start the workers (and their imports) outside the timing, as the app's pool outlives
+                # the first run
+                workload(warm_up, pool)
+            start = time.perf_counter()
+            workload(draws, pool)
+            elapsed = time.perf_counter() - start
+            if pool is not None:
+                pool.shutdown()
+            print(f"{name}: {'x'.join(map(str, arguments)):>12} {draws:>8} {workers:>8} {elapsed:>8.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched resampling and simulation, on the calling thread and in a worker pool")
+    parser.add_argument('workloads', nargs='*', help=f"workloads to run: {', '.join(WORKLOADS)} (all by default)")
+    args = parser.parse_args()
+    unknown = [name for name in args.workloads if name not in WORKLOADS]
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(unknown)}")
+    for name in args.workloads or WORKLOADS:
+        run(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_matches, make_teams
+from data import cleanMatches, cleanTeams
+
+# (teams, matches): one league season up to several leagues over many seasons
+SIZES = [(20, 380), (100, 100_000), (100, 1_000_000), (500, 2_000_000)]
+
+
+def legacy_clean_matches(data, team_data):
+    # cleanMatches before the rewrite: list replace and nested np.where over strings
+    data['homeTeamId'] = data['homeTeamId'].replace(team_data['TeamID'].tolist(), team_data['TeamName'].tolist())
+    data['awayTeamId'] = data['awayTeamId'].replace(team_data['TeamID'].tolist(), team_data['TeamName'].tolist())
+    data['played'] = np.where(data['played'] == True, 'Yes', 'No')
+    data['result'] = np.where(data['played'] == 'No', None, np.where(data['homeScore'] > data['awayScore'], 'Home', np.where(data['homeScore'] == data['awayScore'], 'Draw', 'Away')))
+    return data
+
+def timed(function, matches):
+    start = time.perf_counter()
+    function(matches.copy())
+    return time.perf_counter() - start
+
+def main():
+    print(f"{'teams':>6} {'matches':>10} {'legacy':>10} {'current':>10} {'rows/s':>14} {'speedup':>8}")
+    for n_teams, n_matches in SIZES:
+        teams = make_teams(n_teams)
+        team_data = cleanTeams(teams)
+        matches = make_matches(teams, n_matches)
+        current = timed(lambda data: cleanMatches(data, team_data), matches)
+        # The legacy version scales with teams x matches; skip it where it would take minutes
+        if n_teams * n_matches > 100_000_000:
+            print(f"{n_teams:>6} {n_matches:>10} {'skipped':>10} {current:>9.3f}s {n_matches / current:>14,.0f} {'-':>8}")
+            continue
+        legacy = timed(lambda data: legacy_clean_matches(data, team_data), matches)
+        print(f"{n_teams:>6} {n_matches:>10} {legacy:>9.3f}s {current:>9.3f}s {n_matches / current:>14,.0f} {legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
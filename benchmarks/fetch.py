@@ -0,0 +1,40 @@
+import time
+
+from benchmarks.synthetic import SyntheticDatabase
+from data import DataCache, PageData, page_datasets
+
+# Round trip of one query to a remote database, in seconds
+LATENCIES = [0.0, 0.02, 0.1]
+DATASETS = ['teams', 'matches', 'team_stats', 'tables']
+
+
+def remote(database, latency):
+    def execute(query, params=None):
+        time.sleep(latency)
+        return database.execute(query, params)
+    return execute
+
+def cold_page(execute, prefetch):
+    # Everything the Data page reads, from an empty cache. Forget what earlier runs read, so only
+    # `prefetch` is fetched up front.
+    page_datasets.clear()
+    start = time.perf_counter()
+    cache = DataCache(execute)
+    page_data = PageData(cache, "Data", prefetch=prefetch)
+    for name in DATASETS:
+        getattr(page_data, name)
+    return time.perf_counter() - start, cache.stats()
+
+def main():
+    database = SyntheticDatabase(20, 380)
+    print(f"{'latency':>8} {'serial':>9} {'concurrent':>11} {'fetch total':>12} {'critical path':>14}")
+    for latency in LATENCIES:
+        execute = remote(database, latency)
+        serial, _ = cold_page(execute, ())
+        concurrent, stats = cold_page(execute, DATASETS)
+        print(f"{latency * 1e3:>6.0f}ms {serial * 1e3:>7.0f}ms {concurrent * 1e3:>9.0f}ms "
+              f"{stats['fetch_total_time'] * 1e3:>10.0f}ms {stats['fetch_critical_path_time'] * 1e3:>12.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from benchmarks.render import page_specs
+from benchmarks.synthetic import make_league
+from charts import CHART_TYPES, figure_bytes, get_figure_manager, memory_usage, render_spec
+
+# Data pages rendered per run, i.e. reruns of a long-running server with a cold chart cache
+RERUNS = 30
+
+# The legacy run leaks on purpose
+plt.rcParams['figure.max_open_warning'] = 0
+
+
+def legacy_render(kind, args):
+    # Before the figure manager: a pyplot figure per chart, encoded and never closed
+    fig = plt.figure()
+    CHART_TYPES[kind](fig, **args)
+    return figure_bytes(fig)
+
+def run(render, specs):
+    start = memory_usage()
+    for _ in range(RERUNS):
+        for kind, args in specs:
+            render(kind, args)
+    return (memory_usage() - start) / 2**20
+
+def main():
+    specs = page_specs(*make_league(20, 380))
+    # Warm up fonts, mathtext and the colormap so neither run pays for them
+    for kind, args in specs:
+        render_spec(kind, args)
+    managed = run(render_spec, specs)
+    figures = get_figure_manager().stats()
+    legacy = run(legacy_render, specs)
+    print(f"{RERUNS} reruns x {len(specs)} charts")
+    print(f"{'':>8} {'RSS growth':>11} {'live figures':>13}")
+    print(f"{'legacy':>8} {legacy:>9.1f}MB {len(plt.get_fignums()):>13}")
+    print(f"{'managed':>8} {managed:>9.1f}MB {figures['live']:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import time
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+
+from benchmarks.synthetic import make_league
+from charts import figure_bytes, render_spec
+from data import RESULT_PENDING, match_results_matrix
+
+TEAM_COUNTS = [20, 100, 500]
+# The legacy heatmap draws one Text per cell; past this many teams it takes minutes
+LEGACY_LIMIT = 100
+
+
+def legacy_heatmap(matches_data, cmap):
+    # The Data page heatmap before the engine: pivot_table, then ax.text for every cell
+    heatmap_data = matches_data.assign(result=matches_data['result'].where(matches_data['result'] != RESULT_PENDING) / 2)
+    matches_pivot = heatmap_data.pivot_table(index='homeTeamId', columns='awayTeamId', values='result', aggfunc='mean', observed=False)
+    fig, ax = plt.subplots()
+    heatmap = ax.imshow(matches_pivot, cmap=cmap, interpolation='nearest')
+    cbar = plt.colorbar(heatmap, ticks=[0, 0.5, 1])
+    cbar.ax.set_yticklabels(['Away', 'Draw', 'Home'])
+    ax.set_xticks(np.arange(len(matches_pivot.columns)))
+    ax.set_yticks(np.arange(len(matches_pivot.index)))
+    ax.set_xticklabels(matches_pivot.columns)
+    ax.set_yticklabels(matches_pivot.index)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right', rotation_mode='anchor', fontsize=5)
+    plt.setp(ax.get_yticklabels(), fontsize=5)
+    for i in range(len(matches_pivot.index)):
+        for j in range(len(matches_pivot.columns)):
+            ax.text(j, i, matches_pivot.iloc[i, j], ha='center', va='center', color='black', fontsize=4)
+    fig.tight_layout()
+    chart = figure_bytes(fig)
+    plt.close(fig)
+    return chart
+
+def current_heatmap(matches_data, team_data, cmap):
+    matrix = match_results_matrix(matches_data, team_data)
+    return render_spec('heatmap', dict(matrix=matrix, labels=team_data['TeamName'].tolist(), cmap=cmap))
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def main():
+    cmap = matplotlib.colormaps['RdYlGn']
+    print(f"{'teams':>6} {'matches':>8} {'matrix':>9} {'current':>9} {'legacy':>9}")
+    for n_teams in TEAM_COUNTS:
+        # A full double round robin
+        team_data, matches_data = make_league(n_teams, n_teams * (n_teams - 1))
+        matrix = timed(lambda: match_results_matrix(matches_data, team_data))
+        current = timed(lambda: current_heatmap(matches_data, team_data, cmap))
+        legacy = f"{timed(lambda: legacy_heatmap(matches_data, cmap)):>8.2f}s" if n_teams <= LEGACY_LIMIT else f"{'skipped':>9}"
+        print(f"{n_teams:>6} {len(matches_data):>8} {matrix * 1e3:>7.1f}ms {current:>8.2f}s {legacy}")
+
+
+if __name__ == "__main__":
+    main()
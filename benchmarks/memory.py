@@ -0,0 +1,22 @@
+from benchmarks.clean_matches import legacy_clean_matches
+from benchmarks.synthetic import make_matches, make_teams
+from data import cleanMatches, cleanTeams, frame_memory
+
+# (teams, matches): one season, a few leagues, a long history
+SIZES = [(20, 380), (100, 20_000), (100, 1_000_000)]
+
+
+def main():
+    print(f"{'teams':>6} {'matches':>10} {'before':>12} {'after':>12} {'saved':>7}")
+    for n_teams, n_matches in SIZES:
+        teams = make_teams(n_teams)
+        team_data = cleanTeams(teams)
+        matches = make_matches(teams, n_matches)
+        # Before: team name strings, 'Yes'/'No' and Home/Draw/Away objects, int64/float64 scores
+        before = frame_memory(legacy_clean_matches(matches.copy(), team_data))
+        after = frame_memory(cleanMatches(matches.copy(), team_data))
+        print(f"{n_teams:>6} {n_matches:>10} {before / 2**20:>10.2f}MB {after / 2**20:>10.2f}MB {1 - after / before:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import time
+
+import matplotlib
+
+from benchmarks.synthetic import make_league
+from charts import RESULT_COLORS, ChartBatch, ChartCache, render_spec
+from data import match_results_matrix
+from workers import WORKER_PROCESSES, get_worker_pool
+
+# Rounds of rendering a full Data page from a cold chart cache
+ROUNDS = 3
+
+
+def page_specs(team_data, matches_data):
+    # The charts of the Data page as (kind, args) specs
+    specs = [('bar', dict(labels=team_data['TeamName'], values=team_data[column], title=column, xlabel="Team Name", ylabel=column,
+                          average=team_data[column].mean(), average_text=f"Average {column}"))
+             for column in ['PTS', 'MarketValue', 'xG', 'xGA']]
+    specs += [('pie', dict(values=[40, 25, 35], labels=['Win', 'Draw', 'Lose'], colors=RESULT_COLORS, title="Home Results")),
+              ('pie', dict(values=[300, 80], labels=['Played', 'Not Played'], colors=['#377B2B', '#C93127'], title="Played"))]
+    matrix = match_results_matrix(matches_data, team_data)
+    specs.append(('heatmap', dict(matrix=matrix, labels=team_data['TeamName'].tolist(), cmap=matplotlib.colormaps['RdYlGn'])))
+    return specs
+
+def serial(specs):
+    return [render_spec(kind, args) for kind, args in specs]
+
+def batched(specs, round):
+    batch = ChartBatch(round, cache=ChartCache())
+    for i, (kind, args) in enumerate(specs):
+        batch.add(i, f"chart_{i}", (), kind, args)
+    charts = []
+    batch.flush(lambda target, chart: charts.append(chart))
+    return charts
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def main():
+    team_data, matches_data = make_league(20, 380)
+    specs = page_specs(team_data, matches_data)
+    slowest = max(timed(lambda: render_spec(kind, args)) for kind, args in specs)
+    # Start the workers (and their matplotlib import) outside the measurement
+    if get_worker_pool() is not None:
+        batched(specs, -1)
+    print(f"{len(specs)} charts, {WORKER_PROCESSES} workers, slowest chart {slowest:.2f}s")
+    print(f"{'round':>5} {'serial':>8} {'batched':>8}")
+    for round in range(ROUNDS):
+        print(f"{round:>5} {timed(lambda: serial(specs)):>7.2f}s {timed(lambda: batched(specs, round)):>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
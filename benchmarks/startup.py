@@ -0,0 +1,79 @@
+import ast
+import os
+import subprocess
+import sys
+
+# Every measurement runs in a fresh interpreter, like a new container or autoscaled replica
+PAGES = ["Home", "Data", "Team Performance", "About"]
+# Heavy modules, reported when an import set pulls them in
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'psycopg2', 'streamlit.proto.RootContainer_pb2']
+# What app.py imported up front before the startup work; what it imports now is read from app.py
+LEGACY_IMPORTS = ['streamlit', 'pandas', 'numpy', 'PIL.Image', 'matplotlib.pyplot', 'psycopg2', 'seaborn', 'streamlit.proto.RootContainer_pb2']
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(m for m in {modules!r} if m in sys.modules) or '-')
+"""
+
+# First paint: from a cold interpreter to the page rendered once, streamlit import included
+PAINT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+# `streamlit run` puts the app's directory on the path; the test harness does not
+sys.path.insert(0, {root!r})
+at = AppTest.from_file({app!r}, default_timeout=300)
+at.session_state['navigation'] = {page!r}
+at.run()
+print(time.perf_counter() - start, len(at.exception))
+"""
+
+
+def run(script, cwd=ROOT):
+    env = dict(os.environ)
+    # Static pages render without a database; the data pages need the one configured in .env
+    for name in ['DB_HOST', 'DB_USERNAME', 'DB_PASSWORD', 'DB_NAME']:
+        env.setdefault(name, 'localhost' if name == 'DB_HOST' else 'benchmark')
+    result = subprocess.run([sys.executable, '-c', script], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+def app_imports(path=os.path.join(ROOT, 'app.py')):
+    # Modules app.py imports at the top level, in order, so the current numbers follow the app
+    with open(path) as file:
+        tree = ast.parse(file.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        modules += [name for name in names if name not in modules]
+    return modules
+
+def import_time(modules):
+    elapsed, loaded = run(IMPORT_SCRIPT.format(imports='\n'.join(f'import {module}' for module in modules), modules=HEAVY_MODULES))
+    return float(elapsed), loaded
+
+def main():
+    # The app reads images/ relative to the working directory, e.g. a deployment checkout
+    app_dir = sys.argv[1] if len(sys.argv) > 1 else ROOT
+    print(f"{'imports':>8} {'time':>7}  heavy modules loaded")
+    for name, modules in [('legacy', LEGACY_IMPORTS), ('current', app_imports())]:
+        elapsed, loaded = import_time(modules)
+        print(f"{name:>8} {elapsed:>6.2f}s  {loaded}")
+    print()
+    print(f"{'page':>16} {'first paint':>12} {'errors':>7}")
+    for page in PAGES:
+        elapsed, errors = run(PAINT_SCRIPT.format(root=ROOT, app=os.path.join(ROOT, 'app.py'), page=page, modules=HEAVY_MODULES), cwd=app_dir)
+        print(f"{page:>16} {float(elapsed):>11.2f}s {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import SyntheticDatabase, make_matches, make_teams
+from data import DataCache, cleanMatches, cleanTeams, match_results_matrix, team_results_from_matches
+from rollup import build_cube
+from standings import build_standings
+from stats import build_comparison, build_team_stats
+
+# (teams, matches) for the micro-benchmarks: one season, a few leagues, a long history
+MICRO_SIZES = [(20, 380), (100, 100_000), (500, 1_000_000)]
+# (teams, matches) for the page sections, rendered headlessly with AppTest
+SECTION_SIZES = [(20, 380), (100, 9_900), (100, 100_000)]
+SECTIONS = [('data_section', 'Data'), ('team_performance_section', 'Team Performance')]
+REPEAT = 5
+# Reruns of a section once its data and charts are cached
+RERUNS = 3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One section of app.py on the data cache passed in through session state
+SECTION_SCRIPT = """
+import streamlit as st
+import app
+from data import PageData
+app.{section}(PageData(st.session_state['data_cache'], {page!r}))
+"""
+
+
+def measure(function, setup=None, repeat=REPEAT):
+    # Seconds per call; setup() runs outside the timing and its result is passed to function
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(args)
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'repeat': repeat}
+
+def micro_benchmarks(n_teams, n_matches, repeat):
+    # The hot paths under the pages: cleaning both tables, the heatmap matrix and the per-team counts
+    teams = make_teams(n_teams)
+    matches = make_matches(teams, n_matches)
+    team_data = cleanTeams(teams)
+    matches_data = cleanMatches(matches.copy(), team_data)
+    team_stats = build_team_stats(team_data, team_results_from_matches(matches_data, team_data))
+    benchmarks = [
+        ('cleanTeams', lambda _: cleanTeams(teams), None),
+        # cleanMatches converts the frame in place, so each call gets a fresh copy
+        ('cleanMatches', lambda data: cleanMatches(data, team_data), matches.copy),
+        ('heatmap_matrix', lambda _: match_results_matrix(matches_data, team_data), None),
+        ('team_counts', lambda _: build_team_stats(team_data, team_results_from_matches(matches_data, team_data)), None),
+        ('standings', lambda _: build_standings(matches_data, team_data), None),
+        ('rollup', lambda _: build_cube(matches_data, team_data), None),
+        ('team_comparison', lambda _: build_comparison(team_stats), None),
+    ]
+    return [dict(name=name, teams=n_teams, matches=n_matches, **measure(function, setup, repeat)) for name, function, setup in benchmarks]
+
+def section_benchmark(section, page, n_teams, n_matches, reruns):
+    # First render from an empty data cache (every query, clean and chart), then reruns served from
+    # the caches, as a Streamlit server sees them
+    from streamlit.testing.v1 import AppTest
+    database = SyntheticDatabase(n_teams, n_matches)
+    at = AppTest.from_string(SECTION_SCRIPT.format(section=section, page=page), default_timeout=600)
+    at.session_state['data_cache'] = DataCache(database.execute)
+    start = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - start
+    queries = database.queries
+    warm = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        warm.append(time.perf_counter() - start)
+    return dict(section=section, teams=n_teams, matches=n_matches, cold=cold, warm=statistics.median(warm),
+                queries=queries, rerun_queries=database.queries - queries, exceptions=len(at.exception))
+
+def environment():
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the data hot paths and headless timings of the page sections")
+    parser.add_argument('--output', help="write the results as JSON to this file ('-' for stdout)")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="timed calls per micro-benchmark")
+    parser.add_argument('--quick', action='store_true', help="smallest size only")
+    args = parser.parse_args()
+    # app.py reads its connection settings at import; the sections only ever see the synthetic database
+    for name in ['DB_HOST', 'DB_USERNAME', 'DB_PASSWORD', 'DB_NAME']:
+        os.environ.setdefault(name, 'benchmark')
+    # `streamlit run` puts the app's directory on the path; the test harness does not
+    sys.path.insert(0, ROOT)
+    # Keep the tables off stdout when it carries the JSON
+    out = sys.stderr if args.output == '-' else sys.stdout
+
+    micro_sizes = MICRO_SIZES[:1] if args.quick else MICRO_SIZES
+    section_sizes = SECTION_SIZES[:1] if args.quick else SECTION_SIZES
+    results = {'environment': environment(), 'micro': [], 'sections': []}
+
+    print(f"{'benchmark':>16} {'teams':>6} {'matches':>10} {'min':>10} {'median':>10}", file=out)
+    for n_teams, n_matches in micro_sizes:
+        for result in micro_benchmarks(n_teams, n_matches, args.repeat):
+            results['micro'].append(result)
+            print(f"{result['name']:>16} {n_teams:>6} {n_matches:>10} {result['min'] * 1e3:>8.2f}ms {result['median'] * 1e3:>8.2f}ms", file=out)
+    print(file=out)
+    print(f"{'section':>26} {'teams':>6} {'matches':>8} {'cold':>8} {'warm':>8} {'queries':>8} {'errors':>7}", file=out)
+    for n_teams, n_matches in section_sizes:
+        for section, page in SECTIONS:
+            result = section_benchmark(section, page, n_teams, n_matches, RERUNS)
+            results['sections'].append(result)
+            print(f"{section:>26} {n_teams:>6} {n_matches:>8} {result['cold']:>7.2f}s {result['warm']:>7.2f}s "
+                  f"{result['queries']:>4}+{result['rerun_queries']:<3} {result['exceptions']:>7}", file=out)
+
+    if args.output == '-':
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    elif args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from data import (MATCHES_COLUMNS, SCORE_CHECKSUM_BASE, SCORE_CHECKSUM_MODULUS, TEAMS_COLUMNS, all_tables_query, cleanMatches, cleanTeams,
+                  fingerprint_query, matches_delta_query, matches_query, partition_query, team_venue_results_view_query, teams_query)
+
+
+def make_teams(n_teams, seed=0):
+    # Rows shaped like the teams table, with plausible Premier League numbers
+    rng = np.random.default_rng(seed)
+    wins = rng.integers(0, 25, n_teams)
+    draws = rng.integers(0, 38 - wins + 1)
+    losses = 38 - wins - draws
+    data = pd.DataFrame({
+        'Rank': np.arange(1, n_teams + 1),
+        'TeamID': np.arange(1, n_teams + 1) * 10,
+        'TeamName': [f"Team {i}" for i in range(n_teams)],
+        'MarketValue': rng.integers(50, 1200, n_teams) * 1_000_000,
+        'M': 38,
+        'W': wins,
+        'D': draws,
+        'L': losses,
+        'G': rng.integers(20, 100, n_teams),
+        'GA': rng.integers(20, 100, n_teams),
+        'PTS': 3 * wins + draws,
+        'xG': rng.uniform(20, 100, n_teams).round(2),
+        'xGA': rng.uniform(20, 100, n_teams).round(2),
+        'xPTS': rng.uniform(20, 90, n_teams).round(2),
+    })
+    return data[TEAMS_COLUMNS]
+
+def make_matches(teams, n_matches, played_share=0.6, seed=0):
+    # Rows shaped like the matches table: random fixtures between distinct teams, the first
+    # played_share of each round played, the rest pending with NULL scores
+    rng = np.random.default_rng(seed)
+    team_ids = teams['TeamID'].to_numpy()
+    home = rng.integers(0, len(team_ids), n_matches)
+    away = (home + rng.integers(1, len(team_ids), n_matches)) % len(team_ids)
+    per_matchday = max(len(team_ids) // 2, 1)
+    matchday = np.arange(n_matches) // per_matchday + 1
+    played = matchday <= matchday.max() * played_share
+    home_score = np.where(played, rng.poisson(1.5, n_matches), np.nan)
+    away_score = np.where(played, rng.poisson(1.2, n_matches), np.nan)
+    data = pd.DataFrame({
+        'matchId': np.arange(1, n_matches + 1),
+        'matchday': matchday,
+        'homeTeamId': team_ids[home],
+        'awayTeamId': team_ids[away],
+        'homeScore': home_score,
+        'awayScore': away_score,
+        'played': played,
+    })
+    return data[MATCHES_COLUMNS]
+
+def make_league(n_teams, n_matches, seed=0):
+    # Cleaned (team_data, matches_data), as the app sees them
+    teams = make_teams(n_teams, seed)
+    matches = make_matches(teams, n_matches, seed=seed)
+    team_data = cleanTeams(teams)
+    return team_data, cleanMatches(matches, team_data)
+
+def to_rows(data):
+    # A frame as cursor.fetchall() returns it: tuples of Python values, None for NULL
+    data = data.convert_dtypes()
+    return list(data.astype(object).where(data.notna(), None).itertuples(index=False, name=None))
+
+def make_rows(n_teams, n_matches, seed=0):
+    # (teams, matches) rows exactly as executeQuery returns them for teams_query and matches_query
+    teams = make_teams(n_teams, seed)
+    return to_rows(teams), to_rows(make_matches(teams, n_matches, seed=seed))
+
+
+class SyntheticDatabase:
+    # Answers the queries the app runs against the default partition from synthetic rows. Pass
+    # `execute` wherever executeQuery goes (e.g. DataCache) to run pages without a database.
+    def __init__(self, n_teams, n_matches, seed=0):
+        self.teams, self.matches = make_rows(n_teams, n_matches, seed)
+        self.queries = 0
+        self._answers = {
+            partition_query(teams_query): lambda params: self.teams,
+            partition_query(matches_query): lambda params: self.matches,
+            all_tables_query: lambda params: [('teams',), ('matches',)],
+            partition_query(fingerprint_query): lambda params: [self._fingerprint()],
+            partition_query(team_venue_results_view_query): lambda params: self._team_venue_results(),
+            partition_query(matches_delta_query): self._matches_delta,
+        }
+
+    def execute(self, query, params=None):
+        self.queries += 1
+        if query not in self._answers:
+            raise ValueError(f"SyntheticDatabase cannot answer {query.strip()[:60]!r}")
+        return self._answers[query](params)
+
+    def _fingerprint(self):
+        played = [row for row in self.matches if row[6]]
+        team_names = ','.join(f"{row[1]}:{row[2]}" for row in sorted(self.teams, key=lambda row: row[1]))
+        return (len(self.teams), sum(row[10] for row in self.teams), sum(row[3] for row in self.teams), hashlib.md5(team_names.encode()).hexdigest(),
+                len(self.matches), max((row[0] for row in self.matches), default=None), len(played),
+                sum((row[0] % SCORE_CHECKSUM_MODULUS + 1) * (row[4] * SCORE_CHECKSUM_BASE + row[5] + 1) for row in played))
+
+    def _team_venue_results(self):
+        counts = {}
+        for _, _, home, away, home_score, away_score, played in self.matches:
+            for team, venue, scored, conceded in [(home, 'home', home_score, away_score), (away, 'away', away_score, home_score)]:
+                result = 'pending' if not played else 'win' if scored > conceded else 'draw' if scored == conceded else 'lose'
+                counts[team, venue, result] = counts.get((team, venue, result), 0) + 1
+        return [key + (count,) for key, count in counts.items()]
+
+    def _matches_delta(self, params):
+        pending = set(params['pending'])
+        return [row for row in self.matches if row[0] > params['after'] or (row[0] in pending and row[6])]
@@ -0,0 +1,51 @@
+import time
+
+from benchmarks.synthetic import make_league
+from data import RESULT_AWAY, RESULT_DRAW, RESULT_HOME, team_results_from_matches
+from stats import build_team_stats
+
+SIZES = [380, 3_800, 38_000, 380_000]
+N_TEAMS = 20
+LOOKUPS = 200
+
+
+def scan_lookup(matches_data, team_name):
+    # What team_performance_section used to do for every team on every rerun
+    home = matches_data['homeTeamId'] == team_name
+    away = matches_data['awayTeamId'] == team_name
+    return (
+        matches_data[home & matches_data['played']].count()['matchId'],
+        matches_data[away & matches_data['played']].count()['matchId'],
+        matches_data[home & (matches_data['result'] == RESULT_HOME)].count()['matchId'],
+        matches_data[home & (matches_data['result'] == RESULT_DRAW)].count()['matchId'],
+        matches_data[home & (matches_data['result'] == RESULT_AWAY)].count()['matchId'],
+        matches_data[away & (matches_data['result'] == RESULT_AWAY)].count()['matchId'],
+        matches_data[away & (matches_data['result'] == RESULT_DRAW)].count()['matchId'],
+        matches_data[away & (matches_data['result'] == RESULT_HOME)].count()['matchId'],
+    )
+
+def index_lookup(team_index, team_name):
+    team = team_index[team_name]
+    return (team['home_matches'], team['away_matches'], team['home_win'], team['home_draw'],
+            team['home_lose'], team['away_win'], team['away_draw'], team['away_lose'])
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    print(f"{'matches':>10} {'scan/team':>12} {'build index':>12} {'lookup/team':>12}")
+    for n_matches in SIZES:
+        team_data, matches_data = make_league(N_TEAMS, n_matches)
+        names = team_data['TeamName'].tolist()
+        scan = timed(lambda: scan_lookup(matches_data, names[0]), max(LOOKUPS // (n_matches // 380), 3))
+        build = timed(lambda: build_team_stats(team_data, team_results_from_matches(matches_data, team_data)).to_dict('index'), 3)
+        team_index = build_team_stats(team_data, team_results_from_matches(matches_data, team_data)).to_dict('index')
+        lookup = timed(lambda: [index_lookup(team_index, name) for name in names], LOOKUPS) / len(names)
+        print(f"{n_matches:>10} {scan * 1e3:>10.3f}ms {build * 1e3:>10.3f}ms {lookup * 1e6:>10.3f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import numpy as np
+
+from tracing import record, span
+from workers import get_worker_pool, reset_worker_pool
+
+# Encoding of rendered charts ('png' or 'svg') and the byte budget of the rendered-chart cache
+CHART_FORMAT = os.environ.get('CHART_FORMAT', 'png')
+CHART_CACHE_BYTES = int(os.environ.get('CHART_CACHE_BYTES', 64 * 1024 * 1024))
+
+# Charts prerendered by `python -m report`, one directory per data version. A chart missing from the
+# cache is read from here when the directory of the current version is complete, and rendered live
+# otherwise; off when empty
+REPORT_DIR = os.environ.get('REPORT_DIR', 'reports')
+
+# Hand released Agg canvases (and their pixel buffers) to the next figure instead of allocating new ones
+CHART_REUSE_CANVAS = os.environ.get('CHART_REUSE_CANVAS', '0') != '0'
+
+# Heatmaps larger than this (in teams) skip the per-cell values and thin out the tick labels;
+# beyond HEATMAP_LABEL_LIMIT teams the tick labels are dropped too
+HEATMAP_ANNOTATION_LIMIT = int(os.environ.get('HEATMAP_ANNOTATION_LIMIT', 40))
+HEATMAP_LABEL_LIMIT = int(os.environ.get('HEATMAP_LABEL_LIMIT', 200))
+
+# Win = green (#377B2B)
+# Draw = yellow (#FDBB2F)
+# Lose = red (#C93127)
+RESULT_COLORS = ['#377B2B', '#FDBB2F', '#C93127']
+
+
+def figure_bytes(fig, format=CHART_FORMAT):
+    # Same settings st.pyplot uses, so cached charts look exactly like the live ones
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=format, dpi=200, bbox_inches='tight')
+    return buffer.getvalue()
+
+def memory_usage():
+    # Resident set size of this process in bytes
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        pass
+    # No procfs (e.g. macOS): the peak RSS is the best available figure
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class FigureManager:
+    # Owns every figure the charts are drawn on: plain Figure objects with their own Agg canvas,
+    # never registered with pyplot, so sessions and threads share no current-figure state and
+    # nothing stays alive in pyplot's figure registry. figure() releases the figure when its block
+    # exits, even if drawing fails.
+    def __init__(self, reuse_canvas=CHART_REUSE_CANVAS, max_idle=4):
+        self.reuse_canvas = reuse_canvas
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        # Released canvases waiting for their next figure
+        self._canvases = []
+        self._live = 0
+        self._stats = {'created': 0, 'released': 0, 'canvases_reused': 0, 'peak_live': 0}
+
+    def acquire(self):
+        # matplotlib is imported when the first chart is drawn, keeping it out of the app's startup
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        fig = Figure()
+        canvas = None
+        with self._lock:
+            if self._canvases:
+                canvas = self._canvases.pop()
+                self._stats['canvases_reused'] += 1
+            self._live += 1
+            self._stats['created'] += 1
+            self._stats['peak_live'] = max(self._stats['peak_live'], self._live)
+        if canvas is None:
+            FigureCanvasAgg(fig)
+        else:
+            canvas.figure = fig
+            fig.set_canvas(canvas)
+        return fig
+
+    def release(self, fig):
+        canvas = fig.canvas
+        # Drop the artists (and the data they hold) right away rather than whenever the figure is collected
+        fig.clear()
+        with self._lock:
+            self._live -= 1
+            self._stats['released'] += 1
+            if self.reuse_canvas and len(self._canvases) < self.max_idle:
+                self._canvases.append(canvas)
+
+    @contextmanager
+    def figure(self):
+        fig = self.acquire()
+        try:
+            yield fig
+        finally:
+            self.release(fig)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['live'] = self._live
+            stats['idle_canvases'] = len(self._canvases)
+        stats['rss'] = memory_usage()
+        return stats
+
+
+# One manager per process (each render worker has its own)
+_figures = None
+_figures_lock = threading.Lock()
+
+def get_figure_manager():
+    global _figures
+    with _figures_lock:
+        if _figures is None:
+            _figures = FigureManager()
+        return _figures
+
+
+class ChartCache:
+    # Encoded charts keyed by (chart id, widget parameters, data version), evicted least recently
+    # used first once the cached bytes exceed max_bytes. A hit never touches matplotlib.
+    def __init__(self, max_bytes=CHART_CACHE_BYTES, format=CHART_FORMAT):
+        self.max_bytes = max_bytes
+        self.format = format
+        self._lock = threading.Lock()
+        self._charts = OrderedDict()
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        with self._lock:
+            chart = self._charts.get(key)
+            if chart is None:
+                self._stats['misses'] += 1
+                return None
+            self._charts.move_to_end(key)
+            self._stats['hits'] += 1
+            return chart
+
+    def put(self, key, chart):
+        if len(chart) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._charts:
+                self._bytes -= len(self._charts.pop(key))
+            self._charts[key] = chart
+            self._bytes += len(chart)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._charts.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats['evictions'] += 1
+
+    def key(self, chart_id, params, version):
+        return (chart_id, params, version, self.format)
+
+    def render(self, chart_id, params, version, draw):
+        # draw(fig) draws the chart on a managed figure; it only runs on a miss
+        key = self.key(chart_id, params, version)
+        chart = self.get(key)
+        if chart is None:
+            with get_figure_manager().figure() as fig:
+                draw(fig)
+                chart = figure_bytes(fig, self.format)
+            self.put(key, chart)
+        return chart
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._charts)
+            stats['bytes'] = self._bytes
+        return stats
+
+
+# One cache per process, shared across Streamlit sessions and reruns
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_chart_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ChartCache()
+        return _cache
+
+
+# Prerendered charts ==========================================================
+
+def chart_file(chart_id, params, format=CHART_FORMAT):
+    # File name of a prerendered chart; the widget parameters are hashed since they hold team names
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+    return f"{chart_id}-{digest}.{format}"
+
+def version_dir(version, root=REPORT_DIR):
+    return os.path.join(root, version)
+
+def report_complete(version, root=REPORT_DIR):
+    # The manifest is written last, so a report still being written is never served
+    return os.path.exists(os.path.join(version_dir(version, root), 'manifest.json'))
+
+
+class PrerenderedCharts:
+    # Read-only view of the report directory for ChartBatch. A chart key names its data version, so
+    # a report of an older version is simply never found.
+    def __init__(self, root=REPORT_DIR):
+        self.root = root
+        # Versions whose report is complete; a missing one is checked again on the next lookup,
+        # since the report may be written while the app runs
+        self._complete = set()
+
+    def get(self, key):
+        chart_id, params, version, format = key
+        if version not in self._complete:
+            if not report_complete(version, self.root):
+                return None
+            self._complete.add(version)
+        try:
+            with open(os.path.join(version_dir(version, self.root), 'charts', chart_file(chart_id, params, format)), 'rb') as file:
+                return file.read()
+        except OSError:
+            return None
+
+
+_prerendered = None
+
+def get_prerendered_charts():
+    global _prerendered
+    if not REPORT_DIR:
+        return None
+    with _cache_lock:
+        if _prerendered is None:
+            _prerendered = PrerenderedCharts()
+        return _prerendered
+
+
+# Rendering ===================================================================
+
+def render_spec(kind, args, format=CHART_FORMAT):
+    # Draw one chart from its spec and encode it; runs in a worker process
+    with get_figure_manager().figure() as fig:
+        CHART_TYPES[kind](fig, **args)
+        return figure_bytes(fig, format)
+
+def timed_render_spec(kind, args, format=CHART_FORMAT):
+    # render_spec for the worker pool: spans recorded in a worker would never reach the page's trace,
+    # so the worker reports its render time along with the chart
+    start = time.perf_counter()
+    chart = render_spec(kind, args, format)
+    return chart, time.perf_counter() - start
+
+
+class ChartBatch:
+    # The charts of one page, each described as a spec (chart type plus keyword arguments) and
+    # rendered together: hits come straight from the chart cache and misses are rendered
+    # concurrently in the shared worker pool (see workers.py), so a page waits for its slowest chart
+    # rather than for all of them in turn. A miss is first looked up among the prerendered charts of
+    # this data version (see report.py). flush() hands the charts back in the order they were added.
+    def __init__(self, version, cache=None, pool=None, prerendered=None):
+        self.version = version
+        self.cache = cache or get_chart_cache()
+        self.pool = pool or get_worker_pool()
+        self.prerendered = prerendered or get_prerendered_charts()
+        self._charts = []
+
+    def add(self, target, chart_id, params, kind, args):
+        # target: where the chart goes (passed back to place() on flush)
+        # args: keyword arguments of the chart function, or a function returning them when they are
+        # costly to build (it only runs on a cache miss)
+        self._charts.append((target, self.cache.key(chart_id, params, self.version), kind, args))
+
+    def _render(self, kind, args):
+        with span('chart.render', kind=kind):
+            return render_spec(kind, args, self.cache.format)
+
+    def _submit(self, kind, args):
+        # The chart rendered here, or a Future of it, with the pool rendering it (None when rendered here)
+        pool = self.pool
+        if pool is not None:
+            try:
+                return pool.submit(timed_render_spec, kind, args, self.cache.format), pool
+            except (BrokenProcessPool, RuntimeError):
+                self._drop_pool(pool)
+        return self._render(kind, args), None
+
+    def _drop_pool(self, pool):
+        # Several charts of the batch may find the same pool broken; it is reset once per batch
+        if self.pool is pool:
+            self.pool = None
+            reset_worker_pool(pool)
+
+    def flush(self, place):
+        with span('charts.flush', charts=len(self._charts)) as flush_span:
+            hits, prerendered = self._flush(place)
+            flush_span.set(hits=hits, prerendered=prerendered)
+
+    def _flush(self, place):
+        charts, self._charts = self._charts, []
+        # Look everything up and submit every miss before waiting on any of them
+        ready = {}
+        rendering = {}
+        prerendered = 0
+        for _, key, kind, args in charts:
+            if key in ready or key in rendering:
+                continue
+            chart = self.cache.get(key)
+            if chart is None and self.prerendered is not None:
+                chart = self.prerendered.get(key)
+                if chart is not None:
+                    self.cache.put(key, chart)
+                    prerendered += 1
+            if chart is not None:
+                ready[key] = chart
+                continue
+            if callable(args):
+                args = args()
+            rendering[key] = (kind, args) + self._submit(kind, args)
+        for target, key, _, _ in charts:
+            if key not in ready:
+                kind, args, chart, pool = rendering[key]
+                if isinstance(chart, Future):
+                    try:
+                        chart, seconds = chart.result()
+                        record('chart.render', seconds, kind=kind, worker=True)
+                    except (BrokenProcessPool, CancelledError):
+                        self._drop_pool(pool)
+                        chart = self._render(kind, args)
+                self.cache.put(key, chart)
+                ready[key] = chart
+            place(target, ready[key])
+        return len(charts) - len(rendering) - prerendered, prerendered
+
+
+# Charts ======================================================================
+# Each function draws plain values onto an empty figure (see FigureManager).
+
+def bar_chart(fig, labels, values, title, xlabel, ylabel, average=None, average_text=None):
+    ax = fig.subplots()
+    ax.bar(labels, values)
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    if average is not None:
+        # add a line which shows the average
+        ax.axhline(y=average, color='r', linestyle='-')
+        # add a text which shows the average
+        ax.text(0.5, 0.95, average_text, fontsize=10, weight='bold', ha='center', transform=ax.transAxes)
+
+def line_chart(fig, x, series, labels, title, xlabel, ylabel, invert_y=False, legend_limit=30):
+    # One line per column of series (len(x) x len(labels)), e.g. each team's points per matchday
+    ax = fig.subplots()
+    ax.plot(x, series, linewidth=1)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    if invert_y:
+        ax.invert_yaxis()
+    if len(labels) <= legend_limit:
+        ax.legend(labels, fontsize=5, loc='upper left', bbox_to_anchor=(1.01, 1))
+
+def stacked_bar_chart(fig, labels, stacks, stack_labels, colors, title, xlabel, ylabel):
+    # stacks: one array of values per stack_label, piled up for every label
+    ax = fig.subplots()
+    bottom = np.zeros(len(labels))
+    for values, label, color in zip(stacks, stack_labels, colors):
+        ax.bar(labels, values, bottom=bottom, label=label, color=color)
+        bottom = bottom + np.asarray(values)
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.legend(fontsize=7, loc='upper left', bbox_to_anchor=(1.01, 1))
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+
+def regression_chart(fig, x, y, labels, lines, title, xlabel, ylabel, label_limit=40):
+    # One point per team with its name (up to label_limit teams), and lines: (label, x, y) fitted curves
+    ax = fig.subplots()
+    ax.scatter(x, y, color='#377B2B', s=12)
+    if len(labels) <= label_limit:
+        for label, point_x, point_y in zip(labels, x, y):
+            ax.annotate(label, (point_x, point_y), xytext=(3, 3), textcoords='offset points', fontsize=5)
+    for label, line_x, line_y in lines:
+        ax.plot(line_x, line_y, linewidth=1, label=label)
+    ax.legend(fontsize=7)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+
+def pie_chart(fig, values, labels, colors, title, texts=()):
+    # texts: (x, y, text) annotations, e.g. the number of matches in each slice. With nothing to share
+    # out yet (e.g. no home match played early in the season) an empty grey pie is drawn instead:
+    # matplotlib cannot place the slices of a zero total
+    ax = fig.subplots()
+    if np.sum(values) > 0:
+        ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
+    else:
+        ax.pie([1], colors=['#DDDDDD'], startangle=90)
+        ax.text(0, 0.1, "No matches yet", fontsize=10, ha='center')
+    for x, y, text in texts:
+        ax.text(x, y, text, fontsize=10, weight='bold', ha='center')
+    ax.axis('equal')
+    ax.set_title(title)
+
+def comparison_chart(fig, names, values, title, xlabel, ylabel):
+    # One bar per team, each in its own color
+    ax = fig.subplots()
+    for name, value in zip(names, values):
+        ax.bar(name, value)
+    ax.tick_params(axis='x', labelrotation=0)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+
+def grouped_bar_chart(fig, category_names, series, title, ylabel):
+    # series: (label, values) per team, drawn side by side for every category
+    ax = fig.subplots()
+    bar_width = 0.35
+    index = np.arange(len(category_names))
+    for i, (label, values) in enumerate(series):
+        ax.bar(index + i * bar_width, values, bar_width, label=label)
+    ax.set_xticks(index + bar_width / 2, category_names)
+    ax.legend()
+    ax.set_title(title)
+    ax.set_ylabel(ylabel)
+
+def heatmap_chart(fig, matrix, labels, cmap, title="Match Results Heatmap", xlabel='Away Team', ylabel='Home Team',
+                  scale_labels=('Away', 'Draw', 'Home'), column_labels=None, annotation_format='%.2g', annotation_scale=1):
+    # matrix: team x team values in [0, 1] (NaN for empty cells), labels: team names in matrix order,
+    # scale_labels: what 0, 0.5 and 1 mean, column_labels: the columns when they are not the teams,
+    # annotation_format/annotation_scale: how cell values are written (e.g. '%.0f' and 100 for percents)
+    n_teams = len(labels)
+    column_labels = labels if column_labels is None else column_labels
+    ax = fig.subplots()
+    heatmap = ax.imshow(matrix, cmap=cmap, interpolation='nearest', vmin=0, vmax=1)
+    # Set the colorbar to show the mapping of values to colors
+    cbar = fig.colorbar(heatmap, ax=ax, ticks=[0, 0.5, 1])
+    cbar.ax.set_yticklabels(list(scale_labels))
+    # Tick labels: every team while they stay readable, every k-th team up to HEATMAP_LABEL_LIMIT, none beyond
+    if n_teams <= HEATMAP_LABEL_LIMIT:
+        step = max(1, int(np.ceil(n_teams / HEATMAP_ANNOTATION_LIMIT)))
+        ticks = np.arange(0, n_teams, step)
+        # Rotate the x tick labels and set their alignment
+        ax.set_xticks(ticks, [column_labels[i] for i in ticks], rotation=45, ha='right', rotation_mode='anchor', fontsize=5)
+        ax.set_yticks(ticks, [labels[i] for i in ticks], fontsize=5)
+    else:
+        ax.set_xticks([])
+        ax.set_yticks([])
+    # x-axis label
+    ax.set_xlabel(xlabel)
+    # y-axis label
+    ax.set_ylabel(ylabel)
+    if n_teams <= HEATMAP_ANNOTATION_LIMIT:
+        annotate_cells(ax, matrix, annotation_format, annotation_scale)
+    ax.set_title(title)
+    fig.tight_layout()
+
+def annotate_cells(ax, matrix, format='%.2g', scale=1):
+    # Write every played cell's value in one batched pass: cells are grouped by their label and each
+    # group is drawn as a single scatter of text-shaped markers, instead of one Text artist per cell
+    # (scatter must not rescale the image axes)
+    from matplotlib.textpath import TextPath
+
+    ax.autoscale(False)
+    rows, columns = np.nonzero(~np.isnan(matrix))
+    labels = np.char.mod(format, matrix[rows, columns] * scale)
+    # Markers are scaled by their longest side, so size each one to keep the digits 3pt high
+    digit_height = TextPath((0, 0), '0').get_extents().height
+    for label in np.unique(labels):
+        selected = labels == label
+        marker = f'$\\mathrm{{{label}}}$'
+        extents = TextPath((0, 0), marker).get_extents()
+        size = 3 * max(extents.width, extents.height) / digit_height
+        ax.scatter(columns[selected], rows[selected], marker=marker, s=size ** 2, c='black', linewidths=0)
+
+
+# Chart types a spec can name
+CHART_TYPES = {
+    'bar': bar_chart,
+    'line': line_chart,
+    'stacked_bar': stacked_bar_chart,
+    'pie': pie_chart,
+    'comparison': comparison_chart,
+    'grouped_bar': grouped_bar_chart,
+    'heatmap': heatmap_chart,
+    'regression': regression_chart,
+}
@@ -0,0 +1,851 @@
+import contextvars
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from db import MissingRelation
+from stats import build_comparison, build_team_stats, season_summary
+from tracing import span, traced
+
+# Queries over one partition (league/season) take its table names: {teams}, {matches} and {results}
+# for the team_venue_results view (see partition_query)
+
+# Query
+teams_query = """
+    SELECT "Rank", "TeamID", "TeamName", "MarketValue", "M", "W", "D", "L", "G", "GA", "PTS", "xG", "xGA", "xPTS"
+    FROM {teams}
+    -- LIMIT 10;
+"""
+
+# Matches query
+matches_query = """
+    SELECT "matchId", "matchday", "homeTeamId", "awayTeamId", "homeScore", "awayScore", "played"
+    FROM {matches}
+    -- LIMIT 10;
+"""
+
+# Select all tables
+all_tables_query = """
+    SELECT table_name
+    FROM information_schema.tables
+    WHERE table_schema='public'
+    AND table_type='BASE TABLE';
+"""
+
+# Matches added after the watermark (the highest matchId seen so far) or played since the last sync
+matches_delta_query = """
+    SELECT "matchId", "matchday", "homeTeamId", "awayTeamId", "homeScore", "awayScore", "played"
+    FROM {matches}
+    WHERE "matchId" > %(after)s OR ("matchId" = ANY(%(pending)s) AND "played");
+"""
+
+# Matches counted per team, venue and result (from the team's point of view) in a single GROUP BY.
+# Fixtures that are not played yet are counted as 'pending'.
+team_venue_results_select = """
+    SELECT team_id, venue, result, COUNT(*)
+    FROM (
+        SELECT "homeTeamId" AS team_id, 'home' AS venue,
+            CASE WHEN NOT "played" THEN 'pending' WHEN "homeScore" > "awayScore" THEN 'win' WHEN "homeScore" = "awayScore" THEN 'draw' ELSE 'lose' END AS result
+        FROM {matches}
+        UNION ALL
+        SELECT "awayTeamId" AS team_id, 'away' AS venue,
+            CASE WHEN NOT "played" THEN 'pending' WHEN "awayScore" > "homeScore" THEN 'win' WHEN "awayScore" = "homeScore" THEN 'draw' ELSE 'lose' END AS result
+        FROM {matches}
+    ) AS team_matches
+    GROUP BY team_id, venue, result
+"""
+
+# The same aggregate kept as a materialized view. The ingest job refreshes it after loading new matches
+# (see refresh_team_venue_results); until the view exists the app runs team_venue_results_select directly.
+# A view that has not been refreshed since matches were added or played no longer counts every match
+# twice (home and away), so it returns no rows and the aggregate runs inline instead.
+team_venue_results_view_query = """
+    SELECT team_id, venue, result, count FROM {results}
+    WHERE (SELECT SUM(count) FROM {results}) = 2 * (SELECT COUNT(*) FROM {matches})
+        AND (SELECT SUM(count) FROM {results} WHERE result <> 'pending') = 2 * (SELECT COUNT(*) FROM {matches} WHERE "played");
+"""
+
+TEAM_RESULTS_COLUMNS = ['home_win', 'home_draw', 'home_lose', 'home_pending', 'away_win', 'away_draw', 'away_lose', 'away_pending']
+
+# Score checksum of the matches: weighted by matchId and by side, so a corrected score changes it even
+# when the goal total stays the same (2-1 -> 1-2, or a goal moved between matches). The constants
+# are spelled out in fingerprint_query; matches_fingerprint computes the same sum from a frame.
+SCORE_CHECKSUM_MODULUS = 1009
+SCORE_CHECKSUM_BASE = 64
+
+# Cheap fingerprint of both tables: changes whenever a row is added, a match is played or a score/standing is corrected
+fingerprint_query = """
+    SELECT
+        (SELECT COUNT(*) FROM {teams}),
+        (SELECT COALESCE(SUM("PTS"), 0) FROM {teams}),
+        (SELECT COALESCE(SUM("MarketValue"), 0) FROM {teams}),
+        (SELECT md5(string_agg(CAST("TeamID" AS text) || ':' || "TeamName", ',' ORDER BY "TeamID")) FROM {teams}),
+        (SELECT COUNT(*) FROM {matches}),
+        (SELECT MAX("matchId") FROM {matches}),
+        (SELECT COUNT(*) FROM {matches} WHERE "played"),
+        (SELECT COALESCE(SUM(("matchId" % 1009 + 1) * ("homeScore" * 64 + "awayScore" + 1)), 0) FROM {matches});
+"""
+
+# Where fingerprint_query's columns sit in a fingerprint: the teams table, the TeamID -> TeamName
+# mapping among them (unlike the points, it does not change every matchday), and the matches table
+TEAMS_FINGERPRINT = slice(0, 4)
+TEAM_NAMES_FINGERPRINT = slice(3, 4)
+MATCHES_FINGERPRINT = slice(4, None)
+
+# Match result codes, from the home team's point of view
+RESULT_PENDING = -1
+RESULT_AWAY = 0
+RESULT_DRAW = 1
+RESULT_HOME = 2
+# Indexed by result code; RESULT_PENDING (-1) picks the trailing None
+RESULT_LABELS = np.array(['Away', 'Draw', 'Home', None], dtype=object)
+
+TEAMS_COLUMNS = ['Rank','TeamID','TeamName','MarketValue','M','W','D','L','G','GA','PTS','xG','xGA','xPTS']
+MATCHES_COLUMNS = ['matchId','matchday','homeTeamId','awayTeamId','homeScore','awayScore', 'played']
+
+# Refresh matches by fetching only changed rows; a full reload is used when this is off or the sync cannot be verified
+INCREMENTAL_SYNC = os.environ.get('DATA_INCREMENTAL_SYNC', '1') != '0'
+
+# Store the cleaned frames in the compact schema (categorical teams, int8 scores and results, bool played)
+COMPACT_SCHEMA = os.environ.get('DATA_COMPACT_SCHEMA', '1') != '0'
+
+# Seconds between fingerprint checks; reruns inside this window are served without touching the database
+FINGERPRINT_INTERVAL = float(os.environ.get('DATA_FINGERPRINT_INTERVAL', 5))
+
+# Seconds between re-listing the partitions (new seasons/leagues show up after at most this long)
+PARTITIONS_INTERVAL = float(os.environ.get('DATA_PARTITIONS_INTERVAL', 60))
+
+# Matches shown per page of the matches table
+MATCHES_PAGE_SIZE = int(os.environ.get('DATA_MATCHES_PAGE_SIZE', 50))
+
+# Threads fetching a page's datasets concurrently over the connection pool on a cold cache (1 fetches
+# them one after the other); keep it below DB_POOL_SIZE so other sessions still get a connection
+FETCH_WORKERS = int(os.environ.get('DATA_FETCH_WORKERS', 4))
+
+# Where the frames come from: 'live' (the database), 'snapshot' (the local snapshots written by
+# `python -m snapshot`, no database needed) or 'snapshot+live' (boot from the snapshots, follow the
+# database once it changes, fall back to the snapshots while it is unreachable)
+DATA_SOURCE = os.environ.get('DATA_SOURCE', 'live')
+
+# One league/season: a teams table, a matches table and the team_venue_results view over the matches.
+# The original unsuffixed tables are the default partition; other partitions are stored as
+# teams_<league>_<season> and matches_<league>_<season>, e.g. teams_laliga_2023_24.
+Partition = namedtuple('Partition', ['league', 'season', 'teams_table', 'matches_table', 'results_view'])
+DEFAULT_PARTITION = Partition(None, None, 'teams', 'matches', 'team_venue_results')
+PARTITION_TABLE = re.compile(r'^teams_(?P<league>[a-z][a-z0-9]*)_(?P<season>[0-9]{4}(?:_[0-9]{2,4})?)$')
+
+
+def make_partition(league, season):
+    suffix = f"{league}_{season}"
+    return Partition(league, season, f"teams_{suffix}", f"matches_{suffix}", f"team_venue_results_{suffix}")
+
+def partition_label(partition):
+    if partition.league is None:
+        return "Current season"
+    return f"{partition.league.upper()} {partition.season.replace('_', '/')}"
+
+def partition_query(query, partition=DEFAULT_PARTITION):
+    # Table names only ever come from PARTITION_TABLE matches, so they are safe to format in
+    return query.format(teams=partition.teams_table, matches=partition.matches_table, results=partition.results_view)
+
+def find_partitions(table_names):
+    # Partitions with both of their tables present: the default one first, then by league and newest season
+    table_names = set(table_names)
+    partitions = []
+    for name in table_names:
+        match = PARTITION_TABLE.match(name)
+        if match:
+            partition = make_partition(match['league'], match['season'])
+            if partition.matches_table in table_names:
+                partitions.append(partition)
+    partitions.sort(key=lambda partition: (partition.league, [-int(part) for part in partition.season.split('_')]))
+    if {DEFAULT_PARTITION.teams_table, DEFAULT_PARTITION.matches_table} <= table_names:
+        partitions.insert(0, DEFAULT_PARTITION)
+    return partitions
+
+@traced('clean.teams')
+def cleanTeams(data):
+    # Move "Rank column to the first column"
+    data = data[TEAMS_COLUMNS]
+    # Sort the data by rank
+    data = data.sort_values(by=['Rank'])
+    if COMPACT_SCHEMA:
+        data = compact_teams(data)
+    return data
+
+@traced('clean.matches')
+def cleanMatches(data, team_data):
+    # change the homeTeamId and awayTeamId into team name with one hash lookup per row
+    team_names = dict(zip(team_data['TeamID'], team_data['TeamName']))
+    data['homeTeamId'] = data['homeTeamId'].map(team_names)
+    data['awayTeamId'] = data['awayTeamId'].map(team_names)
+    # keep played as a boolean; 'Yes'/'No' is only used for display (see matches_for_display)
+    played = data['played'].fillna(False).astype(bool)
+    data['played'] = played
+    # add a new column called "result" holding a result code: the sign of the goal difference shifted
+    # to RESULT_AWAY/RESULT_DRAW/RESULT_HOME, or RESULT_PENDING if match is not played yet
+    goal_difference = (data['homeScore'] - data['awayScore']).to_numpy(dtype=float)
+    scored = played.to_numpy() & ~np.isnan(goal_difference)
+    data['result'] = np.where(scored, np.sign(np.where(scored, goal_difference, 0)) + 1, RESULT_PENDING).astype(np.int8)
+
+    if COMPACT_SCHEMA:
+        data = compact_matches(data, team_data)
+    return data
+
+def team_axis(team_data):
+    # The teams in TeamID order. Unlike team_data's Rank order it does not move when the ranking does,
+    # so it is the team axis of everything kept across data versions (the team dictionary, the
+    # standings and the rollup); views reorder by team_data for display.
+    return team_data.sort_values('TeamID')
+
+def team_dtype(team_data):
+    # One categorical dictionary of team names, shared by every team column of every frame, in
+    # team_axis order so cached codes stay valid when the ranking changes
+    return pd.CategoricalDtype(categories=team_axis(team_data)['TeamName'].tolist())
+
+def compact_teams(data):
+    # Table counts fit in int16; market values and the expected stats keep their precision
+    return data.astype({column: np.int16 for column in ['Rank', 'M', 'W', 'D', 'L', 'G', 'GA', 'PTS']})
+
+def compact_matches(data, team_data):
+    # Team names become codes into the shared dictionary, scores nullable int8, ids and matchdays int32
+    teams = team_dtype(team_data)
+    return data.astype({
+        'matchId': np.int32,
+        'matchday': np.int16,
+        'homeTeamId': teams,
+        'awayTeamId': teams,
+        'homeScore': 'Int8',
+        'awayScore': 'Int8',
+    })
+
+def team_codes(column, team_data):
+    # Integer code of each row's team (position in team_data, -1 if unknown), without string compares:
+    # categorical codes are mapped from the dictionary's order to team_data's through a small lookup
+    names = pd.Index(team_data['TeamName'])
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # The trailing -1 is where the missing code (-1) lands
+        positions = np.append(names.get_indexer(column.cat.categories), -1)
+        return positions[column.cat.codes.to_numpy()].astype(np.intp)
+    return pd.Categorical(column, categories=names).codes.astype(np.intp)
+
+def frame_memory(data):
+    # Bytes held by a frame, strings included
+    return int(data.memory_usage(index=True, deep=True).sum())
+
+def matches_for_display(matches_data):
+    # Labels for the result codes and played flags, only for the rows being shown. Scores are
+    # nullable ints in either schema (float with NaN when the compact schema is off).
+    return matches_data.assign(
+        played=np.where(matches_data['played'], 'Yes', 'No'),
+        result=RESULT_LABELS[matches_data['result'].to_numpy()],
+        homeScore=matches_data['homeScore'].astype('Int64'),
+        awayScore=matches_data['awayScore'].astype('Int64'),
+    )
+
+def matches_order(matches_data):
+    # Keyset index for paging through the matches by (matchday, matchId): the sorted keys and the
+    # row positions in that order
+    keys = match_key(matches_data['matchday'].to_numpy(), matches_data['matchId'].to_numpy())
+    order = np.argsort(keys, kind='stable')
+    return keys[order], order
+
+def match_key(matchday, match_id):
+    # (matchday, matchId) packed into one sortable int64
+    return np.left_shift(np.asarray(matchday, dtype=np.int64), 32) | np.asarray(match_id, dtype=np.int64)
+
+def matches_page(matches_data, index, start_key=None, size=MATCHES_PAGE_SIZE):
+    # The page of matches starting at the first key >= start_key (the first page when None), and the
+    # start keys of the previous and next pages (None at either end). A key stays on the same match
+    # when matches are added, unlike an offset.
+    keys, order = index
+    start = 0 if start_key is None else int(np.searchsorted(keys, start_key, side='left'))
+    # Past the end (e.g. the cursor came from a longer partition): the last page
+    if start >= len(keys):
+        start = max(len(keys) - size, 0)
+    stop = min(start + size, len(keys))
+    previous_key = int(keys[max(start - size, 0)]) if start > 0 else None
+    next_key = int(keys[stop]) if stop < len(keys) else None
+    return matches_data.iloc[order[start:stop]], previous_key, next_key
+
+# Each dataset is fetched as raw rows and then built into its frame, so the fetches of a page can
+# run concurrently (see fetch_concurrently) while the building keeps its order
+def fetch_teams(execute, partition=DEFAULT_PARTITION):
+    return execute(partition_query(teams_query, partition))
+
+def fetch_matches(execute, partition=DEFAULT_PARTITION):
+    return execute(partition_query(matches_query, partition))
+
+def fetch_tables(execute, partition=DEFAULT_PARTITION):
+    return execute(all_tables_query)
+
+def fetch_team_results(execute, partition=DEFAULT_PARTITION):
+    try:
+        rows = execute(partition_query(team_venue_results_view_query, partition))
+    except MissingRelation:
+        rows = []
+    # No rows: no view yet, a stale one, or no matches at all
+    return rows or execute(partition_query(team_venue_results_select, partition))
+
+def teams_frame(rows):
+    return cleanTeams(pd.DataFrame(rows, columns=TEAMS_COLUMNS))
+
+def matches_frame(rows, team_data):
+    return cleanMatches(pd.DataFrame(rows, columns=MATCHES_COLUMNS), team_data)
+
+def tables_frame(rows):
+    return pd.DataFrame(rows, columns=['table_name'])
+
+# Raw rows each dataset is built from
+FETCHES = {'teams': fetch_teams, 'matches': fetch_matches, 'tables': fetch_tables, 'team_results': fetch_team_results}
+DATASET_FETCHES = {
+    'teams': ['teams'],
+    'matches': ['teams', 'matches'],
+    'matches_order': ['teams', 'matches'],
+    'standings': ['teams', 'matches'],
+    'rollup': ['teams', 'matches'],
+    'tables': ['tables'],
+    'team_results': ['teams', 'team_results'],
+    'team_stats': ['teams', 'team_results'],
+    'team_index': ['teams', 'team_results'],
+    'team_comparison': ['teams', 'team_results'],
+    'market_value_model': ['teams'],
+    'season_projection': ['teams', 'matches'],
+}
+
+# One thread pool per process for the fetches, started on the first concurrent fetch
+_fetch_pool = None
+_fetch_pool_lock = threading.Lock()
+
+def get_fetch_pool():
+    global _fetch_pool
+    with _fetch_pool_lock:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='fetch')
+        return _fetch_pool
+
+def fetch_concurrently(execute, names, partition=DEFAULT_PARTITION):
+    # Issue the fetches together, each on its own pooled connection, and wait for all of them.
+    # Returns the rows by name and the latencies: 'total' is what fetching them one after the other
+    # would have cost, 'critical_path' the slowest fetch, which is all a concurrent fetch waits for.
+    def timed(name):
+        start = time.perf_counter()
+        rows = FETCHES[name](execute, partition)
+        return rows, time.perf_counter() - start
+
+    with span('data.fetch', datasets=','.join(names)) as fetch_span:
+        start = time.perf_counter()
+        if FETCH_WORKERS > 1 and len(names) > 1:
+            pool = get_fetch_pool()
+            # Each task runs in a copy of this context, so its spans join the current trace
+            futures = {name: pool.submit(contextvars.copy_context().run, timed, name) for name in names}
+            results = {name: future.result() for name, future in futures.items()}
+        else:
+            results = {name: timed(name) for name in names}
+        latency = {
+            'total': sum(seconds for _, seconds in results.values()),
+            'critical_path': max((seconds for _, seconds in results.values()), default=0.0),
+            'wall': time.perf_counter() - start,
+        }
+        fetch_span.set(**{f"{name}_ms": round(seconds * 1e3, 2) for name, seconds in latency.items()})
+    return {name: rows for name, (rows, _) in results.items()}, latency
+
+def load_teams(execute, partition=DEFAULT_PARTITION):
+    return teams_frame(fetch_teams(execute, partition))
+
+def load_matches(execute, team_data, partition=DEFAULT_PARTITION):
+    return matches_frame(fetch_matches(execute, partition), team_data)
+
+def refresh_team_venue_results(execute, partition=DEFAULT_PARTITION):
+    # Called by the ingest job after new matches are loaded into a partition
+    execute(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {partition.results_view} AS {partition_query(team_venue_results_select, partition)}")
+    execute(f"REFRESH MATERIALIZED VIEW {partition.results_view}")
+
+def add_match_totals(results):
+    results['home_matches'] = results[['home_win', 'home_draw', 'home_lose']].sum(axis=1)
+    results['away_matches'] = results[['away_win', 'away_draw', 'away_lose']].sum(axis=1)
+    return results
+
+def load_team_results(execute, team_data, partition=DEFAULT_PARTITION):
+    # Home/away win, draw, lose and pending counts per team, indexed by team name. Only the tiny
+    # aggregate crosses the network, never the matches themselves.
+    return team_results_frame(fetch_team_results(execute, partition), team_data)
+
+def team_results_frame(rows, team_data):
+    results = pd.DataFrame(rows, columns=['TeamID', 'venue', 'result', 'count'])
+    results['column'] = results['venue'] + '_' + results['result']
+    results = results.pivot_table(index='TeamID', columns='column', values='count', aggfunc='sum')
+    # Teams without matches still get a row of zeros
+    results = results.reindex(index=team_data['TeamID'], columns=TEAM_RESULTS_COLUMNS).fillna(0).astype(int)
+    results.index = team_data['TeamName'].tolist()
+    results.columns.name = None
+    return add_match_totals(results)
+
+def team_results_from_matches(matches_data, team_data):
+    # The same counts computed from a cleaned matches frame in one vectorized pass, for when the
+    # matches are already in memory: each row adds one to (team code, position in TEAM_RESULTS_COLUMNS)
+    n_teams = len(team_data)
+    # Result code (-1..2) to column position, from the home and from the away team's point of view
+    result = matches_data['result'].to_numpy().astype(np.intp) + 1
+    home_cells = team_codes(matches_data['homeTeamId'], team_data) * 8 + np.array([3, 2, 1, 0])[result]
+    away_cells = team_codes(matches_data['awayTeamId'], team_data) * 8 + np.array([7, 4, 5, 6])[result]
+    cells = np.concatenate([home_cells, away_cells])
+    counts = np.bincount(cells[cells >= 0], minlength=n_teams * 8).reshape(n_teams, 8)
+    results = pd.DataFrame(counts, index=team_data['TeamName'].tolist(), columns=TEAM_RESULTS_COLUMNS)
+    return add_match_totals(results)
+
+def match_results_matrix(matches_data, team_data):
+    # Dense home x away matrix (rows/columns in team_data order) of the mean result code scaled to
+    # 0 (away win), 0.5 (draw) and 1 (home win); NaN where the fixture has not been played.
+    # Built by array indexing on the team codes, no pivot and no string compares.
+    n_teams = len(team_data)
+    result = matches_data['result'].to_numpy()
+    home = team_codes(matches_data['homeTeamId'], team_data)
+    away = team_codes(matches_data['awayTeamId'], team_data)
+    cells = home * n_teams + away
+    keep = (result != RESULT_PENDING) & (home >= 0) & (away >= 0)
+    cells = cells[keep]
+    totals = np.bincount(cells, weights=result[keep] / 2, minlength=n_teams * n_teams)
+    counts = np.bincount(cells, minlength=n_teams * n_teams)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (totals / counts).reshape(n_teams, n_teams)
+
+def matches_fingerprint(matches_data):
+    # Same numbers as the matches part of fingerprint_query, computed from a cleaned frame
+    played = matches_data['played']
+    match_id = matches_data['matchId'].to_numpy(dtype=np.int64)
+    home = matches_data['homeScore'].to_numpy(dtype=float, na_value=np.nan)
+    away = matches_data['awayScore'].to_numpy(dtype=float, na_value=np.nan)
+    checksum = np.nansum((match_id % SCORE_CHECKSUM_MODULUS + 1) * (home * SCORE_CHECKSUM_BASE + away + 1))
+    return (len(matches_data), int(matches_data['matchId'].max()), int(played.sum()), int(checksum))
+
+@traced('data.sync_matches')
+def sync_matches(execute, matches_data, team_data, fingerprint, partition=DEFAULT_PARTITION):
+    # Fetch only the rows past the watermark or still unplayed, clean them and merge them into a new
+    # frame; matches_data is shared by the sessions still on its version and is left untouched.
+    # Returns the merged frame and the number of rows synced, or None when the result does not match
+    # the database fingerprint (e.g. an already played score was corrected).
+    if matches_data.empty:
+        return None
+    after = int(matches_data['matchId'].max())
+    pending = matches_data.loc[~matches_data['played'], 'matchId'].astype(int).tolist()
+    rows = execute(partition_query(matches_delta_query, partition), {'after': after, 'pending': pending})
+    delta = cleanMatches(pd.DataFrame(rows, columns=MATCHES_COLUMNS), team_data)
+
+    positions = pd.Index(matches_data['matchId']).get_indexer(delta['matchId'])
+    existing = positions >= 0
+    if existing.any():
+        changed = delta[existing]
+        matches_data = matches_data.copy()
+        for column in delta.columns:
+            matches_data.loc[matches_data.index[positions[existing]], column] = changed[column].values
+    if not existing.all():
+        matches_data = pd.concat([matches_data, delta[~existing]], ignore_index=True)
+
+    if matches_fingerprint(matches_data) != tuple(int(value or 0) for value in fingerprint):
+        return None
+    return matches_data, len(delta)
+
+
+class DataCache:
+    # Cleaned teams/matches frames of one partition, shared by every session. Entries are only
+    # rebuilt when the fingerprint of the partition's tables changes, so reruns do not touch the
+    # database at all. The frames are shared: callers must treat them as read-only.
+    def __init__(self, execute, partition=DEFAULT_PARTITION, fingerprint_interval=FINGERPRINT_INTERVAL):
+        self.execute = execute
+        self.partition = partition
+        self.fingerprint_interval = fingerprint_interval
+        # Guards the entries, the fingerprint and the stats, and is only held to read or publish them:
+        # entries are built outside it, under the build lock of their dataset, so a slow build (e.g.
+        # the model) only holds up the sessions waiting for that same dataset
+        self._lock = threading.RLock()
+        self._fingerprint = None
+        self._checked_at = None
+        # dataset name -> (fingerprint the frame was built from, frame)
+        self._entries = {}
+        # dataset name -> lock held while it is built. Builds may ask for other entries (derived from
+        # base ones, never the other way round), so these are only ever taken in that order.
+        self._build_locks = {}
+        # One concurrent fetch at a time, so two sessions on a cold cache do not fetch the same rows
+        self._prefetch_lock = threading.Lock()
+        # Held while the fingerprint is re-read, so one session at a time waits on the database
+        self._fingerprint_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'fingerprint_checks': 0, 'incremental_syncs': 0, 'full_reloads': 0, 'rows_synced': 0,
+                       'prefetches': 0, 'fetch_total_time': 0.0, 'fetch_critical_path_time': 0.0}
+
+    def fingerprint(self):
+        # Fingerprint of the tables right now (re-queried at most every fingerprint_interval seconds).
+        # Pass it to the accessors below to read everything for one render from the same data version.
+        # The database is queried outside the cache lock; while one session re-reads it, the others
+        # keep the previous fingerprint instead of waiting on a slow or unreachable database.
+        with self._lock:
+            previous = self._fingerprint
+            if previous is not None and time.monotonic() - self._checked_at < self.fingerprint_interval:
+                return previous
+        if not self._fingerprint_lock.acquire(blocking=previous is None):
+            return previous
+        try:
+            with self._lock:
+                if self._fingerprint is not None and time.monotonic() - self._checked_at < self.fingerprint_interval:
+                    return self._fingerprint
+            fingerprint = self._read_fingerprint()
+            with self._lock:
+                self._fingerprint = fingerprint
+                self._checked_at = time.monotonic()
+                self._stats['fingerprint_checks'] += 1
+            return fingerprint
+        finally:
+            self._fingerprint_lock.release()
+
+    # Where the data comes from; overridden by the snapshot store (see snapshot.SnapshotDataCache)
+    def _read_fingerprint(self):
+        row = self.execute(partition_query(fingerprint_query, self.partition))[0]
+        return {'teams': tuple(row[TEAMS_FINGERPRINT]), 'matches': tuple(row)}
+
+    def _load_teams(self, fingerprint):
+        return load_teams(self.execute, self.partition)
+
+    def _load_matches(self, fingerprint, team_data):
+        return load_matches(self.execute, team_data, self.partition)
+
+    def _load_team_results(self, fingerprint):
+        return load_team_results(self.execute, self.teams(fingerprint), self.partition)
+
+    def _load_tables(self, fingerprint):
+        return tables_frame(fetch_tables(self.execute, self.partition))
+
+    def _cached(self, name, fingerprint):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == fingerprint:
+                self._stats['hits'] += 1
+                return entry
+            return None
+
+    def _get(self, name, fingerprint, build):
+        entry = self._cached(name, fingerprint)
+        if entry is not None:
+            return entry[1]
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.RLock())
+        with build_lock:
+            # Another session may have built it while this one waited
+            entry = self._cached(name, fingerprint)
+            if entry is not None:
+                return entry[1]
+            with self._lock:
+                self._stats['misses'] += 1
+            with span('data.build', dataset=name, partition=partition_label(self.partition)):
+                frame = build()
+            with self._lock:
+                self._entries[name] = (fingerprint, frame)
+            return frame
+
+    def _syncable(self, entry, fingerprint):
+        # Matches embed team names, so an incremental sync is only valid while every TeamID keeps its
+        # name; points and ranks move every matchday and do not matter
+        return (INCREMENTAL_SYNC and entry is not None
+                and entry[0][TEAM_NAMES_FINGERPRINT] == fingerprint['matches'][TEAM_NAMES_FINGERPRINT])
+
+    def _refresh_matches(self, fingerprint, team_data):
+        entry = self._entries.get('matches')
+        if self._syncable(entry, fingerprint):
+            synced = sync_matches(self.execute, entry[1], team_data, fingerprint['matches'][MATCHES_FINGERPRINT], self.partition)
+            if synced is not None:
+                with self._lock:
+                    self._stats['incremental_syncs'] += 1
+                    self._stats['rows_synced'] += synced[1]
+                return synced[0]
+        with self._lock:
+            self._stats['full_reloads'] += 1
+        return self._load_matches(fingerprint, team_data)
+
+    def _reload_matches(self, rows, team_data):
+        with self._lock:
+            self._stats['full_reloads'] += 1
+        return matches_frame(rows, team_data)
+
+    def _current(self, name, fingerprint):
+        # Whether the dataset is cached for this fingerprint
+        entry = self._entries.get(name)
+        return entry is not None and entry[0] == fingerprint['teams' if name == 'teams' else 'matches']
+
+    def _pending_fetches(self, datasets, fingerprint):
+        fetches = set()
+        for name in datasets:
+            if name in DATASET_FETCHES and not self._current(name, fingerprint):
+                fetches.update(fetch for fetch in DATASET_FETCHES[name] if not self._current(fetch, fingerprint))
+        # Cached matches are brought up to date by an incremental sync instead (see _refresh_matches)
+        if 'matches' in fetches and self._syncable(self._entries.get('matches'), fingerprint):
+            fetches.discard('matches')
+        return sorted(fetches)
+
+    def prefetch(self, datasets, fingerprint=None):
+        # Fetch everything the datasets still need in one concurrent round trip, then build them (the
+        # matches once the teams are cleaned). With fewer than two fetches there is nothing to overlap
+        # and the datasets load lazily as usual.
+        fingerprint = fingerprint or self.fingerprint()
+        with self._prefetch_lock:
+            with self._lock:
+                fetches = self._pending_fetches(datasets, fingerprint)
+            if len(fetches) < 2:
+                return None
+            rows, latency = fetch_concurrently(self.execute, fetches, self.partition)
+            with self._lock:
+                self._stats['prefetches'] += 1
+                self._stats['fetch_total_time'] += latency['total']
+                self._stats['fetch_critical_path_time'] += latency['critical_path']
+            team_data = self._get('teams', fingerprint['teams'], lambda: teams_frame(rows['teams'])) if 'teams' in rows else self.teams(fingerprint)
+            if 'matches' in rows:
+                self._get('matches', fingerprint['matches'], lambda: self._reload_matches(rows['matches'], team_data))
+            if 'team_results' in rows:
+                self.derived('team_results', lambda: team_results_frame(rows['team_results'], team_data), fingerprint)
+            if 'tables' in rows:
+                self.derived('tables', lambda: tables_frame(rows['tables']), fingerprint)
+            return latency
+
+    def teams(self, fingerprint=None):
+        fingerprint = fingerprint or self.fingerprint()
+        return self._get('teams', fingerprint['teams'], lambda: self._load_teams(fingerprint))
+
+    def matches(self, fingerprint=None):
+        fingerprint = fingerprint or self.fingerprint()
+        team_data = self.teams(fingerprint)
+        return self._get('matches', fingerprint['matches'], lambda: self._refresh_matches(fingerprint, team_data))
+
+    def scan(self, fingerprint=None):
+        # The frames for a one-off pass (e.g. a cross-season view): served from the cache when this
+        # partition is already loaded, otherwise read without being kept
+        fingerprint = fingerprint or self.fingerprint()
+        with self._lock:
+            teams, matches = self._entries.get('teams'), self._entries.get('matches')
+            if teams is not None and matches is not None and teams[0] == fingerprint['teams'] and matches[0] == fingerprint['matches']:
+                self._stats['hits'] += 2
+                return teams[1], matches[1]
+        team_data = self._load_teams(fingerprint)
+        return team_data, self._load_matches(fingerprint, team_data)
+
+    def version(self, fingerprint=None):
+        # Short identifier of the partition and its data, for keying derived caches (e.g. rendered charts)
+        fingerprint = fingerprint or self.fingerprint()
+        return hashlib.sha1(repr((self.partition, fingerprint['matches'])).encode()).hexdigest()[:12]
+
+    def derived(self, name, build, fingerprint=None):
+        # Anything computed from the data (aggregates, indexes, models) is cached per data version too
+        fingerprint = fingerprint or self.fingerprint()
+        return self._get(name, fingerprint['matches'], build)
+
+    def tables(self, fingerprint=None):
+        # Tables in the database, only re-listed when the data changes
+        fingerprint = fingerprint or self.fingerprint()
+        return self.derived('tables', lambda: self._load_tables(fingerprint), fingerprint)
+
+    def team_results(self, fingerprint=None):
+        # Per-team home/away result counts, aggregated in the database
+        fingerprint = fingerprint or self.fingerprint()
+        return self.derived('team_results', lambda: self._load_team_results(fingerprint), fingerprint)
+
+    def team_stats(self, fingerprint=None):
+        # Per-team index shared by every section (see stats.build_team_stats)
+        fingerprint = fingerprint or self.fingerprint()
+        return self.derived('team_stats', lambda: build_team_stats(self.teams(fingerprint), self.team_results(fingerprint)), fingerprint)
+
+    def team_index(self, fingerprint=None):
+        # The same stats as plain dicts keyed by team name, keeping ints as ints for display
+        fingerprint = fingerprint or self.fingerprint()
+        return self.derived('team_index', lambda: self.team_stats(fingerprint).to_dict('index'), fingerprint)
+
+    def team_comparison(self, fingerprint=None):
+        # Every pair of teams compared on every metric (see stats.TeamComparison)
+        fingerprint = fingerprint or self.fingerprint()
+        return self.derived('team_comparison', lambda: build_comparison(self.team_stats(fingerprint)), fingerprint)
+
+    def market_value_model(self, fingerprint=None):
+        # Market value fitted against points, goals and their expected values (see model.build_model)
+        from model import build_model
+        fingerprint = fingerprint or self.fingerprint()
+        return self.derived('market_value_model', lambda: build_model(self.teams(fingerprint)), fingerprint)
+
+    def season_projection(self, fingerprint=None):
+        # Monte Carlo completions of the season from the current table (see projection.build_projection)
+        from projection import build_projection
+        fingerprint = fingerprint or self.fingerprint()
+        return self.derived('season_projection', lambda: build_projection(self.teams(fingerprint), self.matches(fingerprint), self.standings(fingerprint)), fingerprint)
+
+    def incremental(self, name, update, fingerprint=None):
+        # Like derived, but the build gets the value of the previous data version (None at first), so
+        # it can extend it instead of recomputing everything; the previous value must not be modified
+        fingerprint = fingerprint or self.fingerprint()
+        return self._get(name, fingerprint['matches'], lambda: update(self._previous(name)))
+
+    def _previous(self, name):
+        # The latest value of a dataset; incremental builds read it under the dataset's build lock, so
+        # no other build replaces it meanwhile
+        with self._lock:
+            entry = self._entries.get(name)
+            return entry[1] if entry is not None else None
+
+    def standings(self, fingerprint=None):
+        # Table after every matchday, appended to as matchdays are played (see standings.update_standings)
+        from standings import update_standings
+        fingerprint = fingerprint or self.fingerprint()
+        return self.incremental('standings', lambda previous: update_standings(previous, self.matches(fingerprint), self.teams(fingerprint)), fingerprint)
+
+    def rollup(self, fingerprint=None):
+        # Matchday x team x venue x result cube of the matches, appended to as matchdays complete (see rollup.update_cube)
+        from rollup import update_cube
+        fingerprint = fingerprint or self.fingerprint()
+        return self.incremental('rollup', lambda previous: update_cube(previous, self.matches(fingerprint), self.teams(fingerprint)), fingerprint)
+
+    def matches_order(self, fingerprint=None):
+        # Keyset index of the matches (see matches_page)
+        fingerprint = fingerprint or self.fingerprint()
+        return self.derived('matches_order', lambda: matches_order(self.matches(fingerprint)), fingerprint)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+def partition_summaries(execute, partitions):
+    # Cross-season view: one summary per partition, folded in one partition at a time. Summaries
+    # are cached per partition and data version; a partition that is not loaded already is read,
+    # summarized and dropped, so at most one extra partition's frames are in memory at once.
+    for partition in partitions:
+        cache = get_data_cache(execute, partition)
+        fingerprint = cache.fingerprint()
+        summary = cache.derived('summary', lambda: season_summary(*cache.scan(fingerprint)), fingerprint)
+        yield dict(partition=partition_label(partition), **summary)
+
+
+class PageData:
+    # What a page gets instead of ready-made frames: each dataset of the selected partition is
+    # fetched (through its shared cache) the first time the page reads it, so static pages never
+    # touch the database. All reads of one render are pinned to the same data version.
+    def __init__(self, cache, page, partitions=(), prefetch=()):
+        self._cache = cache
+        self.page = page
+        self.partition = cache.partition
+        # Every partition, for views across seasons/leagues
+        self.partitions = list(partitions)
+        # Datasets the page is expected to read, fetched together on the first read along with the
+        # ones it read before (see page_datasets)
+        self.prefetch = set(prefetch)
+        self._fingerprint = None
+        self._values = {}
+        # Datasets this render read, in order
+        self.touched = []
+
+    def _pin(self):
+        if self._fingerprint is None:
+            self._fingerprint = self._cache.fingerprint()
+            self._cache.prefetch(self.prefetch | page_datasets.get(self.page, set()), self._fingerprint)
+        return self._fingerprint
+
+    def _get(self, name, load):
+        if name not in self._values:
+            self._values[name] = load(self._pin())
+            self.touched.append(name)
+            page_datasets.setdefault(self.page, set()).add(name)
+        return self._values[name]
+
+    @property
+    def teams(self):
+        return self._get('teams', self._cache.teams)
+
+    @property
+    def matches(self):
+        return self._get('matches', self._cache.matches)
+
+    @property
+    def matches_order(self):
+        return self._get('matches_order', self._cache.matches_order)
+
+    @property
+    def rollup(self):
+        return self._get('rollup', self._cache.rollup)
+
+    @property
+    def standings(self):
+        return self._get('standings', self._cache.standings)
+
+    @property
+    def tables(self):
+        return self._get('tables', self._cache.tables)
+
+    @property
+    def team_stats(self):
+        return self._get('team_stats', self._cache.team_stats)
+
+    @property
+    def team_index(self):
+        return self._get('team_index', self._cache.team_index)
+
+    @property
+    def team_comparison(self):
+        return self._get('team_comparison', self._cache.team_comparison)
+
+    @property
+    def market_value_model(self):
+        return self._get('market_value_model', self._cache.market_value_model)
+
+    @property
+    def season_projection(self):
+        return self._get('season_projection', self._cache.season_projection)
+
+    @property
+    def seasons(self):
+        # One summary row per partition (see partition_summaries)
+        return self._get('seasons', lambda fingerprint: pd.DataFrame(partition_summaries(self._cache.execute, self.partitions)))
+
+    @property
+    def version(self):
+        # Data version of this render, for keying rendered charts
+        return self._cache.version(self._pin())
+
+
+# Datasets each page has read so far in this process
+page_datasets = {}
+
+# One cache per partition and process, shared across Streamlit sessions and reruns
+_caches = {}
+_cache_lock = threading.Lock()
+
+def get_data_cache(execute, partition=DEFAULT_PARTITION):
+    with _cache_lock:
+        if partition not in _caches:
+            if DATA_SOURCE == 'live':
+                _caches[partition] = DataCache(execute, partition)
+            else:
+                from snapshot import SnapshotDataCache
+                _caches[partition] = SnapshotDataCache(execute, partition, live=DATA_SOURCE == 'snapshot+live')
+        return _caches[partition]
+
+def database_partitions(execute):
+    return find_partitions([row[0] for row in execute(all_tables_query)])
+
+# Partitions found and when they were listed
+_partitions = None
+_partitions_lock = threading.Lock()
+
+def list_partitions(execute):
+    global _partitions
+    with _partitions_lock:
+        now = time.monotonic()
+        if _partitions is None or now - _partitions[0] >= PARTITIONS_INTERVAL:
+            if DATA_SOURCE == 'live':
+                _partitions = (now, database_partitions(execute))
+            else:
+                from snapshot import list_snapshot_partitions
+                _partitions = (now, list_snapshot_partitions(execute, live=DATA_SOURCE == 'snapshot+live'))
+        return _partitions[1]
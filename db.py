@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2 as psy
+
+from tracing import estimate_bytes, metrics, span
+
+# Pool settings, overridable from .env
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+# Idle connections older than this (in seconds) are pinged before being handed out
+POOL_CHECK_INTERVAL = float(os.environ.get('DB_POOL_CHECK_INTERVAL', 30))
+
+# Errors that mean the connection itself is unusable
+CONNECTION_ERRORS = (psy.OperationalError, psy.InterfaceError)
+# Raised when a queried table or view does not exist (yet)
+MissingRelation = psy.errors.UndefinedTable
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    # A bounded pool of database connections shared by every session in the process.
+    # `connect` can be swapped for any DB-API style factory (e.g. a local Postgres stand-in).
+    def __init__(self, dsn, maxconn=POOL_SIZE, timeout=POOL_TIMEOUT, check_interval=POOL_CHECK_INTERVAL, connect=None):
+        self.dsn = dsn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self._connect = connect or psy.connect
+        self._cond = threading.Condition()
+        # Idle connections as (connection, last time it was returned)
+        self._idle = []
+        self._in_use = 0
+        self._stats = {
+            'checkouts': 0,
+            'connects': 0,
+            'reconnects': 0,
+            'timeouts': 0,
+            'wait_time': 0.0,
+            'max_wait': 0.0,
+        }
+
+    def _new_connection(self):
+        conn = self._connect(self.dsn)
+        # Every query is a read or a self-contained statement, so never leave a transaction open
+        conn.autocommit = True
+        with self._cond:
+            self._stats['connects'] += 1
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except CONNECTION_ERRORS:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _acquire(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            # Wait for an idle connection or a free slot
+            while not self._idle and self._in_use >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s ({self.maxconn} in use)")
+                self._cond.wait(remaining)
+            self._in_use += 1
+            entry = self._idle.pop() if self._idle else None
+            waited = time.monotonic() - start
+            self._stats['checkouts'] += 1
+            self._stats['wait_time'] += waited
+            self._stats['max_wait'] = max(self._stats['max_wait'], waited)
+
+        # Connecting and pinging happen outside the lock so other sessions are not blocked
+        try:
+            if entry is not None:
+                conn, last_used = entry
+                if self._is_healthy(conn, last_used):
+                    return conn
+                self._discard(conn)
+                with self._cond:
+                    self._stats['reconnects'] += 1
+            return self._new_connection()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, conn, broken=False):
+        if broken or conn.closed:
+            self._discard(conn)
+        with self._cond:
+            self._in_use -= 1
+            if not broken and not conn.closed:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        except CONNECTION_ERRORS:
+            self._release(conn, broken=True)
+            raise
+        except Exception:
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def execute(self, query, params=None, retries=1):
+        # Run one statement and fetch all rows, retrying on a fresh connection if the old one died
+        with span('db.query', query=' '.join(query.split())[:80]) as query_span:
+            for attempt in range(retries + 1):
+                try:
+                    with self.connection() as conn:
+                        with conn.cursor() as cur:
+                            cur.execute(query, params)
+                            rows = cur.fetchall() if cur.description is not None else []
+                    query_span.set(rows=len(rows), bytes=estimate_bytes(rows), attempts=attempt + 1)
+                    return rows
+                except CONNECTION_ERRORS:
+                    if attempt == retries:
+                        raise
+                    with self._cond:
+                        self._stats['reconnects'] += 1
+
+    def metrics(self):
+        with self._cond:
+            metrics = dict(self._stats)
+            metrics['in_use'] = self._in_use
+            metrics['idle'] = len(self._idle)
+            metrics['size'] = self._in_use + len(self._idle)
+            metrics['maxconn'] = self.maxconn
+        metrics['avg_wait'] = metrics['wait_time'] / metrics['checkouts'] if metrics['checkouts'] else 0.0
+        return metrics
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+# One pool per process, shared across Streamlit sessions and reruns
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool(dsn):
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.dsn != dsn:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(dsn)
+        return _pool
+
+def pool_metrics():
+    # The shared pool's connections and waits, written to the metrics file with the span histograms
+    if _pool is None:
+        return []
+    pool = _pool.metrics()
+    return [
+        ('app_db_pool_connections_in_use', 'gauge', "Connections checked out of the pool.", pool['in_use']),
+        ('app_db_pool_connections_idle', 'gauge', "Idle connections kept open by the pool.", pool['idle']),
+        ('app_db_pool_connections_max', 'gauge', "Connections the pool may open.", pool['maxconn']),
+        ('app_db_pool_checkouts_total', 'counter', "Connections handed out by the pool.", pool['checkouts']),
+        ('app_db_pool_wait_seconds_total', 'counter', "Time spent waiting for a free connection.", pool['wait_time']),
+        ('app_db_pool_wait_seconds_max', 'gauge', "Longest wait for a free connection.", pool['max_wait']),
+        ('app_db_pool_timeouts_total', 'counter', "Checkouts that gave up waiting for a connection.", pool['timeouts']),
+        ('app_db_pool_reconnects_total', 'counter', "Dead connections replaced by fresh ones.", pool['reconnects']),
+    ]
+
+metrics.register(pool_metrics)
@@ -0,0 +1,201 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from tracing import span
+from workers import batch_sizes, get_worker_pool, run_batches
+
+# Resamples behind every bootstrap and permutation interval, drawn in the shared worker pool (see
+# workers.py)
+MODEL_RESAMPLES = int(os.environ.get('MODEL_RESAMPLES', 100_000))
+# Resamples are drawn in batches of about this many (resample, team, target) values, within the CPU caches
+MODEL_BATCH_VALUES = int(os.environ.get('MODEL_BATCH_VALUES', 250_000))
+# Seed of the resampling, so a data version always gets the same intervals
+MODEL_SEED = int(os.environ.get('MODEL_SEED', 0))
+
+# What market value is fitted against, and the fitted variants
+TARGETS = ['PTS', 'xPTS', 'G', 'GA']
+VARIANTS = {
+    'ols': "OLS, per €1M",
+    'robust': "Huber, per €1M",
+    'log': "OLS, per doubling",
+}
+CONFIDENCE = 0.95
+# Huber weights: residuals beyond HUBER_K robust standard deviations are down-weighted. The fit of
+# the data takes HUBER_ITERATIONS reweighting steps; each resample takes HUBER_RESAMPLE_ITERATIONS
+# from its own OLS fit with the scale of that fit held fixed, which keeps every resample in the
+# same vectorized loop and 100k of them interactive
+HUBER_K = 1.345
+HUBER_ITERATIONS = 20
+HUBER_RESAMPLE_ITERATIONS = 4
+
+
+def predictor(market_value, variant):
+    # Market value in millions, or its log2 so the slope is the effect of doubling the value
+    if variant == 'log':
+        return np.log2(np.maximum(market_value, 1.0))
+    return market_value / 1e6
+
+
+# Fitting =====================================================================
+# Every fit is batched: x is (..., teams) and y is (..., teams, targets), so one call fits the
+# observed data (no leading axis) or a whole batch of resamples at once.
+
+def weighted_fit(x, y, weights=None):
+    # Closed-form simple regression of every target on x; returns intercept and slope, (..., targets).
+    # Built from weighted sums, each one pass over the (..., teams, targets) values; x should be
+    # roughly centered (see fit) to keep the sums accurate.
+    if weights is None:
+        weights = np.ones(y.shape)
+    weighted_y = weights * y
+    total = weights.sum(axis=-2)
+    sum_x = np.einsum('...nk,...n->...k', weights, x)
+    sum_y = weighted_y.sum(axis=-2)
+    sum_xx = np.einsum('...nk,...n->...k', weights, x * x)
+    sum_xy = np.einsum('...nk,...n->...k', weighted_y, x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (total * sum_xy - sum_x * sum_y) / (total * sum_xx - sum_x * sum_x)
+    return (sum_y - slope * sum_x) / total, slope
+
+def huber_fit(x, y, iterations=HUBER_ITERATIONS, k=HUBER_K, rescale=True):
+    # Iteratively reweighted least squares with Huber weights and a MAD scale per fit, re-estimated
+    # every step unless `rescale` is off
+    intercept, slope = weighted_fit(x, y)
+    scale = None
+    for _ in range(iterations):
+        residuals = y - (intercept[..., None, :] + slope[..., None, :] * x[..., None])
+        if scale is None or rescale:
+            scale = np.median(np.abs(residuals), axis=-2, keepdims=True) / 0.6745
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weights = np.minimum(1.0, k * scale / np.abs(residuals))
+        # Exact fits (zero scale or residual) keep full weight
+        weights = np.where(np.isfinite(weights), weights, 1.0)
+        intercept, slope = weighted_fit(x, y, weights)
+    return intercept, slope
+
+def fit(x, y, variant, center=None):
+    # Fitted on x - center (the mean market value of the data), with the intercept shifted back
+    center = x.mean() if center is None else center
+    intercept, slope = huber_fit(x - center, y) if variant == 'robust' else weighted_fit(x - center, y)
+    return intercept - slope * center, slope
+
+def r_squared(x, y, intercept, slope):
+    residuals = y - (intercept + slope * x[:, None])
+    total = ((y - y.mean(axis=0)) ** 2).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 1 - (residuals ** 2).sum(axis=0) / total
+
+
+# Resampling ==================================================================
+
+def count_slopes(counts, x, y):
+    # OLS slopes of bootstrap resamples given as (resamples, teams) draw counts: every weighted sum
+    # is a (resamples, teams) @ (teams, targets) product, with x centered for accuracy
+    x = x - x.mean()
+    total = counts.sum(axis=1)[:, None]
+    sum_x = (counts @ x)[:, None]
+    sum_y = counts @ y
+    sum_xx = (counts @ (x * x))[:, None]
+    sum_xy = counts @ (x[:, None] * y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (total * sum_xy - sum_x * sum_y) / (total * sum_xx - sum_x * sum_x)
+
+def resample_slopes(x, y, variant, kind, resamples, seed):
+    # Slopes of `resamples` bootstrap resamples (teams drawn with replacement) or permutations
+    # (targets shuffled against the market values), as a (resamples, targets) array. Runs in a
+    # worker process; `seed` is a SeedSequence so every batch draws its own stream.
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    if kind == 'bootstrap':
+        rows = rng.integers(0, n, size=(resamples, n))
+        if variant == 'robust':
+            return huber_fit(x[rows] - x.mean(), y[rows], HUBER_RESAMPLE_ITERATIONS, rescale=False)[1]
+        counts = np.bincount((rows + n * np.arange(resamples)[:, None]).ravel(), minlength=resamples * n).reshape(resamples, n)
+        return count_slopes(counts.astype(float), x, y)
+    rows = rng.permuted(np.broadcast_to(np.arange(n), (resamples, n)), axis=1)
+    if variant == 'robust':
+        return huber_fit(np.broadcast_to(x - x.mean(), (resamples, n)), y[rows], HUBER_RESAMPLE_ITERATIONS, rescale=False)[1]
+    # Shuffling the targets against x is shuffling x against the targets, and the means do not change
+    centered = x - x.mean()
+    return centered[rows] @ (y - y.mean(axis=0)) / (centered @ centered)
+
+def draw_slopes(x, y, variant, kind, resamples, seed, pool=None):
+    sizes = batch_sizes(resamples, len(x) * y.shape[1], MODEL_BATCH_VALUES)
+    seeds = np.random.SeedSequence([seed, list(VARIANTS).index(variant), kind == 'bootstrap']).spawn(len(sizes))
+    batches = run_batches(resample_slopes, (x, y, variant, kind), sizes, seeds, pool)
+    return np.concatenate(batches) if batches else np.empty((0, y.shape[1]))
+
+def interval(slopes, confidence=CONFIDENCE):
+    # Central interval of the resampled slopes; resamples with a single distinct market value have
+    # no slope and are left out
+    tail = (1 - confidence) / 2 * 100
+    if not len(slopes):
+        return np.full(slopes.shape[1], np.nan), np.full(slopes.shape[1], np.nan)
+    with np.errstate(invalid='ignore'):
+        return np.nanpercentile(slopes, [tail, 100 - tail], axis=0)
+
+
+# Model =======================================================================
+
+class MarketValueModel:
+    # The fits of every target on market value in every variant, with their intervals. summary has
+    # one row per (target, variant): intercept, slope, R², the bootstrap confidence interval of the
+    # slope, and the permutation p-value with the interval the slope would fall in by chance.
+    def __init__(self, teams, market_value, values, summary, resamples):
+        # Teams with a market value and every target, in team_data order
+        self.teams = teams
+        self.market_value = market_value
+        # (teams, TARGETS) values the model was fitted on
+        self.values = values
+        self.summary = summary
+        self.resamples = resamples
+
+    def row(self, target, variant):
+        return self.summary.loc[(target, variant)]
+
+    def curve(self, target, variant, points=100):
+        # The fitted line over the observed market values, for the chart
+        grid = np.linspace(self.market_value.min(), self.market_value.max(), points)
+        row = self.row(target, variant)
+        return grid, row['intercept'] + row['slope'] * predictor(grid, variant)
+
+
+def build_model(team_data, resamples=MODEL_RESAMPLES, seed=MODEL_SEED, pool=None):
+    # Market value and every target are columns of the teams table
+    market_value = team_data['MarketValue'].to_numpy(dtype=float)
+    y = team_data[TARGETS].to_numpy(dtype=float)
+    keep = np.isfinite(market_value) & np.isfinite(y).all(axis=1)
+    teams, market_value, y = team_data['TeamName'][keep].tolist(), market_value[keep], y[keep]
+    pool = pool or get_worker_pool()
+    rows = []
+    for variant in VARIANTS:
+        x = predictor(market_value, variant)
+        intercept, slope = fit(x, y, variant)
+        r2 = r_squared(x, y, intercept, slope)
+        with span('model.resample', variant=variant, resamples=2 * resamples):
+            bootstrap = draw_slopes(x, y, variant, 'bootstrap', resamples, seed, pool)
+            permutation = draw_slopes(x, y, variant, 'permutation', resamples, seed, pool)
+        bootstrap_low, bootstrap_high = interval(bootstrap)
+        null_low, null_high = interval(permutation)
+        # Share of permutations with a slope at least as extreme, counting the observed one
+        extreme = (np.abs(permutation) >= np.abs(slope)).sum(axis=0)
+        p_value = (extreme + 1) / (len(permutation) + 1)
+        for t, target in enumerate(TARGETS):
+            rows.append({
+                'target': target, 'variant': variant, 'intercept': intercept[t], 'slope': slope[t], 'r2': r2[t],
+                'ci_low': bootstrap_low[t], 'ci_high': bootstrap_high[t],
+                'null_low': null_low[t], 'null_high': null_high[t], 'p_value': p_value[t],
+            })
+    summary = pd.DataFrame(rows).set_index(['target', 'variant'])
+    return MarketValueModel(teams, market_value, y, summary, resamples)
+
+def effect_text(target, variant, row):
+    # One line reading of a fit, e.g. for the page
+    if math.isnan(row['slope']):
+        return f"{target}: not enough distinct market values to fit"
+    unit = "doubling of market value" if variant == 'log' else "€1M of market value"
+    significant = "significant" if row['p_value'] < 1 - CONFIDENCE else "not significant"
+    return (f"{target}: {row['slope']:+.3g} per {unit} "
+            f"({CONFIDENCE:.0%} CI {row['ci_low']:+.3g} to {row['ci_high']:+.3g}, p = {row['p_value']:.3g}, {significant})")
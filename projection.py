@@ -0,0 +1,135 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data import RESULT_PENDING, team_codes
+from standings import AWAY_POINTS, HOME_POINTS, standings_rank
+from tracing import span
+from workers import batch_sizes, get_worker_pool, run_batches
+
+# Season completions simulated per projection, in the shared worker pool (see workers.py)
+SIMULATIONS = int(os.environ.get('PROJECTION_SIMULATIONS', 100_000))
+# Simulations are run in batches of about this many (simulation, fixture) scores, a few MB each
+SIMULATION_BATCH_VALUES = int(os.environ.get('PROJECTION_BATCH_VALUES', 1_000_000))
+# Seed of the simulations, so a data version always gets the same projection
+SIMULATION_SEED = int(os.environ.get('PROJECTION_SEED', 0))
+
+# Goals per team and match when a team has no xG to go on yet
+DEFAULT_GOAL_RATE = 1.35
+# Places at the top and the bottom of the table the page reports the odds of
+TOP_PLACES = 4
+RELEGATION_PLACES = 3
+
+
+def scoring_rates(team_data, matches_data, home, away):
+    # Poisson rate of each side of each fixture: the team's xG per match times its opponent's xGA
+    # per match over the league average, scaled by the home advantage of the played matches
+    matches = team_data['M'].to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        attack = np.where(matches > 0, team_data['xG'].to_numpy(dtype=float) / matches, np.nan)
+        defence = np.where(matches > 0, team_data['xGA'].to_numpy(dtype=float) / matches, np.nan)
+    average = np.nanmean(attack) if np.isfinite(attack).any() and np.nanmean(attack) > 0 else DEFAULT_GOAL_RATE
+    attack = np.where(np.isfinite(attack), attack, average)
+    defence = np.where(np.isfinite(defence), defence, average)
+    played = matches_data['result'].to_numpy() != RESULT_PENDING
+    home_goals = matches_data['homeScore'].to_numpy(dtype=float, na_value=0)[played].sum()
+    away_goals = matches_data['awayScore'].to_numpy(dtype=float, na_value=0)[played].sum()
+    # Split evenly between the sides: home teams score sqrt(ratio) more, away teams sqrt(ratio) less
+    advantage = np.sqrt(np.clip(home_goals / away_goals, 0.5, 2.0)) if home_goals > 0 and away_goals > 0 else 1.0
+    home_rate = attack[home] * defence[away] / average * advantage
+    away_rate = attack[away] * defence[home] / average / advantage
+    return home_rate, away_rate
+
+
+def simulate_batch(home, away, home_rate, away_rate, current, simulations, seed):
+    # `simulations` completions of the season as (simulations x fixtures) score arrays. Every team's
+    # points and goals are summed with one product against a fixtures x teams incidence matrix and
+    # ranked like the standings. Returns (teams x ranks) counts of the final ranks and the sum of
+    # the final points per team. Runs in a worker process; `seed` is a SeedSequence.
+    rng = np.random.default_rng(seed)
+    n_teams = len(current['points'])
+    home_goals = rng.poisson(home_rate, size=(simulations, len(home)))
+    away_goals = rng.poisson(away_rate, size=(simulations, len(away)))
+    result = np.sign(home_goals - away_goals) + 1
+    home_teams = np.zeros((len(home), n_teams))
+    home_teams[np.arange(len(home)), home] = 1
+    away_teams = np.zeros((len(away), n_teams))
+    away_teams[np.arange(len(away)), away] = 1
+
+    def per_team(home_values, away_values):
+        return (home_values @ home_teams + away_values @ away_teams).astype(np.int64)
+
+    totals = {
+        'points': current['points'] + per_team(HOME_POINTS[result], AWAY_POINTS[result]),
+        'goal_difference': current['goal_difference'] + per_team(home_goals - away_goals, away_goals - home_goals),
+        'goals': current['goals'] + per_team(home_goals, away_goals),
+    }
+    rank = standings_rank(totals)
+    cells = np.arange(n_teams) * n_teams + rank.astype(np.intp) - 1
+    rank_counts = np.bincount(cells.ravel(), minlength=n_teams * n_teams).reshape(n_teams, n_teams)
+    return rank_counts, totals['points'].sum(axis=0)
+
+class SeasonProjection:
+    # Where the simulated seasons finished: rank_probabilities[t, r] is the share of simulations in
+    # which team t (team_data order) ended in place r + 1
+    def __init__(self, teams, simulations, fixtures, current_points, expected_points, rank_probabilities):
+        self.teams = teams
+        self.simulations = simulations
+        # Fixtures left to play
+        self.fixtures = fixtures
+        self.current_points = current_points
+        self.expected_points = expected_points
+        self.rank_probabilities = rank_probabilities
+
+    def order(self):
+        # Teams by expected final points, best first
+        return np.argsort(-self.expected_points, kind='stable')
+
+    def ranks(self):
+        # Final rank distribution, one row per team in order(), one column per place
+        order = self.order()
+        places = np.arange(1, len(self.teams) + 1)
+        return pd.DataFrame(self.rank_probabilities[order], index=[self.teams[t] for t in order], columns=places)
+
+    def table(self):
+        order = self.order()
+        n_teams = len(self.teams)
+        probabilities = self.rank_probabilities[order]
+        table = pd.DataFrame({
+            'Team': [self.teams[t] for t in order],
+            'Points': self.current_points[order],
+            'Expected Points': self.expected_points[order].round(1),
+            'Title': probabilities[:, 0].round(3),
+            f'Top {TOP_PLACES}': probabilities[:, :TOP_PLACES].sum(axis=1).round(3),
+            'Relegation': probabilities[:, max(n_teams - RELEGATION_PLACES, 0):].sum(axis=1).round(3),
+            'Most Likely Place': probabilities.argmax(axis=1) + 1 if n_teams else [],
+        })
+        return table
+
+
+def build_projection(team_data, matches_data, standings, simulations=SIMULATIONS, seed=SIMULATION_SEED, pool=None):
+    # Current table from the standings, remaining fixtures from the pending matches
+    n_teams = len(team_data)
+    if len(standings.matchdays):
+        # The standings' team axis (TeamID order) to team_data's
+        order = pd.Index(standings.teams).get_indexer(team_data['TeamName'])
+        current = {column: standings.totals[column][-1][order].astype(np.int64) for column in ['points', 'goal_difference', 'goals']}
+    else:
+        current = {column: np.zeros(n_teams, dtype=np.int64) for column in ['points', 'goal_difference', 'goals']}
+    pending = matches_data['result'].to_numpy() == RESULT_PENDING
+    home = team_codes(matches_data['homeTeamId'], team_data)[pending]
+    away = team_codes(matches_data['awayTeamId'], team_data)[pending]
+    known = (home >= 0) & (away >= 0)
+    home, away = home[known], away[known]
+    home_rate, away_rate = scoring_rates(team_data, matches_data, home, away)
+
+    sizes = batch_sizes(simulations, len(home), SIMULATION_BATCH_VALUES)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    with span('projection.simulate', simulations=simulations, fixtures=len(home)):
+        batches = run_batches(simulate_batch, (home, away, home_rate, away_rate, current), sizes, seeds, pool or get_worker_pool())
+    rank_counts = sum(counts for counts, _ in batches) if batches else np.zeros((n_teams, n_teams), dtype=np.int64)
+    points = sum(points for _, points in batches) if batches else np.zeros(n_teams)
+    total = max(simulations, 1)
+    return SeasonProjection(team_data['TeamName'].tolist(), simulations, len(home), current['points'],
+                            points / total if simulations else current['points'].astype(float), rank_counts / total)
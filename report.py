@@ -0,0 +1,189 @@
+import argparse
+import datetime
+import html
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from charts import CHART_FORMAT, REPORT_DIR, chart_file, render_spec, report_complete, version_dir
+from data import DEFAULT_PARTITION, PageData, get_data_cache, list_partitions, partition_label
+from specs import data_page_charts, dominance_chart, pair_charts, pair_verdicts, team_charts
+from workers import WORKER_START_METHOD
+
+# Batch report ================================================================
+# `python -m report` writes, for the current data version of each partition,
+#   <dir>/<version>/charts/   every chart of both pages as served by the app (see PrerenderedCharts)
+#   <dir>/<version>/pairs.json, data.json   the metrics shown next to them
+#   <dir>/<version>/index.html   browsable static pages linking the pairs
+#   <dir>/<version>/manifest.json   written last; the app only serves complete reports
+
+def slug(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+def column_highlights(data, column):
+    # Highest, average and lowest value of a teams column, with the teams holding the extremes
+    highest = data.loc[data[column].idxmax()]
+    lowest = data.loc[data[column].idxmin()]
+    return {
+        'highest': {'team': highest['TeamName'], 'value': highest[column].item()},
+        'average': round(float(data[column].mean()), 3),
+        'lowest': {'team': lowest['TeamName'], 'value': lowest[column].item()},
+    }
+
+def pair_metrics(comparison, team_name1, team_name2):
+    # The compared values and verdicts of one pair, as plain JSON
+    return {
+        'teams': [team_name1, team_name2],
+        'values': {metric: [value1, value2] for metric, (value1, value2, _) in comparison.pair(team_name1, team_name2).items()},
+        'verdicts': {metric: {'kind': kind, 'message': message} for metric, (kind, message) in pair_verdicts(comparison, team_name1, team_name2).items()},
+    }
+
+def render_charts(specs, directory, format, workers):
+    # Render every spec once, in parallel across worker processes, straight to its file. A chart that
+    # fails is reported and skipped, not the whole report: the app renders a missing chart live.
+    os.makedirs(directory, exist_ok=True)
+    unique = {chart_file(chart_id, params, format): (kind, args) for chart_id, params, kind, args in specs}
+    failed = []
+    context = multiprocessing.get_context(WORKER_START_METHOD)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {}
+        for name, (kind, args) in unique.items():
+            try:
+                futures[pool.submit(render_spec, kind, args() if callable(args) else args, format)] = name
+            except Exception as error:
+                failed.append((name, error))
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                chart = future.result()
+            except Exception as error:
+                failed.append((name, error))
+                continue
+            path = os.path.join(directory, name)
+            with open(path + '.tmp', 'wb') as file:
+                file.write(chart)
+            os.replace(path + '.tmp', path)
+    for name, error in failed:
+        print(f"{name}: {type(error).__name__}: {error}", file=sys.stderr)
+    return len(unique) - len(failed), sorted(name for name, _ in failed)
+
+def image(spec, format):
+    chart_id, params, _, _ = spec
+    return f'<img src="{html.escape(os.path.join("charts", chart_file(chart_id, params, format)))}" width="480">'
+
+def write_html(path, title, body):
+    with open(path, 'w') as file:
+        file.write(f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{html.escape(title)}</title></head>\n'
+                   f'<body>\n<h1>{html.escape(title)}</h1>\n{body}\n</body></html>\n')
+
+def pair_html(metrics, specs, format):
+    rows = ''.join(f'<tr><td>{name}</td><td>{values[0]}</td><td>{values[1]}</td><td>{html.escape(metrics["verdicts"][name]["message"])}</td></tr>\n'
+                   for name, values in metrics['values'].items())
+    table = f'<table border="1"><tr><th></th><th>{html.escape(metrics["teams"][0])}</th><th>{html.escape(metrics["teams"][1])}</th><th></th></tr>\n{rows}</table>'
+    return '<p><a href="index.html">All pairs</a></p>\n' + '\n'.join(image(spec, format) for spec in specs) + '\n' + table
+
+def write_report(page_data, root, format=CHART_FORMAT, workers=None):
+    start = time.perf_counter()
+    directory = version_dir(page_data.version, root)
+    team_index = page_data.team_index
+    comparison = page_data.team_comparison
+    names = page_data.teams['TeamName'].tolist()
+
+    data_specs = data_page_charts(page_data)
+    team_specs = {name: list(team_charts(name, team_index[name]).values()) for name in names}
+    # Ordered pairs, including a team against itself: both pickers start on the same team
+    pairs = list(itertools.product(names, repeat=2))
+    pair_specs = {pair: list(pair_charts(comparison, *pair).values()) for pair in pairs}
+    league_specs = [dominance_chart(comparison)]
+    specs = data_specs + league_specs + [spec for specs in team_specs.values() for spec in specs] + [spec for specs in pair_specs.values() for spec in specs]
+    charts, failed = render_charts(specs, os.path.join(directory, 'charts'), format, workers)
+
+    pair_metrics_list = [pair_metrics(comparison, name1, name2) for name1, name2 in pairs]
+    with open(os.path.join(directory, 'pairs.json'), 'w') as file:
+        json.dump(pair_metrics_list, file, indent=1)
+    rollup = page_data.rollup
+    data_metrics = {
+        'highlights': {column: column_highlights(page_data.teams, column) for column in ['MarketValue', 'xG', 'xGA']},
+        'dominance': comparison.dominance_table().to_dict('records'),
+        'league': rollup.league_results(),
+        'goals_per_matchday': {str(matchday): int(goals) for matchday, goals in rollup.goals_per_matchday().items()},
+    }
+    with open(os.path.join(directory, 'data.json'), 'w') as file:
+        json.dump(data_metrics, file, indent=1)
+
+    label = partition_label(page_data.partition)
+    write_html(os.path.join(directory, 'data.html'), f"{label}: Data", '<p><a href="index.html">All pairs</a></p>\n' + '\n'.join(image(spec, format) for spec in data_specs))
+    for (name1, name2), metrics in zip(pairs, pair_metrics_list):
+        specs = team_specs[name1] + team_specs[name2] + pair_specs[name1, name2]
+        write_html(os.path.join(directory, f"{slug(name1)}--{slug(name2)}.html"), f"{name1} vs {name2}", pair_html(metrics, specs, format))
+    links = ''.join(f'<li><a href="{slug(name1)}--{slug(name2)}.html">{html.escape(name1)} vs {html.escape(name2)}</a></li>\n' for name1, name2 in pairs)
+    write_html(os.path.join(directory, 'index.html'), label,
+               f'<p><a href="data.html">Data</a></p>\n{image(league_specs[0], format)}\n<ul>\n{links}</ul>')
+
+    manifest = {
+        'version': page_data.version,
+        'partition': label,
+        'format': format,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'teams': len(names),
+        'pairs': len(pairs),
+        'charts': charts,
+        'failed': failed,
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+    with open(os.path.join(directory, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=1)
+    return manifest
+
+def prune(root, manifest):
+    # Reports of older versions of the same partition are never served again
+    for name in os.listdir(root):
+        path = os.path.join(root, name, 'manifest.json')
+        if name == manifest['version'] or not os.path.exists(path):
+            continue
+        with open(path) as file:
+            if json.load(file).get('partition') == manifest['partition']:
+                shutil.rmtree(os.path.join(root, name))
+
+def main():
+    parser = argparse.ArgumentParser(description="Prerender every team pair and the Data page of the current data version")
+    parser.add_argument('partitions', nargs='*', help="partitions to report, by label, e.g. 'EPL 2023/24' (all by default)")
+    parser.add_argument('--dir', default=REPORT_DIR or 'reports', help="report directory")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="rendering processes")
+    parser.add_argument('--force', action='store_true', help="rewrite reports that are already complete")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from db import get_pool
+    dsn = f"host={os.environ['DB_HOST']} user={os.environ['DB_USERNAME']} password={os.environ['DB_PASSWORD']} dbname={os.environ['DB_NAME']}"
+    execute = get_pool(dsn).execute
+
+    # Read through DATA_SOURCE like the app, so a report can be made from the snapshots alone
+    partitions = list_partitions(execute) or [DEFAULT_PARTITION]
+    if args.partitions:
+        by_label = {partition_label(partition): partition for partition in partitions}
+        unknown = [label for label in args.partitions if label not in by_label]
+        if unknown:
+            sys.exit(f"Unknown partitions: {', '.join(unknown)} (available: {', '.join(by_label)})")
+        partitions = [by_label[label] for label in args.partitions]
+
+    for partition in partitions:
+        page_data = PageData(get_data_cache(execute, partition), "Report", prefetch=['teams', 'matches', 'team_index', 'team_comparison', 'standings', 'rollup'])
+        label = partition_label(partition)
+        if report_complete(page_data.version, args.dir) and not args.force:
+            print(f"{label}: report of version {page_data.version} is up to date")
+            continue
+        manifest = write_report(page_data, args.dir, workers=args.workers)
+        prune(args.dir, manifest)
+        print(f"{label}: {manifest['pairs']} pairs, {manifest['charts']} charts in {manifest['seconds']:.1f}s -> {version_dir(manifest['version'], args.dir)}")
+
+
+if __name__ == "__main__":
+    main()
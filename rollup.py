@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+from data import team_axis, team_codes
+from standings import settled_check, settled_prefix
+
+# Axes of the cube after (matchday, team)
+VENUES = ['home', 'away']
+RESULTS = ['win', 'draw', 'lose', 'pending']
+# Result from the home and from the away team's point of view, indexed by result code + 1
+# (RESULT_PENDING, RESULT_AWAY, RESULT_DRAW, RESULT_HOME)
+HOME_RESULT = np.array([3, 2, 1, 0])
+AWAY_RESULT = np.array([3, 0, 1, 2])
+MEASURES = ['matches', 'goals_for', 'goals_against']
+
+
+class MatchdayCube:
+    # Matches, goals for and goals against rolled up by (matchday, team, venue, result), every match
+    # counted once for each of its teams. Each measure is a dense array of shape
+    # (matchdays, teams, len(VENUES), len(RESULTS)), so every view below is a sum over some axes. The
+    # team axis is in team_axis order (TeamID), so it stays put when the ranking changes.
+    # As with the standings, the first `settled` matchdays have no pending match and are kept as they
+    # are by the next data version (see update_cube).
+    def __init__(self, teams, matchdays, measures, settled, check):
+        self.teams = teams
+        self.matchdays = matchdays
+        self.measures = measures
+        self.settled = settled
+        self.check = check
+
+    def league_results(self):
+        # League-wide home win/draw/lose counts and played/not played totals, for the league pies
+        home = self.measures['matches'][:, :, 0].sum(axis=(0, 1))
+        return {
+            'home_win': int(home[0]),
+            'home_draw': int(home[1]),
+            'home_lose': int(home[2]),
+            'played': int(home[:3].sum()),
+            'not_played': int(home[3]),
+        }
+
+    def goals_per_matchday(self):
+        # Goals scored in each matchday's played matches
+        return pd.Series(self.measures['goals_for'].sum(axis=(1, 2, 3)), index=self.matchdays, name='goals')
+
+    def team_results(self, venue=None, teams=None):
+        # Played matches per team and result (over both venues, or one of VENUES); teams reorders the
+        # rows for display (e.g. team_data['TeamName'], the table's order)
+        matches = self.measures['matches']
+        matches = matches.sum(axis=2) if venue is None else matches[:, :, VENUES.index(venue)]
+        results = pd.DataFrame(matches.sum(axis=0)[:, :3], index=self.teams, columns=RESULTS[:3])
+        return results if teams is None else results.loc[list(teams)]
+
+    def team_result_shares(self, venue=None, teams=None):
+        # The same as shares of each team's played matches (0 for a team without any)
+        results = self.team_results(venue, teams)
+        played = results.sum(axis=1).replace(0, 1)
+        return results.div(played, axis=0)
+
+
+def cube_measures(matches_data, team_data):
+    # One vectorized pass: both teams of every match become one row and are counted into their
+    # (matchday, team, venue, result) cell with bincount
+    n_teams = len(team_data)
+    matchdays, matchday_index = np.unique(matches_data['matchday'].to_numpy(), return_inverse=True)
+    result = matches_data['result'].to_numpy().astype(np.intp) + 1
+    home = team_codes(matches_data['homeTeamId'], team_data)
+    away = team_codes(matches_data['awayTeamId'], team_data)
+    home_score = matches_data['homeScore'].to_numpy(dtype=float, na_value=0)
+    away_score = matches_data['awayScore'].to_numpy(dtype=float, na_value=0)
+
+    team = np.concatenate([home, away])
+    keep = team >= 0
+    cells = ((np.concatenate([matchday_index, matchday_index]) * n_teams + team) * len(VENUES)
+             + np.repeat([0, 1], len(home))) * len(RESULTS) + np.concatenate([HOME_RESULT[result], AWAY_RESULT[result]])
+    cells = cells[keep]
+    values = {
+        'matches': None,
+        'goals_for': np.concatenate([home_score, away_score])[keep],
+        'goals_against': np.concatenate([away_score, home_score])[keep],
+    }
+    shape = (len(matchdays), n_teams, len(VENUES), len(RESULTS))
+    measures = {name: np.bincount(cells, weights=weights, minlength=int(np.prod(shape))).astype(np.int32).reshape(shape)
+                for name, weights in values.items()}
+    return matchdays, measures
+
+def build_cube(matches_data, team_data):
+    teams = team_axis(team_data)
+    matchdays, measures = cube_measures(matches_data, teams)
+    return MatchdayCube(teams['TeamName'].tolist(), matchdays, measures, *settled_prefix(matches_data, matchdays))
+
+def update_cube(previous, matches_data, team_data):
+    # Keep the settled matchdays of the previous version and roll up only the matchdays after them;
+    # rebuilt from scratch when the teams changed (not just their ranking) or a settled matchday no longer matches
+    axis = team_axis(team_data)
+    teams = axis['TeamName'].tolist()
+    if previous is None or previous.settled == 0 or previous.teams != teams:
+        return build_cube(matches_data, team_data)
+    last_settled = previous.matchdays[previous.settled - 1]
+    if settled_check(matches_data, last_settled) != previous.check:
+        return build_cube(matches_data, team_data)
+    matchdays, appended = cube_measures(matches_data[matches_data['matchday'].to_numpy() > last_settled], axis)
+    matchdays = np.concatenate([previous.matchdays[:previous.settled], matchdays])
+    measures = {name: np.concatenate([previous.measures[name][:previous.settled], values]) for name, values in appended.items()}
+    return MatchdayCube(teams, matchdays, measures, *settled_prefix(matches_data, matchdays))
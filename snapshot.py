@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+
+from data import DataCache, DEFAULT_PARTITION, Partition, database_partitions, find_partitions, partition_label, team_results_from_matches
+from db import CONNECTION_ERRORS, PoolTimeout
+
+# Where snapshots are written and read: one directory per partition holding the teams and matches
+# frames as Arrow IPC files plus a meta.json naming the current files and their fingerprint
+SNAPSHOT_DIR = os.environ.get('DATA_SNAPSHOT_DIR', 'snapshots')
+
+# Errors meaning the database cannot be reached, so snapshot+live falls back to the snapshot
+DATABASE_UNAVAILABLE = CONNECTION_ERRORS + (PoolTimeout,)
+
+
+def partition_dir(partition, root=SNAPSHOT_DIR):
+    return os.path.join(root, 'default' if partition.league is None else f"{partition.league}_{partition.season}")
+
+def write_frame(frame, path):
+    # Categorical teams become Arrow dictionaries and the nullable scores keep their nulls, so the
+    # frame reads back with exactly the same schema
+    table = pa.Table.from_pandas(frame)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+def read_frame(path):
+    # Memory-mapped: the column buffers point into the OS page cache, which every process reading
+    # the same file shares. Numeric columns without nulls are handed to pandas without a copy
+    # (and are read-only, like every cached frame).
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+def _fingerprint_value(value):
+    # Database sums come back as Decimal; checksums are strings
+    if isinstance(value, str):
+        return value
+    return int(value) if value == int(value) else float(value)
+
+def write_snapshot(partition, team_data, matches_data, fingerprint, tables, root=SNAPSHOT_DIR):
+    # New files get a fresh version name and meta.json is swapped in last, so readers always see a
+    # complete snapshot; old files are removed afterwards (open memory maps stay valid)
+    directory = partition_dir(partition, root)
+    os.makedirs(directory, exist_ok=True)
+    old = read_meta(partition, root)
+    version = uuid.uuid4().hex[:12]
+    meta = {
+        'version': version,
+        'partition': partition._asdict(),
+        'fingerprint': {name: [None if value is None else _fingerprint_value(value) for value in values] for name, values in fingerprint.items()},
+        'tables': list(tables),
+        'written_at': time.time(),
+        'teams': f"teams-{version}.arrow",
+        'matches': f"matches-{version}.arrow",
+    }
+    write_frame(team_data, os.path.join(directory, meta['teams']))
+    write_frame(matches_data, os.path.join(directory, meta['matches']))
+    path = os.path.join(directory, 'meta.json')
+    with open(path + '.tmp', 'w') as file:
+        json.dump(meta, file)
+    os.replace(path + '.tmp', path)
+    if old is not None:
+        for name in [old['teams'], old['matches']]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+    return meta
+
+def read_meta(partition, root=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(partition_dir(partition, root), 'meta.json')) as file:
+            meta = json.load(file)
+    except FileNotFoundError:
+        return None
+    meta['fingerprint'] = {name: tuple(values) for name, values in meta['fingerprint'].items()}
+    return meta
+
+def read_snapshot(meta, root=SNAPSHOT_DIR):
+    directory = partition_dir(Partition(**meta['partition']), root)
+    return read_frame(os.path.join(directory, meta['teams'])), read_frame(os.path.join(directory, meta['matches']))
+
+def snapshot_partitions(root=SNAPSHOT_DIR):
+    # Partitions with a snapshot, in the same order as the live listing
+    if not os.path.isdir(root):
+        return []
+    tables = []
+    for name in os.listdir(root):
+        try:
+            with open(os.path.join(root, name, 'meta.json')) as file:
+                partition = Partition(**json.load(file)['partition'])
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        tables += [partition.teams_table, partition.matches_table]
+    return find_partitions(tables)
+
+
+class SnapshotDataCache(DataCache):
+    # A DataCache that boots from the partition's local snapshot instead of the database.
+    # live=False: the snapshot is the only source; refreshing it (see main) is picked up on the
+    #   next fingerprint check.
+    # live=True: the database stays the source of truth. Frames come from the snapshot while its
+    #   fingerprint matches the live one, live queries (and incremental syncs) take over once the
+    #   tables change, and the snapshot is served whenever the database cannot be reached.
+    def __init__(self, execute, partition=DEFAULT_PARTITION, live=False, root=SNAPSHOT_DIR, **kwargs):
+        super().__init__(execute, partition, **kwargs)
+        self.live = live
+        self.root = root
+        # (meta, team_data, matches_data) of the snapshot currently on disk
+        self._snapshot = None
+        # Held while the snapshot files are read and swapped in, so they are read once and the cache
+        # lock is never held for file I/O
+        self._snapshot_lock = threading.Lock()
+        self._stats.update({'snapshot_reads': 0, 'offline_checks': 0})
+
+    def _current_snapshot(self):
+        with self._snapshot_lock:
+            meta = read_meta(self.partition, self.root)
+            snapshot = self._snapshot
+            if meta is None:
+                snapshot = None
+            elif snapshot is None or snapshot[0]['version'] != meta['version']:
+                snapshot = (meta,) + read_snapshot(meta, self.root)
+                with self._lock:
+                    self._stats['snapshot_reads'] += 1
+            self._snapshot = snapshot
+            return snapshot
+
+    def _snapshot_for(self, fingerprint):
+        # The snapshot with exactly this fingerprint, or None. Loaders use the tuple returned rather
+        # than self._snapshot, which a newer snapshot may replace in the meantime.
+        snapshot = self._snapshot
+        snapshot = snapshot if snapshot is not None else self._current_snapshot()
+        return snapshot if snapshot is not None and snapshot[0]['fingerprint'] == fingerprint else None
+
+    def _read_fingerprint(self):
+        if self.live:
+            try:
+                return super()._read_fingerprint()
+            except DATABASE_UNAVAILABLE:
+                if self._current_snapshot() is None:
+                    raise
+                with self._lock:
+                    self._stats['offline_checks'] += 1
+        snapshot = self._current_snapshot()
+        if snapshot is None:
+            raise FileNotFoundError(f"No snapshot of {partition_label(self.partition)} in {self.root}; run `python -m snapshot`")
+        return snapshot[0]['fingerprint']
+
+    def prefetch(self, datasets, fingerprint=None):
+        # Nothing to fetch while the frames come from the snapshot
+        fingerprint = fingerprint or self.fingerprint()
+        if self._snapshot_for(fingerprint) is not None:
+            return None
+        return super().prefetch(datasets, fingerprint)
+
+    def _load_teams(self, fingerprint):
+        snapshot = self._snapshot_for(fingerprint)
+        if snapshot is not None:
+            return snapshot[1]
+        return super()._load_teams(fingerprint)
+
+    def _load_matches(self, fingerprint, team_data):
+        snapshot = self._snapshot_for(fingerprint)
+        if snapshot is not None:
+            return snapshot[2]
+        return super()._load_matches(fingerprint, team_data)
+
+    def _refresh_matches(self, fingerprint, team_data):
+        snapshot = self._snapshot_for(fingerprint)
+        if snapshot is not None:
+            return snapshot[2]
+        return super()._refresh_matches(fingerprint, team_data)
+
+    def _load_team_results(self, fingerprint):
+        # The snapshot has no aggregate view, but the matches are in memory anyway
+        if self._snapshot_for(fingerprint) is not None:
+            return team_results_from_matches(self.matches(fingerprint), self.teams(fingerprint))
+        return super()._load_team_results(fingerprint)
+
+    def _load_tables(self, fingerprint):
+        snapshot = self._snapshot_for(fingerprint)
+        if snapshot is not None:
+            return pd.DataFrame({'table_name': snapshot[0]['tables']})
+        return super()._load_tables(fingerprint)
+
+
+def list_snapshot_partitions(execute, live=False, root=SNAPSHOT_DIR):
+    # The partitions to offer when booting from snapshots: the live listing when the database is
+    # used and reachable, otherwise whatever has been snapshotted
+    if live:
+        try:
+            return database_partitions(execute)
+        except DATABASE_UNAVAILABLE:
+            pass
+    return snapshot_partitions(root)
+
+def refresh(execute, partitions, root=SNAPSHOT_DIR, attempts=3):
+    # Write a snapshot of every partition. A partition whose fingerprint moves while it is being
+    # read is read again, so a snapshot never claims a fingerprint its frames do not match.
+    for partition in partitions:
+        for _ in range(attempts):
+            cache = DataCache(execute, partition, fingerprint_interval=0)
+            fingerprint = cache.fingerprint()
+            team_data, matches_data = cache.scan(fingerprint)
+            tables = cache.tables(fingerprint)['table_name'].tolist()
+            if cache.fingerprint() == fingerprint:
+                break
+        meta = write_snapshot(partition, team_data, matches_data, fingerprint, tables, root)
+        print(f"{partition_label(partition)}: {len(team_data)} teams, {len(matches_data)} matches -> {partition_dir(partition, root)} ({meta['version']})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the local snapshots from the database")
+    parser.add_argument('partitions', nargs='*', help="partitions to refresh, e.g. default or epl_2023_24 (all by default)")
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help="snapshot directory")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from db import get_pool
+    dsn = f"host={os.environ['DB_HOST']} user={os.environ['DB_USERNAME']} password={os.environ['DB_PASSWORD']} dbname={os.environ['DB_NAME']}"
+    execute = get_pool(dsn).execute
+
+    partitions = database_partitions(execute)
+    if args.partitions:
+        by_name = {os.path.basename(partition_dir(partition)): partition for partition in partitions}
+        unknown = [name for name in args.partitions if name not in by_name]
+        if unknown:
+            sys.exit(f"Unknown partitions: {', '.join(unknown)} (available: {', '.join(by_name)})")
+        partitions = [by_name[name] for name in args.partitions]
+    refresh(execute, partitions, args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import numpy as np
+
+from charts import RESULT_COLORS
+from data import match_results_matrix
+from model import TARGETS, VARIANTS
+
+# Chart specs and verdicts of the pages, shared by app.py and the batch report (report.py), so a
+# prerendered chart is exactly the chart the page would have rendered live. A spec is
+# (chart id, widget parameters, chart type, keyword arguments or a function returning them).
+
+# Choices of the Data page widgets; the report prerenders every combination
+SORT_COLUMNS = ["MarketValue", "M", "W", "D", "L", "G", "GA", "PTS", "xG", "xGA", "xPTS"]
+SORT_DIRECTIONS = ["From Highest", "From Lowest"]
+STANDINGS_VIEWS = ["Points", "Goal Difference", "Rank"]
+RATIO_VENUES = ["All", "Home", "Away"]
+
+# Verdict wording per comparison metric (see stats.COMPARISON_METRICS): what the better team has,
+# what is compared
+VERDICT_PHRASES = {
+    'market_value': ("a better market value", "market value"),
+    'xg': ("a better offense", "offense"),
+    'xga': ("a better defense", "defense"),
+    'home_wins': ("more home wins", "home wins"),
+    'away_wins': ("more away wins", "away wins"),
+    'offensive_performance': ("a better offensive performance", "offensive performance"),
+    'defensive_performance': ("a better defensive performance", "defensive performance"),
+    'overall_performance': ("a better overall performance", "overall performance"),
+}
+
+
+# Data page ===================================================================
+
+def teams_sorted_chart(data, sort_by, direction):
+    def args():
+        sorted_data = data.sort_values(by=[sort_by], ascending=(direction == "From Lowest"))
+        return dict(labels=sorted_data['TeamName'], values=sorted_data[sort_by], title=f"Premier League {sort_by} Comparison", xlabel="Team Name", ylabel=sort_by)
+    return "teams_sorted", (sort_by, direction), 'bar', args
+
+def team_average_charts(data):
+    # Bar charts with a line and a text which show the average market value, xG and xGA
+    return {
+        'market_value': ("market_value", (), 'bar', dict(
+            labels=data['TeamName'], values=data['MarketValue'], title="Market Value", xlabel="Team Name",
+            ylabel="Market Value", average=data['MarketValue'].mean(),
+            average_text=f"Average Market Value: {data['MarketValue'].mean()}")),
+        'xg': ("xg", (), 'bar', dict(
+            labels=data['TeamName'], values=data['xG'], title="Expected Goals", xlabel="Team Name", ylabel="xG",
+            average=data['xG'].mean(), average_text=f"Average xG: {round(data['xG'].mean(), 3)}")),
+        'xga': ("xga", (), 'bar', dict(
+            labels=data['TeamName'], values=data['xGA'], title="Expected Goals Against", xlabel="Team Name", ylabel="xGA",
+            average=data['xGA'].mean(), average_text=f"Average xGA: {round(data['xGA'].mean(), 3)}")),
+    }
+
+def standings_chart(page_data, over_time):
+    # The standings are only read on a miss
+    def args():
+        standings = page_data.standings
+        column = over_time.lower().replace(' ', '_')
+        # Lines in the table's order, so the legend reads like the table
+        teams = page_data.teams['TeamName'].tolist()
+        return dict(x=standings.matchdays, series=standings.frame(column, teams).to_numpy(), labels=teams,
+                    title=f"{over_time} After Each Matchday", xlabel="Matchday", ylabel=over_time, invert_y=column == 'rank')
+    return "standings", (over_time,), 'line', args
+
+def league_charts(rollup):
+    # The home result and played/not played pies and the goals per matchday, slices of the rollup
+    league = rollup.league_results()
+    home_win, home_draw, home_lose = league['home_win'], league['home_draw'], league['home_lose']
+    played, not_played = league['played'], league['not_played']
+    goals = rollup.goals_per_matchday()
+    return {
+        'home_results': ("home_results", (), 'pie', dict(
+            values=[home_win, home_draw, home_lose], labels=['Win', 'Draw', 'Lose'], colors=RESULT_COLORS,
+            title="Percentage of Win, Draw, and Lose in Home Matches",
+            texts=[(-0.59, -0.05, f"{home_win} matches"), (0.16, -0.72, f"{home_draw} matches"), (0.5, 0.12, f"{home_lose} matches")])),
+        'played': ("played", (), 'pie', dict(
+            values=[played, not_played], labels=['Played', 'Not Played'], colors=['#377B2B', '#C93127'],
+            title="Percentage of Played and Not Played Matches",
+            texts=[(-0.5, 0.1, f"{played} matches"), (0.5, -0.2, f"{not_played} matches")])),
+        'goals_per_matchday': ("goals_per_matchday", (), 'bar', dict(
+            labels=goals.index, values=goals.values, title="Goals Per Matchday", xlabel="Matchday", ylabel="Goals",
+            average=goals.mean() if len(goals) else None, average_text=f"Average: {goals.mean():.1f} goals" if len(goals) else None)),
+    }
+
+def result_ratio_chart(rollup, venue, data):
+    # Bars in the table's order; the rollup itself keeps its teams in TeamID order
+    shares = rollup.team_result_shares(None if venue == "All" else venue.lower(), data['TeamName'])
+    return "result_ratio", (venue,), 'stacked_bar', dict(
+        labels=shares.index.tolist(), stacks=[shares[column].to_numpy() for column in ['win', 'draw', 'lose']],
+        stack_labels=['Win', 'Draw', 'Lose'], colors=RESULT_COLORS, title=f"Win/Draw/Lose Ratio ({venue} Matches)",
+        xlabel="Team Name", ylabel="Share of Played Matches")
+
+def results_heatmap_chart(matches, data):
+    def args():
+        # home x away matrix of the results, 0 (Away), 0.5 (Draw) and 1 (Home)
+        matrix = match_results_matrix(matches, data)
+        # Red (away) to green (home) palette, by name so the spec stays cheap to send to a worker
+        return dict(matrix=matrix, labels=data['TeamName'].tolist(), cmap='RdYlGn')
+    return "results_heatmap", (), 'heatmap', args
+
+def data_page_charts(page_data):
+    # Every chart of the Data page, in every widget combination
+    data = page_data.teams
+    rollup = page_data.rollup
+    specs = [teams_sorted_chart(data, sort_by, direction) for sort_by in SORT_COLUMNS for direction in SORT_DIRECTIONS]
+    specs += team_average_charts(data).values()
+    specs += [standings_chart(page_data, over_time) for over_time in STANDINGS_VIEWS]
+    specs += league_charts(rollup).values()
+    specs += [result_ratio_chart(rollup, venue, data) for venue in RATIO_VENUES]
+    specs.append(results_heatmap_chart(page_data.matches, data))
+    return specs
+
+
+# Team Performance page =======================================================
+
+def team_charts(team_name, team):
+    # The home/away and result pies of one team (see team_index)
+    return {
+        'home_away': ("home_away", (team_name,), 'pie', dict(
+            values=[team['home_matches'], team['away_matches']], labels=['Home', 'Away'], colors=['#377B2B', '#C93127'],
+            title="Percentage of Home and Away Matches")),
+        'home_results': ("team_home_results", (team_name,), 'pie', dict(
+            values=[team['home_win'], team['home_draw'], team['home_lose']], labels=['Win', 'Draw', 'Lose'], colors=RESULT_COLORS,
+            title="Percentage of Win, Draw, and Lose in Home Matches")),
+        'away_results': ("team_away_results", (team_name,), 'pie', dict(
+            values=[team['away_win'], team['away_draw'], team['away_lose']], labels=['Win', 'Draw', 'Lose'], colors=RESULT_COLORS,
+            title="Percentage of Win, Draw, and Lose in Away Matches")),
+    }
+
+def pair_charts(comparison, team_name1, team_name2):
+    # The comparison charts of two teams, a slice of the comparison matrix (see stats.TeamComparison)
+    pair = comparison.pair(team_name1, team_name2)
+    names = [team_name1, team_name2]
+    def compared(chart_id, metric, title, ylabel):
+        return chart_id, (team_name1, team_name2), 'comparison', dict(
+            names=names, values=list(pair[metric][:2]), title=title, xlabel="Team Name", ylabel=ylabel)
+    category_names = ['Goal Likelihood', 'Goal Against Likelihood', 'Overall Perf']
+    performance = [pair[metric] for metric in ['offensive_performance', 'defensive_performance', 'overall_performance']]
+    return {
+        'market_value': compared("market_value_comparison", 'market_value', "Market Value Comparison", "Market Value"),
+        'xg': compared("xg_comparison", 'xg', "xG Comparison", "xG"),
+        'xga': compared("xga_comparison", 'xga', "xGA Comparison", "xGA"),
+        'home_wins': compared("home_wins_comparison", 'home_wins', "Home Wins Comparison", "Home Wins"),
+        'away_wins': compared("away_wins_comparison", 'away_wins', "Away Wins Comparison", "Away Wins"),
+        'performance': ("performance_comparison", (team_name1, team_name2), 'grouped_bar', dict(
+            category_names=category_names,
+            series=[(team_name1, [values[0] for values in performance]), (team_name2, [values[1] for values in performance])],
+            title="Performance Comparison", ylabel="Value")),
+    }
+
+def pair_verdicts(comparison, team_name1, team_name2):
+    # comparison metric -> (st message kind, message), from team 1's point of view
+    verdicts = {}
+    for metric, (_, _, better) in comparison.pair(team_name1, team_name2).items():
+        has, compared = VERDICT_PHRASES[metric]
+        if better > 0:
+            verdicts[metric] = ('success', f"{team_name1} has {has} than {team_name2}")
+        elif better < 0:
+            verdicts[metric] = ('error', f"{team_name2} has {has} than {team_name1}")
+        else:
+            verdicts[metric] = ('warning', f"{team_name1} and {team_name2} have the same {compared}")
+    return verdicts
+
+def dominance_chart(comparison):
+    # Share of the metrics on which each team beats each other team, for the whole league at once
+    def args():
+        return dict(matrix=comparison.dominance().to_numpy(), labels=comparison.teams, cmap='RdYlGn', title="Dominance Matrix",
+                    xlabel="Opponent", ylabel="Team", scale_labels=('Worse', 'Even', 'Better'))
+    return "dominance", (), 'heatmap', args
+
+
+# Market Value Model and Season Projection pages ==============================
+# Only drawn live by the app; the report does not prerender them
+
+def market_value_fit_chart(model, target):
+    # The teams' market values against one target with the line of every model variant
+    def args():
+        values = model.values[:, TARGETS.index(target)]
+        lines = [(label, *model.curve(target, variant)) for variant, label in VARIANTS.items()]
+        return dict(x=model.market_value / 1e6, y=values, labels=model.teams,
+                    lines=[(label, line_x / 1e6, line_y) for label, line_x, line_y in lines],
+                    title=f"{target} by Market Value", xlabel="Market Value (€M)", ylabel=target)
+    return "market_value_fit", (target,), 'regression', args
+
+def rank_probabilities_chart(projection):
+    # Chance of every final place for every team, best projected team first, in whole percents;
+    # places a team never reached are left blank
+    def args():
+        ranks = projection.ranks()
+        matrix = ranks.to_numpy()
+        return dict(matrix=np.where(matrix > 0, matrix, np.nan), labels=ranks.index.tolist(), column_labels=[str(place) for place in ranks.columns],
+                    cmap='Greens', title="Final Place Probabilities", xlabel="Final Place", ylabel="Team", scale_labels=('0%', '50%', '100%'),
+                    annotation_format='%.0f', annotation_scale=100)
+    return "rank_probabilities", (), 'heatmap', args
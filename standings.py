@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from data import RESULT_PENDING, SCORE_CHECKSUM_BASE, SCORE_CHECKSUM_MODULUS, team_axis, team_codes
+
+# Points for the home and the away team, indexed by result code (RESULT_AWAY, RESULT_DRAW, RESULT_HOME)
+HOME_POINTS = np.array([0, 1, 3])
+AWAY_POINTS = np.array([3, 1, 0])
+# Cumulative columns of the standings, in the order they are stored
+STANDINGS_COLUMNS = ['played', 'points', 'goal_difference', 'goals']
+
+
+class Standings:
+    # The table after every matchday that has a played match: cumulative played, points, goal
+    # difference and goals per team as (matchdays x teams) arrays in team_axis order (TeamID, so the
+    # axis stays put when the ranking changes), plus the rank.
+    # The first `settled` matchdays are complete (no match of theirs is pending), so a later data
+    # version only has to append the matchdays after them (see update_standings).
+    def __init__(self, teams, matchdays, totals, rank, settled, check):
+        self.teams = teams
+        self.matchdays = matchdays
+        # column name -> (matchdays x teams) cumulative array
+        self.totals = totals
+        self.rank = rank
+        self.settled = settled
+        # (matches, played matches, score checksum) up to the last settled matchday, to detect corrected scores
+        self.check = check
+
+    def frame(self, column, teams=None):
+        # One column as a matchday x team frame, e.g. for the points-over-time chart; teams reorders
+        # the columns for display (e.g. team_data['TeamName'], the table's order)
+        frame = pd.DataFrame(self.rank if column == 'rank' else self.totals[column], index=self.matchdays, columns=self.teams)
+        return frame if teams is None else frame[list(teams)]
+
+
+def matchday_totals(matches_data, team_data):
+    # Per (matchday, team) games, points, goal difference and goals of the played matches, as dense
+    # arrays over the matchdays that have any: both teams of every match become one long-format row
+    # and the rows are summed into their (matchday, team) cell in one pass, no per-team loops
+    n_teams = len(team_data)
+    played = matches_data['result'].to_numpy() != RESULT_PENDING
+    home = team_codes(matches_data['homeTeamId'], team_data)[played]
+    away = team_codes(matches_data['awayTeamId'], team_data)[played]
+    result = matches_data['result'].to_numpy()[played].astype(np.intp)
+    home_score = matches_data['homeScore'].to_numpy(dtype=float, na_value=0)[played].astype(np.int64)
+    away_score = matches_data['awayScore'].to_numpy(dtype=float, na_value=0)[played].astype(np.int64)
+    matchdays, matchday_index = np.unique(matches_data['matchday'].to_numpy()[played], return_inverse=True)
+
+    keep = np.concatenate([home >= 0, away >= 0])
+    cells = (np.concatenate([matchday_index, matchday_index]) * n_teams + np.concatenate([home, away]))[keep]
+    values = {
+        'played': np.ones(len(cells), dtype=np.int64),
+        'points': np.concatenate([HOME_POINTS[result], AWAY_POINTS[result]])[keep],
+        'goal_difference': np.concatenate([home_score - away_score, away_score - home_score])[keep],
+        'goals': np.concatenate([home_score, away_score])[keep],
+    }
+    size = len(matchdays) * n_teams
+    totals = {column: np.bincount(cells, weights=values[column], minlength=size).astype(np.int64).reshape(len(matchdays), n_teams)
+              for column in STANDINGS_COLUMNS}
+    return matchdays, totals
+
+def standings_rank(totals):
+    # Rank of every team after every matchday: points, then goal difference, then goals (ties keep
+    # the order of the team axis)
+    key = (totals['points'] << 42) + ((totals['goal_difference'] + (1 << 20)) << 21) + totals['goals']
+    order = np.argsort(-key, axis=1, kind='stable')
+    rank = np.empty(key.shape, dtype=np.int16)
+    rank[np.arange(key.shape[0])[:, None], order] = np.arange(1, key.shape[1] + 1)
+    return rank
+
+def settled_check(matches_data, last_matchday):
+    # Weighted like the fingerprint's score checksum, so a corrected score that keeps the goal total
+    # is noticed too
+    upto = matches_data['matchday'].to_numpy() <= last_matchday
+    played = matches_data['result'].to_numpy()[upto] != RESULT_PENDING
+    match_id = matches_data['matchId'].to_numpy(dtype=np.int64)[upto]
+    home = matches_data['homeScore'].to_numpy(dtype=float, na_value=0)[upto]
+    away = matches_data['awayScore'].to_numpy(dtype=float, na_value=0)[upto]
+    checksum = ((match_id % SCORE_CHECKSUM_MODULUS + 1) * (home * SCORE_CHECKSUM_BASE + away + 1))[played].sum()
+    return int(upto.sum()), int(played.sum()), int(checksum)
+
+def settled_prefix(matches_data, matchdays):
+    # How many of the (sorted) matchdays are settled, i.e. come before the first matchday with a
+    # pending match, and the settled_check of that prefix
+    pending = matches_data['matchday'].to_numpy()[matches_data['result'].to_numpy() == RESULT_PENDING]
+    first_pending = pending.min() if len(pending) else np.iinfo(np.int64).max
+    settled = int(np.searchsorted(matchdays, first_pending, side='left'))
+    return settled, settled_check(matches_data, matchdays[settled - 1]) if settled else None
+
+def complete_standings(teams, matches_data, matchdays, totals, rank):
+    return Standings(teams, matchdays, totals, rank, *settled_prefix(matches_data, matchdays))
+
+def build_standings(matches_data, team_data):
+    teams = team_axis(team_data)
+    matchdays, increments = matchday_totals(matches_data, teams)
+    totals = {column: np.cumsum(values, axis=0) for column, values in increments.items()}
+    return complete_standings(teams['TeamName'].tolist(), matches_data, matchdays, totals, standings_rank(totals))
+
+def update_standings(previous, matches_data, team_data):
+    # The standings of a new data version from the previous one: the settled matchdays are kept and
+    # only the matchdays after them are accumulated and appended. Rebuilt from scratch when the
+    # teams changed (not just their ranking) or a settled matchday no longer matches (e.g. a corrected score).
+    axis = team_axis(team_data)
+    teams = axis['TeamName'].tolist()
+    if previous is None or previous.settled == 0 or previous.teams != teams:
+        return build_standings(matches_data, team_data)
+    last_settled = previous.matchdays[previous.settled - 1]
+    if settled_check(matches_data, last_settled) != previous.check:
+        return build_standings(matches_data, team_data)
+    matchdays, increments = matchday_totals(matches_data[matches_data['matchday'].to_numpy() > last_settled], axis)
+    appended = {column: previous.totals[column][previous.settled - 1] + np.cumsum(values, axis=0) for column, values in increments.items()}
+    totals = {column: np.concatenate([previous.totals[column][:previous.settled], values]) for column, values in appended.items()}
+    rank = np.concatenate([previous.rank[:previous.settled], standings_rank(appended)])
+    return complete_standings(teams, matches_data, np.concatenate([previous.matchdays[:previous.settled], matchdays]), totals, rank)
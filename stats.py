@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# Columns of the teams table carried into the index
+TEAM_COLUMNS = ['Rank', 'TeamID', 'MarketValue', 'M', 'W', 'D', 'L', 'G', 'GA', 'PTS', 'xG', 'xGA', 'xPTS']
+
+# Metrics the Team Performance page compares teams on: (name, team stats column, higher is better)
+COMPARISON_METRICS = [
+    ('market_value', 'MarketValue', True),
+    ('xg', 'xG', True),
+    ('xga', 'xGA', False),
+    ('home_wins', 'home_win', True),
+    ('away_wins', 'away_win', True),
+    # G - xG: positive when the team scored more goals than expected
+    ('offensive_performance', 'G_xG', True),
+    # GA - xGA: negative when the team conceded fewer goals than expected
+    ('defensive_performance', 'GA_xGA', False),
+    # PTS - xPTS: positive when the team got more points than expected
+    ('overall_performance', 'PTS_xPTS', True),
+]
+
+
+def build_team_stats(team_data, team_results):
+    # One row per team (indexed by team name) with the table columns, the home/away result
+    # counts and the actual-minus-expected deltas. Built once per data version so that every
+    # section reads a team with a single index lookup instead of rescanning the matches.
+    team_stats = team_data.set_index('TeamName')[TEAM_COLUMNS].join(team_results)
+    team_stats.index.name = None
+    # Goal Likelihood, Goal Against Likelihood and Overall Perf
+    team_stats['G_xG'] = (team_stats['G'] - team_stats['xG']).round(3)
+    team_stats['GA_xGA'] = (team_stats['GA'] - team_stats['xGA']).round(3)
+    team_stats['PTS_xPTS'] = (team_stats['PTS'] - team_stats['xPTS']).round(3)
+    return team_stats
+
+def season_summary(team_data, matches_data):
+    # Headline numbers of one league/season (team_data is sorted by rank), for comparing partitions
+    played = matches_data['played'].to_numpy(dtype=bool)
+    home_goals = matches_data['homeScore'].to_numpy(dtype=float, na_value=np.nan)[played]
+    away_goals = matches_data['awayScore'].to_numpy(dtype=float, na_value=np.nan)[played]
+    n_played = int(played.sum())
+    return {
+        'leader': team_data['TeamName'].iloc[0] if len(team_data) else None,
+        'teams': len(team_data),
+        'matches': len(matches_data),
+        'played': n_played,
+        'goals_per_match': round(float(np.nansum(home_goals + away_goals)) / n_played, 2) if n_played else 0.0,
+        'home_win_share': round(float((home_goals > away_goals).sum()) / n_played, 3) if n_played else 0.0,
+        'market_value': int(team_data['MarketValue'].sum()),
+    }
+
+
+class TeamComparison:
+    # Every team against every other team on every comparison metric, computed at once by
+    # broadcasting the (metrics x teams) values against themselves. differences[m, i, j] is team i's
+    # value minus team j's and better[m, i, j] is 1 when team i is better on metric m, -1 when it
+    # is worse and 0 when they are level, so comparing two teams is a slice and not a recomputation.
+    def __init__(self, teams, metrics, columns, higher_is_better):
+        self.teams = teams
+        self.index = {team: i for i, team in enumerate(teams)}
+        self.metrics = metrics
+        # Values per metric with their own dtype, so counts and market values stay integers
+        self.columns = columns
+        values = np.array([column.astype(float) for column in columns]).reshape(len(metrics), len(teams))
+        self.differences = values[:, :, None] - values[:, None, :]
+        direction = np.where(higher_is_better, 1, -1).astype(np.int8)
+        self.better = np.sign(self.differences).astype(np.int8) * direction[:, None, None]
+
+    def pair(self, team1, team2):
+        # metric -> (team 1's value, team 2's value, 1/0/-1 from team 1's point of view)
+        i, j = self.index[team1], self.index[team2]
+        return {metric: (self.columns[m][i].item(), self.columns[m][j].item(), int(self.better[m, i, j]))
+                for m, metric in enumerate(self.metrics)}
+
+    def dominance(self):
+        # Share of the metrics on which the row team is better than the column team (NaN against itself)
+        share = (self.better > 0).mean(axis=0)
+        np.fill_diagonal(share, np.nan)
+        return pd.DataFrame(share, index=self.teams, columns=self.teams)
+
+    def dominance_table(self):
+        # Per team, how many of its comparisons with every other team on every metric it wins, draws
+        # and loses, most dominant first
+        comparisons = len(self.metrics) * (len(self.teams) - 1)
+        better = (self.better > 0).sum(axis=(0, 2))
+        worse = (self.better < 0).sum(axis=(0, 2))
+        table = pd.DataFrame({'Team': self.teams, 'Better': better, 'Same': comparisons - better - worse, 'Worse': worse,
+                              'Share': (better / comparisons).round(3) if comparisons else 0.0})
+        return table.sort_values('Share', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def build_comparison(team_stats):
+    metrics = [metric for metric, _, _ in COMPARISON_METRICS]
+    columns = [team_stats[column].to_numpy() for _, column, _ in COMPARISON_METRICS]
+    return TeamComparison(team_stats.index.tolist(), metrics, columns, [higher for _, _, higher in COMPARISON_METRICS])
@@ -0,0 +1,63 @@
+import os
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import ChartBatch, ChartCache, chart_file, render_spec
+from report import render_charts
+
+
+class BrokenPool:
+    # A pool whose workers died: the first chart was already submitted and its Future fails, the
+    # submits after it fail right away
+    def __init__(self):
+        self.submitted = 0
+        self.shutdowns = 0
+
+    def submit(self, *args):
+        self.submitted += 1
+        if self.submitted > 1:
+            raise BrokenProcessPool("A child process terminated abruptly")
+        future = Future()
+        future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdowns += 1
+
+
+def bar_spec(chart_id):
+    return chart_id, (), 'bar', dict(labels=['a', 'b'], values=[1, 2], title=chart_id, xlabel='', ylabel='')
+
+
+def test_batch_renders_every_chart_when_the_pool_breaks():
+    pool = BrokenPool()
+    batch = ChartBatch('v1', cache=ChartCache(), pool=pool)
+    for chart_id in ['first', 'second', 'third']:
+        batch.add(chart_id, *bar_spec(chart_id))
+    placed = {}
+    batch.flush(placed.__setitem__)
+    assert sorted(placed) == ['first', 'second', 'third']
+    assert all(placed.values())
+    assert pool.shutdowns == 1
+    assert batch.pool is None
+
+
+def test_pie_of_a_zero_total_renders():
+    # Early in the season no home match has been played yet
+    chart = render_spec('pie', dict(values=[0, 0, 0], labels=['Win', 'Draw', 'Lose'], colors=['g', 'y', 'r'], title='Home Results'), 'png')
+    assert chart.startswith(b'\x89PNG')
+
+
+def test_report_skips_a_failing_chart(tmp_path, capsys):
+    def broken():
+        raise ValueError("no data")
+
+    specs = [bar_spec('first'), ('broken', (), 'bar', broken), ('bad_args', (), 'bar', dict(labels=['a'], values=[1], color='x')), bar_spec('second')]
+    rendered, failed = render_charts(specs, str(tmp_path), 'png', 1)
+    assert rendered == 2
+    assert failed == sorted([chart_file('broken', (), 'png'), chart_file('bad_args', (), 'png')])
+    assert sorted(os.listdir(tmp_path)) == sorted([chart_file('first', (), 'png'), chart_file('second', (), 'png')])
+    assert 'no data' in capsys.readouterr().err
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import SyntheticDatabase
+from data import DataCache, team_codes, team_results_from_matches
+
+
+def play_matchday(database):
+    # Plays the first pending matchday and updates the table the way the ingest job does: every team
+    # gets points and the ranking turns upside down
+    matchday = min(row[1] for row in database.matches if not row[6])
+    database.matches = [(match_id, day, home, away, 2, 1, True) if day == matchday else (match_id, day, home, away, home_score, away_score, played)
+                        for match_id, day, home, away, home_score, away_score, played in database.matches]
+    n_teams = len(database.teams)
+    database.teams = [(n_teams + 1 - row[0],) + row[1:10] + (row[10] + 3,) + row[11:] for row in database.teams]
+    return matchday
+
+
+def sorted_matches(matches_data):
+    return matches_data.sort_values('matchId').reset_index(drop=True)
+
+
+def test_matchday_that_moves_the_table_syncs_matches_incrementally():
+    database = SyntheticDatabase(6, 30)
+    cache = DataCache(database.execute, fingerprint_interval=0)
+    cache.matches()
+    matchday = play_matchday(database)
+
+    team_data, matches_data = cache.teams(), cache.matches()
+    stats = cache.stats()
+    assert stats['incremental_syncs'] == 1
+    assert stats['full_reloads'] == 1
+    assert team_data['TeamName'].iloc[0] == 'Team 5'
+
+    fresh = DataCache(database.execute)
+    pd.testing.assert_frame_equal(sorted_matches(matches_data), sorted_matches(fresh.matches()))
+    assert matches_data.loc[matches_data['matchday'] == matchday, 'played'].all()
+    # Codes of the synced frame still point at the right rows of the re-ranked teams
+    pd.testing.assert_frame_equal(team_results_from_matches(matches_data, team_data), team_results_from_matches(fresh.matches(), team_data))
+
+
+def test_team_codes_follow_team_data_order():
+    database = SyntheticDatabase(6, 30)
+    cache = DataCache(database.execute)
+    team_data, matches_data = cache.teams(), cache.matches()
+    reranked = team_data.iloc[::-1]
+    codes = team_codes(matches_data['homeTeamId'], reranked)
+    assert (reranked['TeamName'].to_numpy()[codes] == matches_data['homeTeamId'].astype(str).to_numpy()).all()
+
+
+def test_renamed_team_reloads_matches():
+    database = SyntheticDatabase(6, 30)
+    cache = DataCache(database.execute, fingerprint_interval=0)
+    cache.matches()
+    database.teams = [row[:2] + ('Renamed',) + row[3:] if row[1] == 10 else row for row in database.teams]
+    matches_data = cache.matches()
+    assert cache.stats()['incremental_syncs'] == 0
+    assert 'Renamed' in set(matches_data['homeTeamId']) | set(matches_data['awayTeamId'])
+
+
+def test_market_value_model_reads_only_the_teams():
+    database = SyntheticDatabase(6, 30)
+    queries = []
+
+    def execute(query, params=None):
+        queries.append(query)
+        return database.execute(query, params)
+
+    cache = DataCache(execute)
+    model = cache.market_value_model()
+    assert model.teams == cache.teams()['TeamName'].tolist()
+    # The fingerprint and the teams, no team results
+    assert len(queries) == 2
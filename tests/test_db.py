@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+
+import psycopg2 as psy
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.connection.dead:
+            raise psy.OperationalError("server closed the connection unexpectedly")
+        self.description = [('value',)]
+
+    def fetchall(self):
+        return [(1,)]
+
+
+class FakeConnection:
+    # Enough of a psycopg2 connection for the pool: cursors, close() and `closed`; `dead` makes every
+    # query fail like a dropped connection
+    def __init__(self):
+        self.closed = 0
+        self.dead = False
+        self.autocommit = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    connections = []
+
+    def connect(dsn):
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    return ConnectionPool('fake', connect=connect, **kwargs), connections
+
+
+def test_checkout_times_out_when_every_connection_is_in_use():
+    pool, connections = make_pool(maxconn=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+        metrics = pool.metrics()
+        assert metrics['in_use'] == 1
+        assert metrics['timeouts'] == 1
+    metrics = pool.metrics()
+    assert (metrics['in_use'], metrics['idle']) == (0, 1)
+    assert len(connections) == 1
+
+
+def test_waiting_checkout_gets_the_released_connection():
+    pool, connections = make_pool(maxconn=1, timeout=5)
+    held = pool._acquire()
+    release = threading.Timer(0.05, pool._release, args=(held,))
+    release.start()
+    with pool.connection() as conn:
+        assert conn is held
+    release.join()
+    assert pool.metrics()['max_wait'] > 0
+
+
+def test_query_retries_on_a_fresh_connection_when_the_old_one_died():
+    pool, connections = make_pool(maxconn=1)
+    assert pool.execute("SELECT 1") == [(1,)]
+    connections[0].dead = True
+    assert pool.execute("SELECT 1") == [(1,)]
+    assert len(connections) == 2
+    assert connections[0].closed
+    metrics = pool.metrics()
+    assert metrics['reconnects'] == 1
+    assert (metrics['in_use'], metrics['idle']) == (0, 1)
+
+
+def test_stale_idle_connection_is_pinged_and_replaced():
+    pool, connections = make_pool(check_interval=0)
+    pool.execute("SELECT 1")
+    connections[0].dead = True
+    with pool.connection() as conn:
+        assert conn is connections[1]
+    assert pool.metrics()['reconnects'] == 1
+
+
+def test_query_gives_up_after_the_retries():
+    pool, connections = make_pool()
+    pool.execute("SELECT 1")
+    connections[0].dead = True
+    original = pool._connect
+
+    def connect_dead(dsn):
+        conn = original(dsn)
+        conn.dead = True
+        return conn
+
+    pool._connect = connect_dead
+    with pytest.raises(psy.OperationalError):
+        pool.execute("SELECT 1", retries=1)
+    assert pool.metrics()['in_use'] == 0
+
+
+def test_counters_add_up_under_concurrent_sessions():
+    pool, connections = make_pool(maxconn=4, timeout=5)
+    threads = [threading.Thread(target=lambda: [pool.execute("SELECT 1") for _ in range(200)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics = pool.metrics()
+    assert metrics['checkouts'] == 1600
+    assert metrics['connects'] == len(connections)
+    assert (metrics['in_use'], metrics['idle']) == (0, len(connections))
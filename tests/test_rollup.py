@@ -0,0 +1,57 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rollup
+from benchmarks.synthetic import make_matches, make_teams
+from data import cleanMatches, cleanTeams
+from rollup import build_cube, update_cube
+
+
+def league_versions():
+    # Two data versions of one league: the second plays the first pending matchday with home wins
+    # and re-ranks the teams upside down
+    teams = make_teams(6)
+    matches = make_matches(teams, 30)
+    team_data = cleanTeams(teams)
+    before = cleanMatches(matches.copy(), team_data)
+
+    matchday = matches.loc[~matches['played'], 'matchday'].min()
+    playing = matches['matchday'] == matchday
+    matches.loc[playing, ['homeScore', 'awayScore', 'played']] = [3, 0, True]
+    teams = teams.assign(Rank=len(teams) + 1 - teams['Rank'], PTS=teams['PTS'] + 3)
+    new_team_data = cleanTeams(teams)
+    return (team_data, before), (new_team_data, cleanMatches(matches, new_team_data))
+
+
+def assert_same_cube(actual, expected):
+    assert actual.teams == expected.teams
+    np.testing.assert_array_equal(actual.matchdays, expected.matchdays)
+    for name in rollup.MEASURES:
+        np.testing.assert_array_equal(actual.measures[name], expected.measures[name])
+    assert (actual.settled, actual.check) == (expected.settled, expected.check)
+
+
+def test_update_appends_across_a_rank_change(monkeypatch):
+    (team_data, before), (new_team_data, after) = league_versions()
+    assert new_team_data['TeamName'].tolist() != team_data['TeamName'].tolist()
+    previous = build_cube(before, team_data)
+    expected = build_cube(after, new_team_data)
+
+    def rebuild(*args):
+        raise AssertionError("update_cube rebuilt the cube from scratch")
+
+    monkeypatch.setattr(rollup, 'build_cube', rebuild)
+    assert_same_cube(update_cube(previous, after, new_team_data), expected)
+
+
+def test_team_results_reorder_teams_for_display():
+    (team_data, before), _ = league_versions()
+    cube = build_cube(before, team_data)
+    table_order = team_data['TeamName'].iloc[::-1].tolist()
+    shares = cube.team_result_shares('home', table_order)
+    assert shares.index.tolist() == table_order
+    assert shares.loc[table_order[0]].equals(cube.team_result_shares('home').loc[table_order[0]])
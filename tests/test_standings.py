@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import standings
+from benchmarks.synthetic import make_matches, make_teams
+from data import cleanMatches, cleanTeams
+from standings import build_standings, update_standings
+
+
+def league_versions():
+    # Two data versions of one league: the second plays the first pending matchday with home wins
+    # for the bottom half of the table and re-ranks the teams upside down
+    teams = make_teams(6)
+    matches = make_matches(teams, 30)
+    team_data = cleanTeams(teams)
+    before = cleanMatches(matches.copy(), team_data)
+
+    matchday = matches.loc[~matches['played'], 'matchday'].min()
+    playing = matches['matchday'] == matchday
+    matches.loc[playing, ['homeScore', 'awayScore', 'played']] = [3, 0, True]
+    teams = teams.assign(Rank=len(teams) + 1 - teams['Rank'], PTS=teams['PTS'] + 3)
+    new_team_data = cleanTeams(teams)
+    return (team_data, before), (new_team_data, cleanMatches(matches, new_team_data))
+
+
+def assert_same_standings(actual, expected):
+    assert actual.teams == expected.teams
+    np.testing.assert_array_equal(actual.matchdays, expected.matchdays)
+    for column in standings.STANDINGS_COLUMNS:
+        np.testing.assert_array_equal(actual.totals[column], expected.totals[column])
+    np.testing.assert_array_equal(actual.rank, expected.rank)
+    assert (actual.settled, actual.check) == (expected.settled, expected.check)
+
+
+def test_update_appends_across_a_rank_change(monkeypatch):
+    (team_data, before), (new_team_data, after) = league_versions()
+    assert new_team_data['TeamName'].tolist() != team_data['TeamName'].tolist()
+    previous = build_standings(before, team_data)
+    expected = build_standings(after, new_team_data)
+
+    def rebuild(*args):
+        raise AssertionError("update_standings rebuilt the standings from scratch")
+
+    monkeypatch.setattr(standings, 'build_standings', rebuild)
+    assert_same_standings(update_standings(previous, after, new_team_data), expected)
+
+
+def test_corrected_settled_score_rebuilds():
+    (team_data, before), _ = league_versions()
+    previous = build_standings(before, team_data)
+    corrected = before.copy()
+    first = corrected.index[corrected['played'] & (corrected['homeScore'] != corrected['awayScore'])][0]
+    corrected.loc[first, ['homeScore', 'awayScore']] = corrected.loc[first, ['awayScore', 'homeScore']].to_numpy()
+    corrected.loc[first, 'result'] = 2 - corrected.loc[first, 'result']
+    assert_same_standings(update_standings(previous, corrected, team_data), build_standings(corrected, team_data))
+
+
+def test_frame_reorders_teams_for_display():
+    (team_data, before), _ = league_versions()
+    table_order = team_data['TeamName'].iloc[::-1].tolist()
+    frame = build_standings(before, team_data).frame('points', table_order)
+    assert frame.columns.tolist() == table_order
+
@@ -0,0 +1,40 @@
+import os
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workers import batch_sizes, run_batches
+
+
+class BrokenPool:
+    # A pool whose workers died after the first task was submitted
+    def __init__(self):
+        self.submitted = 0
+        self.shutdowns = 0
+
+    def submit(self, *args):
+        self.submitted += 1
+        future = Future()
+        future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdowns += 1
+
+
+def draw(offset, size, seed):
+    return offset + size * 10 + seed
+
+
+def test_batch_sizes_cover_the_total():
+    assert batch_sizes(10, 3, 12) == [4, 4, 2]
+    assert batch_sizes(5, 0, 2) == [2, 2, 1]
+    assert batch_sizes(0, 3, 12) == []
+
+
+def test_batches_run_here_when_the_pool_breaks():
+    pool = BrokenPool()
+    assert run_batches(draw, (100,), [4, 4, 2], [1, 2, 3], pool) == [141, 142, 123]
+    assert pool.shutdowns == 1
@@ -0,0 +1,209 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+# Append the spans of every finished trace (one per rerun) to this file as JSON lines; off when unset
+TRACE_LOG = os.environ.get('TRACE_LOG')
+# Write the aggregate span latencies in the Prometheus text format to this file (e.g. for the
+# node_exporter textfile collector), at most every TRACE_METRICS_INTERVAL seconds; off when unset
+TRACE_METRICS_FILE = os.environ.get('TRACE_METRICS_FILE')
+TRACE_METRICS_INTERVAL = float(os.environ.get('TRACE_METRICS_INTERVAL', 15))
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Numeric span attributes that are also summed per span name (e.g. rows and bytes fetched)
+COUNTED_ATTRIBUTES = ('rows', 'bytes')
+
+
+class Span:
+    # One timed operation. depth is its nesting level inside the trace; attrs are free-form details
+    # (row counts, chart kind, cache hits) shown in the debug panel and the log.
+    __slots__ = ('name', 'start', 'duration', 'depth', 'attrs')
+
+    def __init__(self, name, start, depth, attrs):
+        self.name = name
+        self.start = start
+        self.duration = None
+        self.depth = depth
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, origin=0.0):
+        return {'name': self.name, 'start_ms': (self.start - origin) * 1e3, 'duration_ms': self.duration * 1e3, 'depth': self.depth, **self.attrs}
+
+
+class Trace:
+    # The spans of one unit of work, e.g. a Streamlit rerun of one page
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+
+    def ordered(self):
+        # Spans are collected as they finish (children before their parent); show them as they started
+        return sorted(self.spans, key=lambda span: (span.start, span.depth))
+
+    def breakdown(self):
+        # Time per span name, slowest first: {name: (count, seconds)}
+        totals = {}
+        for span in self.spans:
+            count, seconds = totals.get(span.name, (0, 0.0))
+            totals[span.name] = (count + 1, seconds + span.duration)
+        return dict(sorted(totals.items(), key=lambda item: -item[1][1]))
+
+
+class Metrics:
+    # Process-wide latency histograms and attribute totals per span name, for every span whether or
+    # not it belongs to a trace
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # span name -> [count per bucket..., count, sum]
+        self._histograms = {}
+        # (span name, attribute) -> total
+        self._totals = {}
+        # Functions returning (metric, type, help, value) for state kept elsewhere, e.g. the connection pool
+        self._collectors = []
+
+    def register(self, collect):
+        with self._lock:
+            self._collectors.append(collect)
+
+    def observe(self, span):
+        with self._lock:
+            histogram = self._histograms.get(span.name)
+            if histogram is None:
+                histogram = self._histograms[span.name] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if span.duration <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += span.duration
+            for attribute in COUNTED_ATTRIBUTES:
+                value = span.attrs.get(attribute)
+                if value is not None:
+                    self._totals[span.name, attribute] = self._totals.get((span.name, attribute), 0) + value
+
+    def prometheus_text(self):
+        with self._lock:
+            histograms = {name: list(histogram) for name, histogram in self._histograms.items()}
+            totals = dict(self._totals)
+            collectors = list(self._collectors)
+        lines = ["# HELP app_span_seconds Duration of traced operations.", "# TYPE app_span_seconds histogram"]
+        for name, histogram in sorted(histograms.items()):
+            for bound, count in zip(self.buckets, histogram):
+                lines.append(f'app_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'app_span_seconds_bucket{{span="{name}",le="+Inf"}} {histogram[-2]}')
+            lines.append(f'app_span_seconds_count{{span="{name}"}} {histogram[-2]}')
+            lines.append(f'app_span_seconds_sum{{span="{name}"}} {histogram[-1]}')
+        for attribute in COUNTED_ATTRIBUTES:
+            lines += [f"# HELP app_span_{attribute}_total Total {attribute} reported by traced operations.", f"# TYPE app_span_{attribute}_total counter"]
+            lines += [f'app_span_{attribute}_total{{span="{name}"}} {total}' for (name, counted), total in sorted(totals.items()) if counted == attribute]
+        for collect in collectors:
+            for metric, kind, help, value in collect():
+                lines += [f"# HELP {metric} {help}", f"# TYPE {metric} {kind}", f"{metric} {value}"]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        # Written aside and renamed, so a scraper never reads half a file
+        with open(path + '.tmp', 'w') as file:
+            file.write(self.prometheus_text())
+        os.replace(path + '.tmp', path)
+
+
+metrics = Metrics()
+
+# The trace spans are collected into and the nesting depth, per thread and per context
+_trace = contextvars.ContextVar('trace', default=None)
+_depth = contextvars.ContextVar('span_depth', default=0)
+_log_lock = threading.Lock()
+_metrics_written_at = None
+
+
+def _finish(span, trace):
+    metrics.observe(span)
+    if trace is not None:
+        trace.spans.append(span)
+
+@contextmanager
+def span(name, **attrs):
+    # Time the block; the span is recorded in the current trace (if any) and the process metrics
+    current = Span(name, time.perf_counter(), _depth.get(), attrs)
+    token = _depth.set(current.depth + 1)
+    try:
+        yield current
+    except BaseException as error:
+        current.attrs['error'] = type(error).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _depth.reset(token)
+        _finish(current, _trace.get())
+
+def traced(name):
+    # Decorator form of span()
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record(name, duration, **attrs):
+    # A span timed elsewhere (e.g. in a worker process), ending now
+    current = Span(name, time.perf_counter() - duration, _depth.get(), attrs)
+    current.duration = duration
+    _finish(current, _trace.get())
+
+def estimate_bytes(rows, sample=100):
+    # Rough in-memory size of fetched rows, extrapolated from the first few
+    if not rows:
+        return 0
+    head = rows[:sample]
+    size = sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in head)
+    return size * len(rows) // len(head)
+
+@contextmanager
+def trace(name):
+    # Collect every span in the block (on this thread or a context copied from it) into a Trace
+    current = Trace(name)
+    token = _trace.set(current)
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _trace.reset(token)
+        if TRACE_LOG:
+            write_log(current, TRACE_LOG)
+        if TRACE_METRICS_FILE:
+            write_metrics(TRACE_METRICS_FILE)
+
+def write_log(trace, path):
+    lines = [json.dumps({'trace': trace.id, 'page': trace.name, 'timestamp': trace.timestamp, **span.to_dict(trace.start)}, default=str)
+             for span in trace.ordered()]
+    lines.append(json.dumps({'trace': trace.id, 'page': trace.name, 'timestamp': trace.timestamp, 'name': 'trace', 'start_ms': 0.0,
+                             'duration_ms': trace.duration * 1e3, 'depth': -1}))
+    with _log_lock:
+        with open(path, 'a') as file:
+            file.write('\n'.join(lines) + '\n')
+
+def write_metrics(path, interval=TRACE_METRICS_INTERVAL):
+    global _metrics_written_at
+    now = time.monotonic()
+    with _log_lock:
+        if _metrics_written_at is not None and now - _metrics_written_at < interval:
+            return
+        _metrics_written_at = now
+    metrics.write(path)
@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Worker processes shared by all the CPU-bound work done off the calling thread: chart rendering,
+# the model's resampling and the season simulations (1 runs everything on the calling thread).
+# Workers are spawned rather than forked, since the Streamlit server process is multi-threaded.
+WORKER_PROCESSES = int(os.environ.get('WORKER_PROCESSES', min(4, os.cpu_count() or 1)))
+WORKER_START_METHOD = os.environ.get('WORKER_START_METHOD', 'spawn')
+
+# One pool per process, started by the first task
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_worker_pool():
+    global _pool
+    if WORKER_PROCESSES <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKER_PROCESSES, mp_context=multiprocessing.get_context(WORKER_START_METHOD))
+        return _pool
+
+def reset_worker_pool(pool):
+    # A worker died (e.g. killed for memory); the next task starts a fresh pool
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Batches ======================================================================
+# Resampling and simulation split their draws into batches: each batch is one task for the pool
+# and stays small enough for the CPU caches (or a few MB) whatever the size of the league.
+
+def batch_sizes(total, values_per_item, batch_values):
+    # Sizes of batches of about batch_values values, independent of the number of workers so the
+    # results are too
+    batch = max(1, batch_values // max(1, values_per_item))
+    return [min(batch, total - start) for start in range(0, total, batch)]
+
+def run_batches(function, args, sizes, seeds, pool=None):
+    # function(*args, size, seed) for every batch, in the pool when there is one and more than one
+    # batch. When the pool breaks (or another thread reset it: its submits fail and its pending
+    # tasks are cancelled) it is reset and the batches run on the calling thread instead.
+    if pool is not None and len(sizes) > 1:
+        try:
+            futures = [pool.submit(function, *args, size, seed) for size, seed in zip(sizes, seeds)]
+            return [future.result() for future in futures]
+        except (BrokenProcessPool, CancelledError, RuntimeError):
+            reset_worker_pool(pool)
+    return [function(*args, size, seed) for size, seed in zip(sizes, seeds)]